@@ -28,7 +28,7 @@ from src.utils.logger import setup_logger
 from src.utils.timezone_helper import get_now
 from config.config import Config
 from src.telegram_controller import TelegramController
-from src.utils.database import Database
+from src.utils.armazenamento import abrir_armazenamento
 from src.calculos.processor import ProcessadorDados
 from src.calculos.trabalhista import CalculosTrabalhistas, ProcessadorFolha
 from src.relatorios.gerador_relatorios import GeradorRelatorios
@@ -63,7 +63,7 @@ class SystemMonitor:
             }
 
 class SistemaPonto:
-    def __init__(self):
+    def __init__(self, db=None):
         try:
             # Configuração inicial
             self.logger = setup_logger('SistemaPonto')
@@ -78,7 +78,7 @@ class SistemaPonto:
             
             # Banco de dados é opcional - continua sem persistência se falhar
             try:
-                self.db = Database()
+                self.db = db if db is not None else abrir_armazenamento()
                 self.logger.info("Banco de dados conectado com sucesso")
             except Exception as db_error:
                 self.logger.warning(f"Banco de dados indisponível, continuando sem persistência: {db_error}")
@@ -112,6 +112,9 @@ class SistemaPonto:
             self.feriados_br = holidays.country_holidays("BR")
             self.sistema_ativo = True
             self.modo_manutencao = False
+            self._acordar = threading.Event()  # avisos do banco interrompem a espera do loop principal
+            self._horarios_alterados = threading.Event()
+            self._jobs_registro = []
             self.command_queue = queue.Queue()
             self.monitor = SystemMonitor(self.logger)
             
@@ -197,12 +200,7 @@ class SistemaPonto:
                 periodo_key, periodo_nome = self._obter_periodo_atual()
                 registros_info = []
                 for reg in registros:
-                    data_hora_str = reg[1]
-                    if isinstance(data_hora_str, str):
-                        dt = datetime.strptime(data_hora_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                    else:
-                        dt = data_hora_str
-                    registros_info.append(dt.strftime('%H:%M'))
+                    registros_info.append(reg.data_hora.strftime('%H:%M'))
                 
                 self.logger.info(f"Registro automático ignorado - já existe registro no período: {', '.join(registros_info)}")
                 self.telegram.enviar_mensagem(
@@ -328,6 +326,39 @@ class SistemaPonto:
             self.logger.error(f"Erro ao verificar sistema: {e}")
             return f"❌ Erro ao verificar sistema: {e}"
 
+    def escutar_banco(self):
+        """
+        Aplica pausas e horários gravados por outros processos (ex.: o listener do
+        Telegram) assim que o banco avisa, via db.escutar_eventos.
+        """
+        try:
+            for evento in self.db.escutar_eventos(tabelas=('configuracoes',)):
+                # evento.tabela None: início ou reconexão, relê tudo
+                if evento.tabela is None or evento.chave == 'sistema_pausado':
+                    pausado = self.db.obter_configuracao('sistema_pausado')
+                    if pausado is not None:
+                        self.sistema_ativo = pausado != 'true'
+                        self.logger.info(f"Estado do sistema vindo do banco: {'pausado' if pausado == 'true' else 'ativo'}")
+                if evento.tabela is None or evento.chave in ('horario_entrada', 'horario_saida'):
+                    self._horarios_alterados.set()
+                self._acordar.set()
+        except Exception as e:
+            self.logger.error(f"Erro ao escutar eventos do banco: {e}")
+
+    def _agendar_registros(self):
+        """(Re)agenda os registros automáticos nos horários do banco ou, sem eles, da configuração"""
+        for job in self._jobs_registro:
+            schedule.cancel_job(job)
+        entrada, saida = str(self.config.HORARIO_ENTRADA), str(self.config.HORARIO_SAIDA)
+        if self.db:
+            entrada = self.db.obter_configuracao('horario_entrada') or entrada
+            saida = self.db.obter_configuracao('horario_saida') or saida
+        self._jobs_registro = [
+            schedule.every().day.at(entrada).do(self.registrar_ponto_automatico),
+            schedule.every().day.at(saida).do(self.registrar_ponto_automatico),
+        ]
+        self.logger.info(f"Registros automáticos agendados para {entrada} e {saida}")
+
     def processar_comando_async(self, comando: str, *args):
         """Processa comandos de forma assíncrona"""
         try:
@@ -554,6 +585,10 @@ class SistemaPonto:
                 self.telegram.enviar_mensagem("🔴 Sistema sendo encerrado")
                 time_module.sleep(1)  # Aguarda envio da mensagem
             
+            # Fecha conexões do pool do banco
+            if getattr(self, 'db', None):
+                self.db.fechar()
+            
             self.logger.info("Sistema encerrado com sucesso")
             
         except Exception as e:
@@ -573,8 +608,7 @@ class SistemaPonto:
             self.telegram.mostrar_menu()
             
             # Configura agendamentos
-            schedule.every().day.at(str(self.config.HORARIO_ENTRADA)).do(self.registrar_ponto_automatico)
-            schedule.every().day.at(str(self.config.HORARIO_SAIDA)).do(self.registrar_ponto_automatico)
+            self._agendar_registros()
             schedule.every(5).seconds.do(self.processar_comandos_telegram)
             schedule.every(5).minutes.do(self.verificar_sistema)
             schedule.every().day.at("23:50").do(self.processar_folha_mensal)
@@ -584,6 +618,10 @@ class SistemaPonto:
             schedule.every().day.at("01:00").do(self.backup_manager.limpar_backups_antigos)
             schedule.every(15).minutes.do(self.health_check)
             
+            # Pausas e horários alterados por outros processos chegam como eventos do banco
+            if self.db:
+                threading.Thread(target=self.escutar_banco, name='escuta-banco', daemon=True).start()
+            
             self.logger.info("Sistema iniciado e aguardando comandos")
             
             # Loop principal
@@ -595,10 +633,15 @@ class SistemaPonto:
                     
                 if not self.sistema_ativo:
                     self.logger.info("Sistema pausado")
-                    time_module.sleep(5)
+                    # Retomado por outro processo: o evento do banco encerra a espera na hora
+                    self._acordar.wait(60)
+                    self._acordar.clear()
                     continue
                 
                 try:
+                    if self._horarios_alterados.is_set():
+                        self._horarios_alterados.clear()
+                        self._agendar_registros()
                     schedule.run_pending()
                     time_module.sleep(1)
                 except Exception as e:
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arquiva partições mensais antigas de registros e falhas_registro (somente Postgres).
+
+Uso:
+    python scripts/arquivar_particoes.py --meses 24 --destino arquivo/
+    python scripts/arquivar_particoes.py --meses 24 --destino arquivo/ --remover
+
+Cada partição anterior ao período mantido é exportada para <destino>/<particao>.csv.gz
+e desanexada da tabela principal. Sem --remover, a tabela desanexada continua no banco
+como <particao>_arquivada.
+"""
+
+import os
+import sys
+import argparse
+from datetime import date
+from dotenv import load_dotenv
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.database import Database
+
+
+def main():
+    load_dotenv(override=True)
+
+    parser = argparse.ArgumentParser(description='Arquiva partições mensais antigas')
+    parser.add_argument('--meses', type=int, default=24,
+                        help='meses completos mantidos antes do mês atual (padrão: 24)')
+    parser.add_argument('--destino', default='arquivo',
+                        help='diretório dos arquivos .csv.gz (padrão: arquivo/)')
+    parser.add_argument('--remover', action='store_true',
+                        help='apaga a partição depois de exportada e desanexada')
+    args = parser.parse_args()
+
+    hoje = date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - args.meses
+    antes_de = date(indice // 12, indice % 12 + 1, 1)
+
+    db = Database()
+    if db.backend != 'postgres':
+        print("❌ Arquivamento de partições requer DATABASE_URL (Postgres)")
+        db.fechar()
+        sys.exit(1)
+
+    arquivadas = db.arquivar_particoes(antes_de, args.destino, remover=args.remover)
+    db.fechar()
+
+    if not arquivadas:
+        print(f"Nenhuma partição anterior a {antes_de:%m/%Y} para arquivar")
+        return
+
+    for nome, arquivo, linhas in arquivadas:
+        print(f"✅ {nome}: {linhas} linhas em {arquivo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks da camada de banco de dados (SQLite local).
+
+Uso:
+    python scripts/benchmark_banco.py registros_dia --tamanhos 10000 100000 1000000
+    python scripts/benchmark_banco.py importacao
+    python scripts/benchmark_banco.py registrar_ponto --quantidade 10000 [--database-url URL]
+    python scripts/benchmark_banco.py calculos --tamanhos 100000 1000000 [--backend sql]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.armazenamento import abrir_armazenamento
+from src.utils.database import Database
+
+INICIO_SINTETICO = datetime(2000, 1, 3, 0, 0, 0)
+PASSO_SINTETICO = timedelta(minutes=15)
+
+
+def gerar_registros(inicio_idx, fim_idx):
+    """Gera registros sintéticos a cada 15 minutos, alternando entrada/saída"""
+    for i in range(inicio_idx, fim_idx):
+        data_hora = INICIO_SINTETICO + PASSO_SINTETICO * i
+        tipo = 'entrada' if i % 2 == 0 else 'saida'
+        yield (data_hora.strftime('%Y-%m-%d %H:%M:%S'), tipo, 'SUCESSO', None)
+
+
+def popular_registros(db, atual, alvo):
+    db.registrar_pontos_em_lote(gerar_registros(atual, alvo))
+
+
+def gerar_ano_funcionario(ano):
+    """Um ano de histórico: quatro batidas por dia útil"""
+    dia = datetime(ano, 1, 1)
+    while dia.year == ano:
+        if dia.weekday() < 5:
+            for hora, minuto, tipo in ((7, 30, 'entrada'), (12, 0, 'saida'),
+                                       (13, 0, 'entrada'), (17, 18, 'saida')):
+                yield (dia.replace(hour=hora, minute=minuto), tipo, 'IMPORTADO', None)
+        dia += timedelta(days=1)
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1_000_000
+
+
+def consulta_legada(db, dia):
+    """Predicado antigo (DATE(coluna) = DATE(?)), mantido só para comparação"""
+    with db._get_connection() as conn:
+        return conn.execute('''
+            SELECT id, data_hora, tipo, status, motivo
+            FROM registros
+            WHERE DATE(data_hora) = DATE(?)
+            ORDER BY data_hora
+        ''', (dia.strftime('%Y-%m-%d'),)).fetchall()
+
+
+def benchmark_registros_dia(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_file=os.path.join(tmp, 'benchmark.db'))
+
+        with db._get_connection() as conn:
+            plano = conn.execute('''
+                EXPLAIN QUERY PLAN
+                SELECT id, data_hora, tipo, status, motivo
+                FROM registros
+                WHERE data_hora >= ? AND data_hora < ?
+                ORDER BY data_hora
+            ''', db._intervalo_dia(INICIO_SINTETICO)).fetchall()
+        print("Plano de consulta de obter_registros_dia:")
+        for linha in plano:
+            print(f"  {linha[-1]}")
+        print()
+
+        print(f"{'linhas':>12} | {'range (µs)':>12} | {'DATE() (µs)':>12}")
+        print("-" * 44)
+
+        atual = 0
+        for tamanho in sorted(args.tamanhos):
+            popular_registros(db, atual, tamanho)
+            atual = tamanho
+
+            total_dias = max(1, (PASSO_SINTETICO * tamanho).days)
+            dias = [
+                (INICIO_SINTETICO + timedelta(days=random.randrange(total_dias))).date()
+                for _ in range(args.repeticoes)
+            ]
+            iterador = iter(dias * 2)
+
+            tempo_range = medir(lambda: db.obter_registros_dia(next(iterador)), args.repeticoes)
+            if args.comparar_legado:
+                tempo_legado = medir(lambda: consulta_legada(db, next(iterador)), args.repeticoes)
+                legado = f"{tempo_legado:>12.1f}"
+            else:
+                legado = f"{'-':>12}"
+
+            print(f"{tamanho:>12,} | {tempo_range:>12.1f} | {legado}")
+
+        db.fechar()
+
+
+def benchmark_importacao(args):
+    registros = list(gerar_ano_funcionario(args.ano))
+    print(f"Importando {len(registros)} registros ({args.ano}, um funcionário)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_file=os.path.join(tmp, 'individual.db'))
+        inicio = time.perf_counter()
+        for data_hora, tipo, status, motivo in registros:
+            db.registrar_ponto(data_hora, tipo, status, motivo)
+        individual = time.perf_counter() - inicio
+        db.fechar()
+
+        db = Database(db_file=os.path.join(tmp, 'lote.db'))
+        inicio = time.perf_counter()
+        inseridos = db.registrar_pontos_em_lote(registros)
+        lote = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        repetidos = db.registrar_pontos_em_lote(registros)
+        reimportacao = time.perf_counter() - inicio
+        db.fechar()
+
+    print(f"  registrar_ponto um a um:       {individual:8.3f}s")
+    print(f"  registrar_pontos_em_lote:      {lote:8.3f}s ({inseridos} inseridos)")
+    print(f"  reimportação (só duplicados):  {reimportacao:8.3f}s ({repetidos} inseridos)")
+
+
+def medir_registrar_ponto(db, quantidade):
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        db.registrar_ponto(INICIO_SINTETICO + PASSO_SINTETICO * i,
+                           'entrada' if i % 2 == 0 else 'saida', 'SUCESSO')
+    return time.perf_counter() - inicio
+
+
+def limpar_registros_sinteticos(db, quantidade):
+    fim = INICIO_SINTETICO + PASSO_SINTETICO * quantidade
+    with db._get_connection() as conn:
+        cursor = conn.cursor()
+        db._execute(cursor, 'DELETE FROM registros WHERE data_hora >= ? AND data_hora < ?',
+                    (INICIO_SINTETICO, fim))
+        db._execute(cursor, 'DELETE FROM resumo_diario WHERE data >= ? AND data < ?',
+                    (INICIO_SINTETICO.date(), fim.date() + timedelta(days=1)))
+        # Sem isso, a segunda rodada cairia inteira nas chaves de idempotência da primeira
+        db._execute_nomeada(cursor, 'liberar_chaves_periodo', (INICIO_SINTETICO, fim))
+
+
+def benchmark_registrar_ponto(args):
+    """registrar_ponto em laço: texto reescrito a cada chamada (antes) x consultas compiladas e preparadas (depois)"""
+    print(f"registrar_ponto x {args.quantidade} ({'postgres' if args.database_url else 'sqlite'})")
+    if args.database_url:
+        print(f"  Usa registros sintéticos a partir de {INICIO_SINTETICO:%Y-%m-%d}, apagados ao final.")
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rotulo, preparar in (('antes', 'false'), ('depois', 'true')):
+            os.environ['DB_PREPARED_STATEMENTS'] = preparar
+            db = Database(db_file=os.path.join(tmp, f'{rotulo}.db'), database_url=args.database_url)
+            if args.database_url:
+                limpar_registros_sinteticos(db, args.quantidade)
+            try:
+                resultados[rotulo] = medir_registrar_ponto(db, args.quantidade)
+            finally:
+                if args.database_url:
+                    limpar_registros_sinteticos(db, args.quantidade)
+                db.fechar()
+
+    for rotulo, duracao in resultados.items():
+        print(f"  {rotulo:<7} {duracao:8.3f}s  ({duracao / args.quantidade * 1_000_000:8.1f} µs/chamada)")
+    print(f"  ganho   {resultados['antes'] / resultados['depois']:8.2f}x")
+
+
+def benchmark_calculos(args):
+    """Leituras de cálculo e relatório (mês e ano) sobre batidas sintéticas, no backend escolhido"""
+    print(f"Cálculos e relatórios sobre batidas sintéticas (backend {args.backend})")
+    print(f"{'batidas':>12} | {'carga (s)':>10} | {'jornadas mês (ms)':>18} | "
+          f"{'jornadas ano (ms)':>18} | {'resumos mês (ms)':>17} | {'recalcular mês (ms)':>19}")
+    print("-" * 110)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = abrir_armazenamento(args.backend, db_file=os.path.join(tmp, 'calculos.db'))
+        atual = 0
+        for tamanho in sorted(args.tamanhos):
+            inicio = time.perf_counter()
+            popular_registros(db, atual, tamanho)
+            carga = time.perf_counter() - inicio
+            atual = tamanho
+
+            # Mês e ano no meio do período gerado
+            meio = (INICIO_SINTETICO + PASSO_SINTETICO * (tamanho // 2)).date()
+            mes_inicio, mes_fim = meio.replace(day=1), meio.replace(day=28)
+            ano_inicio, ano_fim = meio.replace(month=1, day=1), meio.replace(month=12, day=31)
+
+            tempos = [
+                medir(lambda: db.obter_jornadas_periodo(mes_inicio, mes_fim), args.repeticoes),
+                medir(lambda: db.obter_jornadas_periodo(ano_inicio, ano_fim), args.repeticoes),
+                medir(lambda: db.obter_resumos_periodo(mes_inicio, mes_fim), args.repeticoes),
+                medir(lambda: db.recalcular_horas_periodo(mes_inicio, mes_fim), args.repeticoes),
+            ]
+            print(f"{tamanho:>12,} | {carga:>10.2f} | {tempos[0] / 1000:>18.2f} | {tempos[1] / 1000:>18.2f} | "
+                  f"{tempos[2] / 1000:>17.2f} | {tempos[3] / 1000:>19.2f}")
+        db.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do banco de dados')
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    registros_dia = sub.add_parser('registros_dia', help='obter_registros_dia conforme a tabela cresce')
+    registros_dia.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    registros_dia.add_argument('--repeticoes', type=int, default=200)
+    registros_dia.add_argument('--comparar-legado', action='store_true',
+                               help='mede também o predicado DATE(data_hora) = DATE(?)')
+    registros_dia.set_defaults(func=benchmark_registros_dia)
+
+    importacao = sub.add_parser('importacao', help='importação de um ano de histórico')
+    importacao.add_argument('--ano', type=int, default=2024)
+    importacao.set_defaults(func=benchmark_importacao)
+
+    registrar = sub.add_parser('registrar_ponto', help='registrar_ponto sem e com prepared statements')
+    registrar.add_argument('--quantidade', type=int, default=10_000)
+    registrar.add_argument('--database-url', default=None,
+                           help='mede no Postgres informado em vez de um SQLite temporário')
+    registrar.set_defaults(func=benchmark_registrar_ponto)
+
+    calculos = sub.add_parser('calculos', help='jornadas, resumos e horas de um mês/ano conforme as batidas crescem')
+    calculos.add_argument('--tamanhos', type=int, nargs='+', default=[100_000, 1_000_000])
+    calculos.add_argument('--repeticoes', type=int, default=5)
+    calculos.add_argument('--backend', default='memoria',
+                          help="backend de armazenamento (memoria, sql ou modulo:Classe; padrão: memoria)")
+    calculos.set_defaults(func=benchmark_calculos)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Remove batidas de ponto duplicadas gravadas antes das chaves de idempotência.
+
+Uso:
+    python scripts/compactar_registros.py
+
+Batidas do mesmo funcionário com o mesmo minuto e tipo são duplicatas: fica a
+primeira e as demais são apagadas em lote, com resumo_diario reconstruído em
+seguida. horas_trabalhadas dos dias afetados pode ser refeita depois com
+recalcular_horas_periodo.
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.database import Database
+
+
+def main():
+    load_dotenv(override=True)
+
+    db = Database()
+    removidos = db.compactar_registros_duplicados()
+    db.fechar()
+
+    if removidos is None:
+        print("❌ Falha ao compactar registros")
+        sys.exit(1)
+
+    print(f"✅ {removidos} registros duplicados removidos")
+
+
+if __name__ == "__main__":
+    main()
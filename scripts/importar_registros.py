@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importa histórico de registros de ponto (CSV ou JSON exportado do sistema web).
+
+Uso:
+    python scripts/importar_registros.py historico.csv
+    python scripts/importar_registros.py historico.json --formato json
+
+Colunas/chaves esperadas: data_hora (ou data + hora), tipo, status (opcional), motivo (opcional).
+Registros com o mesmo minuto e tipo de uma batida já gravada (ou repetidos no arquivo) são ignorados.
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.database import Database
+from src.utils.importacao import ler_registros
+
+
+def main():
+    load_dotenv(override=True)
+
+    parser = argparse.ArgumentParser(description='Importa registros de ponto em lote')
+    parser.add_argument('arquivo', help='arquivo CSV ou JSON exportado')
+    parser.add_argument('--formato', choices=['csv', 'json', 'jsonl'],
+                        help='formato do arquivo (padrão: pela extensão)')
+    args = parser.parse_args()
+
+    db = Database()
+    inicio = time.perf_counter()
+    inseridos = db.registrar_pontos_em_lote(ler_registros(args.arquivo, args.formato))
+    duracao = time.perf_counter() - inicio
+    db.fechar()
+
+    if inseridos is None:
+        print(f"❌ Falha ao importar {args.arquivo}")
+        sys.exit(1)
+
+    print(f"✅ {inseridos} registros importados de {args.arquivo} em {duracao:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
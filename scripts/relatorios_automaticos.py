@@ -29,10 +29,10 @@ class RelatoriosAutomaticos:
         self.chat_id = os.environ.get('TELEGRAM_CHAT_ID', '').strip()
         self.db = None
         
-        # Conecta ao banco
+        # Conecta ao banco (somente leitura: relatórios não escrevem)
         try:
-            from src.utils.database import Database
-            self.db = Database()
+            from src.utils.armazenamento import abrir_armazenamento
+            self.db = abrir_armazenamento(somente_leitura=True)
             print("✅ Banco de dados conectado")
         except Exception as e:
             print(f"❌ Erro ao conectar banco: {e}")
@@ -61,8 +61,8 @@ class RelatoriosAutomaticos:
             registros = self.db.obter_registros_dia(data)
             
             # Conta entradas e saídas
-            entradas = sum(1 for r in registros if r[2].lower() == 'entrada')
-            saidas = sum(1 for r in registros if r[2].lower() == 'saida')
+            entradas = sum(1 for r in registros if r.tipo.lower() == 'entrada')
+            saidas = sum(1 for r in registros if r.tipo.lower() == 'saida')
             
             if entradas == 0 and saidas == 0:
                 return 'falta_total'
@@ -148,23 +148,8 @@ class RelatoriosAutomaticos:
             hoje = datetime.now().date()
         inicio = hoje - timedelta(days=7)
         
-        registros = self.db.obter_registros_periodo(inicio, hoje)
-        
-        # Agrupa por dia
-        dias = {}
-        for reg in registros:
-            data_str = reg[1]
-            if isinstance(data_str, str):
-                dt = datetime.strptime(data_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-            else:
-                dt = data_str
-            dia = dt.date()
-            if dia not in dias:
-                dias[dia] = {'entradas': [], 'saidas': []}
-            if reg[2].lower() == 'entrada':
-                dias[dia]['entradas'].append(dt)
-            else:
-                dias[dia]['saidas'].append(dt)
+        # Resumos diários pré-calculados (um por dia com batidas)
+        dias = {r['data']: r for r in self.db.obter_resumos_periodo(inicio, hoje)}
         
         # Calcula totais
         total_minutos = 0
@@ -179,12 +164,7 @@ class RelatoriosAutomaticos:
             
             if data in dias:
                 dias_trabalhados += 1
-                entradas = dias[data]['entradas']
-                saidas = dias[data]['saidas']
-                pares = min(len(entradas), len(saidas))
-                for j in range(pares):
-                    delta = saidas[j] - entradas[j]
-                    total_minutos += delta.total_seconds() / 60
+                total_minutos += dias[data]['minutos_trabalhados']
             else:
                 faltas.append(data)
         
@@ -236,17 +216,11 @@ class RelatoriosAutomaticos:
             print("Banco de dados não conectado")
             return
         
-        registros = self.db.obter_registros_periodo(inicio, fim)
+        resumos = self.db.obter_resumos_periodo(inicio, fim)
         
         # Conta dias trabalhados
-        dias = set()
-        for reg in registros:
-            data_str = reg[1]
-            if isinstance(data_str, str):
-                dt = datetime.strptime(data_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-            else:
-                dt = data_str
-            dias.add(dt.date())
+        dias = set(r['data'] for r in resumos)
+        total_registros = sum(r['batidas'] for r in resumos)
         
         # Conta dias úteis do mês
         dias_uteis = 0
@@ -267,7 +241,7 @@ class RelatoriosAutomaticos:
             f"📈 Dias úteis: {dias_uteis}\n"
             f"✅ Dias trabalhados: {len(dias)}\n"
             f"❌ Faltas: {faltas}\n"
-            f"📝 Total de registros: {len(registros)}\n"
+            f"📝 Total de registros: {total_registros}\n"
         )
         
         self.enviar_mensagem(msg)
@@ -288,20 +262,12 @@ class RelatoriosAutomaticos:
         inicio = datetime(ano, 1, 1).date()
         fim = datetime(ano, 12, 31).date()
         
-        registros = self.db.obter_registros_periodo(inicio, fim)
+        resumos = self.db.obter_resumos_periodo(inicio, fim)
         
         # Conta dias trabalhados por mês
         meses_dados = {}
-        for reg in registros:
-            data_str = reg[1]
-            if isinstance(data_str, str):
-                dt = datetime.strptime(data_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-            else:
-                dt = data_str
-            mes = dt.month
-            if mes not in meses_dados:
-                meses_dados[mes] = set()
-            meses_dados[mes].add(dt.date())
+        for resumo in resumos:
+            meses_dados.setdefault(resumo['data'].month, set()).add(resumo['data'])
         
         meses = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
                  'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
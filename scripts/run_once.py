@@ -13,14 +13,15 @@ root_dir = os.path.dirname(current_dir)
 sys.path.append(root_dir)
 
 from main import SistemaPonto
-from src.utils.database import Database
+from src.utils.armazenamento import abrir_armazenamento
+from src.utils.database import DatabaseEmSegundoPlano
 from config.config import Config
 
 
-def verificar_sistema_pausado():
+def verificar_sistema_pausado(abertura=None):
     """Verifica no banco de dados se o sistema está pausado"""
     try:
-        db = Database()
+        db = abertura.obter(timeout=60) if abertura else abrir_armazenamento()
         estado = db.obter_configuracao('sistema_pausado')
         return estado == 'true', db
     except Exception as e:
@@ -161,6 +162,10 @@ def enviar_confirmacao_registro():
 
 def main():
     load_dotenv(override=True)
+
+    # Conecta ao banco (DNS + TLS + schema) enquanto consulta o Telegram
+    aquecer = os.environ.get('DB_AQUECER', 'true').lower() in {'1', 'true', 'yes'}
+    abertura = DatabaseEmSegundoPlano() if aquecer else None
     
     print("🔍 Verificando comandos do Telegram...")
     
@@ -171,7 +176,7 @@ def main():
         print(f"📱 Comando encontrado: /{comando_telegram} às {comando_time.strftime('%H:%M') if comando_time else 'N/A'}")
     
     # Atualiza o estado no banco conforme comando do Telegram
-    pausado_no_banco, db = verificar_sistema_pausado()
+    pausado_no_banco, db = verificar_sistema_pausado(abertura)
     
     if comando_telegram == 'pausar':
         # Salva no banco e não registra
@@ -215,7 +220,7 @@ def main():
     
     sistema = None
     try:
-        sistema = SistemaPonto()
+        sistema = SistemaPonto(db=db)
         sistema.registrar_ponto_automatico()
     finally:
         if sistema:
@@ -8,6 +8,8 @@ Roda periodicamente, verifica comandos e fica ativo por 5 minutos se houver inte
 import os
 import sys
 import time
+import html
+import asyncio
 import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -31,7 +33,10 @@ class TelegramListener:
         self.chat_id = os.environ.get('TELEGRAM_CHAT_ID', '').strip()
         self.ultimo_update_id = self._carregar_ultimo_update_id()
         self.db = None
+        self.db_async = None
         self.sistema = None
+        self._loop = None
+        self._ultimo_envio = None  # Última resposta na fila de envio (mantém a ordem)
         self.acao_pendente = None  # Ação aguardando confirmação: 'registrar', etc.
         self.tempo_acao_pendente = None  # Timestamp da ação pendente
         
@@ -40,8 +45,8 @@ class TelegramListener:
         
         # Tenta conectar ao banco
         try:
-            from src.utils.database import Database
-            self.db = Database()
+            from src.utils.armazenamento import abrir_armazenamento
+            self.db = abrir_armazenamento()
             print("✅ Banco de dados conectado")
         except Exception as e:
             print(f"⚠️ Banco indisponível: {e}")
@@ -293,62 +298,88 @@ class TelegramListener:
         
         return None  # Comando não reconhecido
 
+    def _hoje(self):
+        try:
+            config = Config.get_instance()
+            return config.get_now().date()
+        except Exception as e:
+            print(f"⚠️ Erro ao obter config: {e}")
+            return datetime.now().date()
+
     def mostrar_status(self):
         """Mostra status do sistema"""
         try:
-            pausado = False
+            hoje = self._hoje()
+            estado = registros = total_horas = None
+            
             if self.db:
                 try:
                     estado = self.db.obter_configuracao('sistema_pausado')
-                    pausado = estado == 'true'
                 except Exception as e:
                     print(f"⚠️ Erro ao verificar pausa: {e}")
-            
-            try:
-                config = Config.get_instance()
-                hoje = config.get_now().date()
-            except Exception as e:
-                print(f"⚠️ Erro ao obter config: {e}")
-                hoje = datetime.now().date()
-            registros_hoje = []
-            total_horas = None
-            
-            if self.db:
                 try:
                     registros = self.db.obter_registros_dia(hoje)
-                    print(f"📋 {len(registros) if registros else 0} registros encontrados para {hoje}")
-                    
-                    if registros:
-                        for reg in registros:
-                            data_hora_str = reg[1]
-                            if isinstance(data_hora_str, str):
-                                dt = datetime.strptime(data_hora_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                            else:
-                                dt = data_hora_str
-                            registros_hoje.append(f"  • {dt.strftime('%H:%M')} - {reg[2]}")
-                    
                     total_horas = self.db.calcular_total_horas_dia(hoje)
                 except Exception as e:
                     print(f"⚠️ Erro ao buscar registros: {e}")
             else:
                 print("⚠️ Banco de dados não disponível para obter registros")
             
-            status = "🔴 Pausado" if pausado else "🟢 Ativo"
-            msg = f"<b>📊 Status do Sistema</b>\n\nEstado: {status}\n\n"
-            msg += f"<b>Registros de Hoje ({hoje.strftime('%d/%m')}):</b>\n"
-            
-            if registros_hoje:
-                msg += "\n".join(registros_hoje)
-                if total_horas and total_horas.get('registros_completos'):
-                    msg += f"\n\n📊 Total: {total_horas['total_formatado']}"
-            else:
-                msg += "Nenhum registro"
-            
-            return msg
+            return self._formatar_status(hoje, estado, registros, total_horas)
+        except Exception as e:
+            print(f"❌ Erro ao obter status: {e}")
+            return f"❌ Erro ao obter status: {e}"
+
+    async def mostrar_status_async(self):
+        """Mesmo que mostrar_status, com as três consultas ao banco em paralelo"""
+        if not self.db_async:
+            return await asyncio.to_thread(self.mostrar_status)
+        try:
+            hoje = self._hoje()
+            estado, registros, total_horas = await asyncio.gather(
+                self.db_async.obter_configuracao('sistema_pausado'),
+                self.db_async.obter_registros_dia(hoje),
+                self.db_async.calcular_total_horas_dia(hoje),
+                return_exceptions=True
+            )
+            for resultado in (estado, registros, total_horas):
+                if isinstance(resultado, Exception):
+                    print(f"⚠️ Erro ao consultar banco: {resultado}")
+            return self._formatar_status(
+                hoje,
+                None if isinstance(estado, Exception) else estado,
+                None if isinstance(registros, Exception) else registros,
+                None if isinstance(total_horas, Exception) else total_horas
+            )
         except Exception as e:
             print(f"❌ Erro ao obter status: {e}")
             return f"❌ Erro ao obter status: {e}"
 
+    def _formatar_status(self, hoje, estado, registros, total_horas):
+        pausado = estado == 'true'
+        registros_hoje = []
+        print(f"📋 {len(registros) if registros else 0} registros encontrados para {hoje}")
+        for reg in registros or []:
+            registros_hoje.append(f"  • {reg.data_hora.strftime('%H:%M')} - {reg.tipo}")
+        
+        status = "🔴 Pausado" if pausado else "🟢 Ativo"
+        msg = f"<b>📊 Status do Sistema</b>\n\nEstado: {status}\n\n"
+        msg += f"<b>Registros de Hoje ({hoje.strftime('%d/%m')}):</b>\n"
+        
+        if registros_hoje:
+            msg += "\n".join(registros_hoje)
+            if total_horas and total_horas.get('registros_completos'):
+                msg += f"\n\n📊 Total: {total_horas['total_formatado']}"
+        else:
+            msg += "Nenhum registro"
+        
+        if self.db:
+            from src.utils.estatisticas import formatar_estatisticas
+            msg += "\n\n<b>Banco de Dados:</b>\n"
+            msg += "\n".join(f"• {html.escape(linha)}" for linha in formatar_estatisticas(self.db.estatisticas(limite=3)))
+        
+        return msg
+
     def mostrar_horarios(self):
         """Mostra os horários configurados para registro automático"""
         try:
@@ -556,14 +587,8 @@ on:
             
             msg = "<b>❌ Últimas Falhas (7 dias)</b>\n\n"
             for f in falhas[-5:]:  # Últimas 5
-                data = f[1] if len(f) > 1 else "N/A"
-                if isinstance(data, str):
-                    try:
-                        dt = datetime.strptime(data.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                        data = dt.strftime('%d/%m %H:%M')
-                    except Exception:
-                        pass
-                erro = f[3] if len(f) > 3 else "Erro desconhecido"
+                data = f.data_hora.strftime('%d/%m %H:%M')
+                erro = f.erro or "Erro desconhecido"
                 msg += f"• {data}: {str(erro)[:40]}...\n"
             
             return msg
@@ -579,25 +604,15 @@ on:
             hoje = datetime.now()
             inicio_mes = hoje.replace(day=1)
             
-            # Busca registros do mês
-            registros = self.db.obter_registros_periodo(inicio_mes, hoje)
+            # Um resumo por dia com batidas no mês
+            resumos = self.db.obter_resumos_periodo(inicio_mes, hoje)
             
-            if not registros:
+            if not resumos:
                 return f"📄 Nenhum registro em {hoje.strftime('%B/%Y')}"
             
-            # Conta dias trabalhados
-            dias = set()
-            for reg in registros:
-                data_str = reg[1]
-                if isinstance(data_str, str):
-                    dt = datetime.strptime(data_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                else:
-                    dt = data_str
-                dias.add(dt.date())
-            
             msg = f"<b>📄 Relatório - {hoje.strftime('%B/%Y')}</b>\n\n"
-            msg += f"📅 Dias trabalhados: {len(dias)}\n"
-            msg += f"📝 Total de registros: {len(registros)}\n"
+            msg += f"📅 Dias trabalhados: {len(resumos)}\n"
+            msg += f"📝 Total de registros: {sum(r['batidas'] for r in resumos)}\n"
             
             return msg
         except Exception as e:
@@ -612,42 +627,19 @@ on:
             hoje = datetime.now()
             inicio_ano = hoje.replace(month=1, day=1)
             
-            # Busca registros do ano
-            registros = self.db.obter_registros_periodo(inicio_ano, hoje)
+            # Um resumo por dia com batidas no ano
+            resumos = self.db.obter_resumos_periodo(inicio_ano, hoje)
             
-            if not registros:
+            if not resumos:
                 return f"📅 Nenhum registro em {hoje.year}"
             
-            # Conta dias trabalhados
-            dias = set()
-            total_horas = 0
-            
-            for reg in registros:
-                data_str = reg[1]
-                if isinstance(data_str, str):
-                    dt = datetime.strptime(data_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                else:
-                    dt = data_str
-                dias.add(dt.date())
-            
-            # Calcula total de horas (aproximado)
-            for dia in dias:
-                try:
-                    total = self.db.calcular_total_horas_dia(dia)
-                    if total and total.get('registros_completos'):
-                        # Parse "10h30min" para horas decimais
-                        horas_str = total['total_formatado']
-                        partes = horas_str.split('h')
-                        if len(partes) >= 2:
-                            h = int(partes[0])
-                            m = int(partes[1].replace('min', ''))
-                            total_horas += h + m/60
-                except Exception:
-                    pass
+            # Total de horas (apenas dias com registros completos)
+            total_minutos = sum(r['minutos_trabalhados'] for r in resumos if r['completo'])
+            total_horas = total_minutos / 60
             
             msg = f"<b>📅 Relatório Anual - {hoje.year}</b>\n\n"
-            msg += f"📆 Dias trabalhados: {len(dias)}\n"
-            msg += f"📝 Total de registros: {len(registros)}\n"
+            msg += f"📆 Dias trabalhados: {len(resumos)}\n"
+            msg += f"📝 Total de registros: {sum(r['batidas'] for r in resumos)}\n"
             msg += f"⏰ Horas aproximadas: {int(total_horas)}h\n"
             
             return msg
@@ -788,32 +780,34 @@ on:
         
         return deduplic
     
-    def executar(self):
-        """Loop principal - verifica comandos e mantém sessão ativa se necessário"""
-        try:
-            config = Config.get_instance()
-            print(f"🤖 Telegram Listener iniciado às {config.get_now().strftime('%H:%M:%S')})")
-        except Exception as e:
-            print(f"🤖 Telegram Listener iniciado (erro ao obter hora: {e})")
-        print(f"⏱️ Sessão máxima: {TEMPO_SESSAO // 60} minutos")
-        print(f"📱 Chat ID: {self.chat_id}")
-        
-        inicio = time.time()
-        sessao_ativa = False
-        ultimo_comando = None
-        
-        # Primeira verificação
-        print("🔄 Buscando updates do Telegram...")
-        updates = self.get_updates()
-        print(f"📬 {len(updates)} updates recebidos")
-        
-        # Deduplica comandos repetidos consecutivos
-        comandos_processados = self._deduplica_comandos(updates)
-        print(f"🔄 Após deduplicação: {len(comandos_processados)} comandos únicos")
-        
-        for update in comandos_processados:
+    async def _responder_async(self, texto):
+        """/status usa o banco assíncrono; os demais comandos rodam em thread"""
+        if texto.lower().strip() in ['/status', 'status', '📊 status']:
+            return await self.mostrar_status_async()
+        return await asyncio.to_thread(self.processar_comando, texto)
+
+    async def _chamar_em_ordem(self, anterior, funcao, *args):
+        if anterior is not None:
+            await asyncio.wait([anterior])
+        return await asyncio.to_thread(funcao, *args)
+
+    def _enfileirar_envio(self, funcao, *args):
+        """
+        Agenda uma chamada à API do Telegram depois da anterior, preservando a ordem
+        das respostas no chat, sem esperar por ela: o próximo comando já pode ir ao banco.
+        """
+        self._ultimo_envio = asyncio.ensure_future(self._chamar_em_ordem(self._ultimo_envio, funcao, *args))
+        return self._ultimo_envio
+
+    async def _aguardar_envios(self):
+        if self._ultimo_envio is not None:
+            await asyncio.wait([self._ultimo_envio])
+
+    async def _processar_updates_iniciais(self, updates):
+        """Primeira verificação: responde os comandos e retorna se a sessão deve ficar ativa"""
+        envios = []
+        for update in updates:
             message = update.get('message', {})
-            callback_query = update.get('callback_query', {})
             msg_chat_id = str(message.get('chat', {}).get('id', ''))
             texto = message.get('text', '')
             
@@ -835,20 +829,93 @@ on:
             print(f"⏰ Idade da mensagem: {int(idade)}s ({int(idade/60)}min atrás)")
             
             print(f"🔍 Processando comando: {texto}")
-            resposta = self.processar_comando(texto)
+            resposta = await self._responder_async(texto)
             
             if resposta:
                 print(f"📤 Enviando resposta...")
-                enviado = self.enviar_mensagem(resposta)
-                if enviado:
-                    sessao_ativa = True
-                    ultimo_comando = time.time()
-                    print(f"✅ Resposta enviada com sucesso")
-                else:
-                    print(f"❌ Falha ao enviar resposta")
+                envios.append(self._enfileirar_envio(self.enviar_mensagem, resposta))
             else:
                 print(f"⚠️ Nenhuma resposta para este comando")
         
+        enviados = await asyncio.gather(*envios)
+        for enviado in enviados:
+            print(f"✅ Resposta enviada com sucesso" if enviado else f"❌ Falha ao enviar resposta")
+        return any(enviados)
+
+    async def _processar_updates_sessao(self, updates):
+        """Comandos durante a sessão ativa; os envios seguem em segundo plano"""
+        for update in updates:
+            message = update.get('message', {})
+            callback_query = update.get('callback_query', {})
+            msg_chat_id = str(message.get('chat', {}).get('id', ''))
+            texto = message.get('text', '')
+            
+            # Processa callback_query (clique em botão)
+            if callback_query:
+                callback_id = callback_query.get('id')
+                callback_data = callback_query.get('data', '')
+                user_id = str(callback_query.get('from', {}).get('id', ''))
+                
+                print(f"🔘 Clique em botão: {callback_data} (usuário {user_id})")
+                
+                # Processa a ação do botão
+                resposta = await asyncio.to_thread(self.processar_callback, callback_data)
+                
+                # Responde ao callback (remove loading do botão)
+                self._enfileirar_envio(self.responder_callback, callback_id, f"✅ {callback_data}")
+                
+                # Envia resposta como mensagem
+                if resposta:
+                    self._enfileirar_envio(self.enviar_mensagem, resposta)
+                
+                continue
+            
+            if msg_chat_id != self.chat_id:
+                continue
+            
+            print(f"📨 Comando durante sessão: {texto}")
+            resposta = await self._responder_async(texto)
+            
+            if resposta:
+                self._enfileirar_envio(self.enviar_mensagem, resposta)
+    
+    def executar(self):
+        """Loop principal - verifica comandos e mantém sessão ativa se necessário"""
+        try:
+            config = Config.get_instance()
+            print(f"🤖 Telegram Listener iniciado às {config.get_now().strftime('%H:%M:%S')})")
+        except Exception as e:
+            print(f"🤖 Telegram Listener iniciado (erro ao obter hora: {e})")
+        print(f"⏱️ Sessão máxima: {TEMPO_SESSAO // 60} minutos")
+        print(f"📱 Chat ID: {self.chat_id}")
+        
+        # Event loop próprio: consultas ao banco e envios ao Telegram se sobrepõem
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        if self.db:
+            try:
+                from src.utils.database_async import DatabaseAsync
+                self.db_async = DatabaseAsync(self.db)
+                self._loop.run_until_complete(self.db_async.abrir())
+            except Exception as e:
+                print(f"⚠️ Banco assíncrono indisponível: {e}")
+                self.db_async = None
+        
+        inicio = time.time()
+        
+        # Primeira verificação
+        print("🔄 Buscando updates do Telegram...")
+        updates = self.get_updates()
+        print(f"📬 {len(updates)} updates recebidos")
+        
+        # Deduplica comandos repetidos consecutivos
+        comandos_processados = self._deduplica_comandos(updates)
+        print(f"🔄 Após deduplicação: {len(comandos_processados)} comandos únicos")
+        
+        sessao_ativa = self._loop.run_until_complete(
+            self._processar_updates_iniciais(comandos_processados)
+        )
+        
         # Se houve comando, mantém sessão ativa por 5 minutos
         if sessao_ativa:
             print("🟢 Ativando sessão ativa...")
@@ -856,7 +923,8 @@ on:
             print("🔄 Sessão ativa - aguardando mais comandos...")
             
             while (time.time() - inicio) < TEMPO_SESSAO:
-                time.sleep(INTERVALO_POLLING)
+                # Respostas pendentes continuam sendo enviadas durante a espera e o polling
+                self._loop.run_until_complete(asyncio.sleep(INTERVALO_POLLING))
                 
                 tempo_passado = int(time.time() - inicio)
                 
@@ -866,56 +934,16 @@ on:
                     print(f"⏱️ {restante} minuto(s) restantes na sessão")
                 
                 print(f"🔄 Polling ({tempo_passado}s)...")
-                updates = self.get_updates()
+                updates = self._loop.run_until_complete(asyncio.to_thread(self.get_updates))
                 print(f"📬 {len(updates)} updates")
                 
                 # Deduplica também na sessão ativa
                 comandos_processados = self._deduplica_comandos(updates)
                 print(f"🔄 Após deduplicação: {len(comandos_processados)} únicos")
                 
-                for update in comandos_processados:
-                    message = update.get('message', {})
-                    callback_query = update.get('callback_query', {})
-                    msg_chat_id = str(message.get('chat', {}).get('id', ''))
-                    texto = message.get('text', '')
-                    
-                    # Processa callback_query (clique em botão)
-                    if callback_query:
-                        callback_id = callback_query.get('id')
-                        callback_data = callback_query.get('data', '')
-                        user_id = str(callback_query.get('from', {}).get('id', ''))
-                        
-                        print(f"🔘 Clique em botão: {callback_data} (usuário {user_id})")
-                        
-                        # Processa a ação do botão
-                        resposta = self.processar_callback(callback_data)
-                        
-                        # Responde ao callback (remove loading do botão)
-                        self.responder_callback(callback_id, f"✅ {callback_data}")
-                        
-                        # Envia resposta como mensagem
-                        if resposta:
-                            enviado = self.enviar_mensagem(resposta)
-                            if enviado:
-                                ultimo_comando = time.time()
-                                print(f"✅ Resposta enviada")
-                        
-                        continue
-                    
-                    if msg_chat_id != self.chat_id:
-                        continue
-                    
-                    print(f"📨 Comando durante sessão: {texto}")
-                    resposta = self.processar_comando(texto)
-                    
-                    if resposta:
-                        enviado = self.enviar_mensagem(resposta)
-                        if enviado:
-                            ultimo_comando = time.time()
-                            print(f"✅ Resposta enviada")
-                        else:
-                            print(f"❌ Falha ao enviar")
+                self._loop.run_until_complete(self._processar_updates_sessao(comandos_processados))
             
+            self._loop.run_until_complete(self._aguardar_envios())
             print("⏱️ Sessão expirou")
             self.enviar_mensagem("🔴 Sessão encerrada. Envie um comando para reativar.")
         else:
@@ -928,6 +956,13 @@ on:
             except Exception:
                 pass
         
+        if self.db_async:
+            self._loop.run_until_complete(self.db_async.fechar(fechar_database=False))
+        self._loop.close()
+        
+        if self.db:
+            self.db.fechar()
+        
         # Salva o estado para próxima execução
         self._salvar_ultimo_update_id()
         
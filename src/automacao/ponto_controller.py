@@ -137,11 +137,16 @@ class AutomacaoPonto:
             
             if sucesso:
                 agora = datetime.now()
-                self.db.registrar_ponto(
-                    agora,
-                    "MANUAL" if force else "AUTOMATICO",
-                    "SUCESSO"
-                )
+                # Batida e horas do dia entram juntas ou nenhuma entra. O ponto já foi batido
+                # no sistema: uma falha do banco é registrada, mas não muda o resultado
+                try:
+                    with self.db.transacao():
+                        if not self.db.registrar_ponto(agora, "MANUAL" if force else "AUTOMATICO", "SUCESSO"):
+                            raise Exception("Ponto registrado no sistema, mas não gravado no banco")
+                        self.db.recalcular_horas_periodo(agora, agora)
+                except Exception as e:
+                    self.logger.error(f"Erro ao gravar ponto no banco: {e}")
+                    self.db.registrar_falha("registro_ponto_banco", str(e))
                 self._notificar_sucesso(agora)
                 return {'sucesso': True, 'mensagem': 'Ponto registrado com sucesso'}
             
@@ -424,8 +429,8 @@ class AutomacaoPonto:
             
             if len(registros) % 2 == 0:  # Par de registros (entrada/saída)
                 ultimo_par = registros[-2:]  # Pega últimos dois registros
-                entrada = datetime.strptime(ultimo_par[0][1], '%Y-%m-%d %H:%M:%S')
-                saida = datetime.strptime(ultimo_par[1][1], '%Y-%m-%d %H:%M:%S')
+                entrada = ultimo_par[0].data_hora
+                saida = ultimo_par[1].data_hora
                 
                 # Calcula horas trabalhadas
                 delta = saida - entrada
@@ -35,10 +35,10 @@ class ProcessadorDados:
             saidas = []
             
             for registro in registros:
-                if registro[2] == 'ENTRADA':
-                    entradas.append(datetime.strptime(registro[1], '%Y-%m-%d %H:%M:%S'))
+                if registro.tipo == 'ENTRADA':
+                    entradas.append(registro.data_hora)
                 else:
-                    saidas.append(datetime.strptime(registro[1], '%Y-%m-%d %H:%M:%S'))
+                    saidas.append(registro.data_hora)
 
             horas_normais = 0
             horas_extras = {
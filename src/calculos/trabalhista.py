@@ -110,7 +110,6 @@ class ProcessadorFolha:
             else:
                 fim_periodo = datetime(ano, mes + 1, 20)
 
-            registros = self.db.obter_registros_periodo(inicio_periodo, fim_periodo)
             horas_trabalhadas = self.db.obter_horas_trabalhadas_periodo(inicio_periodo, fim_periodo)
             
             totais = {
@@ -136,10 +135,10 @@ class ProcessadorFolha:
             return None
 
     def acumular_horas(self, registro, totais):
-        totais['horas_normais'] += registro[4]
-        for idx, tipo in enumerate(['60', '65', '75', '100', '150']):
-            totais['horas_extras'][tipo] += registro[5 + idx]
-        totais['horas_noturnas'] += registro[10]
+        totais['horas_normais'] += registro.horas_normais
+        for tipo in ['60', '65', '75', '100', '150']:
+            totais['horas_extras'][tipo] += getattr(registro, f'horas_extras_{tipo}')
+        totais['horas_noturnas'] += registro.horas_noturnas
 
     def calcular_valores(self, totais):
         try:
@@ -29,14 +29,6 @@ class GeradorRelatorios:
         self.logger = logging.getLogger('GeradorRelatorios')
         self.styles = getSampleStyleSheet()
 
-    def _parse_datetime(self, value):
-        try:
-            if isinstance(value, str) and '.' in value:
-                value = value.split('.')[0]
-            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-        except Exception:
-            return datetime.strptime(str(value), '%Y-%m-%d %H:%M:%S')
-
     def gerar_relatorio_mensal(self, mes, ano, formato='pdf'):
         try:
             # Use self.config para caminhos, se necessário
@@ -49,10 +41,11 @@ class GeradorRelatorios:
             else:
                 fim = datetime(ano, mes + 1, 20)
 
+            # Registros, horas e falhas são lidos em streaming; cada formato percorre uma vez
             dados = {
-                'registros': self.db.obter_registros_periodo(inicio, fim),
-                'horas': self.db.obter_horas_trabalhadas_periodo(inicio, fim),
-                'falhas': self.db.obter_falhas_periodo(inicio, fim),
+                'registros': self.db.iter_registros_periodo(inicio, fim),
+                'horas': self.db.iter_horas_trabalhadas_periodo(inicio, fim),
+                'falhas': self.db.iter_falhas_periodo(inicio, fim),
                 'calculos': self.db.obter_calculo_mensal(mes, ano)
             }
 
@@ -117,9 +110,9 @@ class GeradorRelatorios:
            elements.append(financeiro_table)
 
            # Falhas
-           if dados['falhas']:
+           falhas_table = self.criar_tabela_falhas(dados['falhas'])
+           if falhas_table is not None:
                elements.append(Paragraph("Registro de Falhas", self.styles['Heading2']))
-               falhas_table = self.criar_tabela_falhas(dados['falhas'])
                elements.append(falhas_table)
 
            doc.build(elements)
@@ -132,13 +125,13 @@ class GeradorRelatorios:
     def criar_tabela_registros(self, registros):
        data = [['Data', 'Hora', 'Tipo', 'Status', 'Motivo']]
        for reg in registros:
-           dt = self._parse_datetime(reg[1])
+           dt = reg.data_hora
            data.append([
                dt.strftime('%d/%m/%Y'),
                dt.strftime('%H:%M:%S'),
-               reg[2],
-               reg[3],
-               reg[4] or ''
+               reg.tipo,
+               reg.status,
+               reg.motivo or ''
            ])
        
        return self.formatar_tabela(data)
@@ -151,14 +144,14 @@ class GeradorRelatorios:
        
        for h in horas:
            data.append([
-               datetime.strptime(h[1], '%Y-%m-%d').strftime('%d/%m/%Y'),
-               f"{h[4]:.2f}",
-               f"{h[5]:.2f}",
-               f"{h[6]:.2f}",
-               f"{h[7]:.2f}",
-               f"{h[8]:.2f}",
-               f"{h[9]:.2f}",
-               f"{h[10]:.2f}"
+               h.data.strftime('%d/%m/%Y'),
+               f"{h.horas_normais:.2f}",
+               f"{h.horas_extras_60:.2f}",
+               f"{h.horas_extras_65:.2f}",
+               f"{h.horas_extras_75:.2f}",
+               f"{h.horas_extras_100:.2f}",
+               f"{h.horas_extras_150:.2f}",
+               f"{h.horas_noturnas:.2f}"
            ])
        
        return self.formatar_tabela(data)
@@ -169,19 +162,19 @@ class GeradorRelatorios:
            
        data = [
            ['Descrição', 'Valor'],
-           ['Salário Base', f"R$ {calculos[3]:.2f}"],
-           ['Periculosidade', f"R$ {calculos[4]:.2f}"],
-           ['Adicional Noturno', f"R$ {calculos[5]:.2f}"],
-           ['Horas Extras', f"R$ {calculos[6]:.2f}"],
-           ['DSR', f"R$ {calculos[7]:.2f}"],
-           ['Total Proventos', f"R$ {calculos[8]:.2f}"],
-           ['INSS', f"R$ {calculos[9]:.2f}"],
-           ['IRRF', f"R$ {calculos[10]:.2f}"],
-           ['Outros Descontos', f"R$ {calculos[11]:.2f}"],
-           ['Total Descontos', f"R$ {calculos[12]:.2f}"],
-           ['Líquido', f"R$ {calculos[13]:.2f}"],
-           ['Base FGTS', f"R$ {calculos[14]:.2f}"],
-           ['FGTS', f"R$ {calculos[15]:.2f}"]
+           ['Salário Base', f"R$ {calculos.salario_base:.2f}"],
+           ['Periculosidade', f"R$ {calculos.periculosidade:.2f}"],
+           ['Adicional Noturno', f"R$ {calculos.adicional_noturno:.2f}"],
+           ['Horas Extras', f"R$ {calculos.horas_extras:.2f}"],
+           ['DSR', f"R$ {calculos.dsr:.2f}"],
+           ['Total Proventos', f"R$ {calculos.total_proventos:.2f}"],
+           ['INSS', f"R$ {calculos.inss:.2f}"],
+           ['IRRF', f"R$ {calculos.irrf:.2f}"],
+           ['Outros Descontos', f"R$ {calculos.outros_descontos:.2f}"],
+           ['Total Descontos', f"R$ {calculos.total_descontos:.2f}"],
+           ['Líquido', f"R$ {calculos.liquido:.2f}"],
+           ['Base FGTS', f"R$ {calculos.base_fgts:.2f}"],
+           ['FGTS', f"R$ {calculos.fgts:.2f}"]
        ]
        
        return self.formatar_tabela(data)
@@ -189,14 +182,16 @@ class GeradorRelatorios:
     def criar_tabela_falhas(self, falhas):
        data = [['Data/Hora', 'Tipo', 'Erro', 'Detalhes']]
        for f in falhas:
-           dt = self._parse_datetime(f[1])
+           dt = f.data_hora
            data.append([
                dt.strftime('%d/%m/%Y %H:%M:%S'),
-               f[2],
-               f[3],
-               f[4] or ''
+               f.tipo,
+               f.erro,
+               f.detalhes or ''
            ])
-       
+
+       if len(data) == 1:
+           return None
        return self.formatar_tabela(data)
 
     def formatar_tabela(self, data):
@@ -219,9 +214,10 @@ class GeradorRelatorios:
        ]))
        return table
 
-    def gerar_csv_mensal(self, dados, mes, ano):
+    def gerar_csv_mensal(self, dados, mes, ano, filename=None):
        try:
-           filename = f"relatorio_mensal_{mes}_{ano}.csv"
+           if not filename:
+               filename = f"relatorio_mensal_{mes}_{ano}.csv"
            with open(filename, 'w', newline='') as csvfile:
                writer = csv.writer(csvfile)
                
@@ -233,11 +229,11 @@ class GeradorRelatorios:
                writer.writerow(['REGISTROS DE PONTO'])
                writer.writerow(['Data', 'Hora', 'Tipo', 'Status', 'Motivo'])
                for reg in dados['registros']:
-                   dt = self._parse_datetime(reg[1])
+                   dt = reg.data_hora
                    writer.writerow([
                        dt.strftime('%d/%m/%Y'),
                        dt.strftime('%H:%M:%S'),
-                       reg[2], reg[3], reg[4] or ''
+                       reg.tipo, reg.status, reg.motivo or ''
                    ])
                writer.writerow([])
                
@@ -249,10 +245,10 @@ class GeradorRelatorios:
                ])
                for h in dados['horas']:
                    writer.writerow([
-                       datetime.strptime(h[1], '%Y-%m-%d').strftime('%d/%m/%Y'),
-                       f"{h[4]:.2f}", f"{h[5]:.2f}", f"{h[6]:.2f}",
-                       f"{h[7]:.2f}", f"{h[8]:.2f}", f"{h[9]:.2f}",
-                       f"{h[10]:.2f}"
+                       h.data.strftime('%d/%m/%Y'),
+                       f"{h.horas_normais:.2f}", f"{h.horas_extras_60:.2f}", f"{h.horas_extras_65:.2f}",
+                       f"{h.horas_extras_75:.2f}", f"{h.horas_extras_100:.2f}", f"{h.horas_extras_150:.2f}",
+                       f"{h.horas_noturnas:.2f}"
                    ])
                
            return filename
@@ -260,9 +256,10 @@ class GeradorRelatorios:
            self.logger.error(f"Erro ao gerar CSV: {e}")
            return None
 
-    def gerar_json_mensal(self, dados, mes, ano):
+    def gerar_json_mensal(self, dados, mes, ano, filename=None):
        try:
-           filename = f"relatorio_mensal_{mes}_{ano}.json"
+           if not filename:
+               filename = f"relatorio_mensal_{mes}_{ano}.json"
            
            json_data = {
                'periodo': {
@@ -276,42 +273,42 @@ class GeradorRelatorios:
            }
 
            for reg in dados['registros']:
-               dt = self._parse_datetime(reg[1])
+               dt = reg.data_hora
                json_data['registros'].append({
                    'data': dt.strftime('%d/%m/%Y'),
                    'hora': dt.strftime('%H:%M:%S'),
-                   'tipo': reg[2],
-                   'status': reg[3],
-                   'motivo': reg[4]
+                   'tipo': reg.tipo,
+                   'status': reg.status,
+                   'motivo': reg.motivo
                })
 
            for h in dados['horas']:
                json_data['horas'].append({
-                   'data': datetime.strptime(h[1], '%Y-%m-%d').strftime('%d/%m/%Y'),
-                   'horas_normais': h[4],
-                   'he_60': h[5],
-                   'he_65': h[6],
-                   'he_75': h[7],
-                   'he_100': h[8],
-                   'he_150': h[9],
-                   'noturnas': h[10]
+                   'data': h.data.strftime('%d/%m/%Y'),
+                   'horas_normais': h.horas_normais,
+                   'he_60': h.horas_extras_60,
+                   'he_65': h.horas_extras_65,
+                   'he_75': h.horas_extras_75,
+                   'he_100': h.horas_extras_100,
+                   'he_150': h.horas_extras_150,
+                   'noturnas': h.horas_noturnas
                })
 
            if dados['calculos']:
                json_data['calculos'] = {
-                   'salario_base': dados['calculos'][3],
-                   'periculosidade': dados['calculos'][4],
-                   'adicional_noturno': dados['calculos'][5],
-                   'horas_extras': dados['calculos'][6],
-                   'dsr': dados['calculos'][7],
-                   'total_proventos': dados['calculos'][8],
-                   'inss': dados['calculos'][9],
-                   'irrf': dados['calculos'][10],
-                   'outros_descontos': dados['calculos'][11],
-                   'total_descontos': dados['calculos'][12],
-                   'liquido': dados['calculos'][13],
-                   'base_fgts': dados['calculos'][14],
-                   'fgts': dados['calculos'][15]
+                   'salario_base': dados['calculos'].salario_base,
+                   'periculosidade': dados['calculos'].periculosidade,
+                   'adicional_noturno': dados['calculos'].adicional_noturno,
+                   'horas_extras': dados['calculos'].horas_extras,
+                   'dsr': dados['calculos'].dsr,
+                   'total_proventos': dados['calculos'].total_proventos,
+                   'inss': dados['calculos'].inss,
+                   'irrf': dados['calculos'].irrf,
+                   'outros_descontos': dados['calculos'].outros_descontos,
+                   'total_descontos': dados['calculos'].total_descontos,
+                   'liquido': dados['calculos'].liquido,
+                   'base_fgts': dados['calculos'].base_fgts,
+                   'fgts': dados['calculos'].fgts
                }
 
            with open(filename, 'w') as jsonfile:
@@ -328,18 +325,13 @@ class GeradorRelatorios:
             fim = datetime(ano, 12, 31)
             
             dados = {
-                'registros': self.db.obter_registros_periodo(inicio, fim),
+                'registros': self.db.iter_registros_periodo(inicio, fim),
                 'horas': self.db.obter_horas_trabalhadas_periodo(inicio, fim),
-                'falhas': self.db.obter_falhas_periodo(inicio, fim),
-                'calculos': []
+                'falhas': self.db.iter_falhas_periodo(inicio, fim),
+                # Cálculos de todos os meses em uma consulta
+                'calculos': self.db.obter_calculos_periodo(ano, 1, ano, 12)
             }
             
-            # Coleta cálculos de todos os meses
-            for mes in range(1, 13):
-                calculo = self.db.obter_calculo_mensal(mes, ano)
-                if calculo:
-                    dados['calculos'].append(calculo)
-            
             if formato == 'pdf':
                 return self.gerar_pdf_anual(dados, ano)
             elif formato == 'csv':
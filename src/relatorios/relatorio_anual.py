@@ -34,7 +34,7 @@ class RelatorioAnual:
 
    def _coletar_dados_anuais(self, ano):
        dados = {
-           'registros': [],
+           'jornadas': [],
            'horas': [],
            'calculos': [],
            'falhas': []
@@ -43,17 +43,15 @@ class RelatorioAnual:
        inicio = date(ano, 1, 1)
        fim = date(ano, 12, 31)
        
-       # Coleta todos os dados do ano
-       dados['registros'] = self.db.obter_registros_periodo(inicio, fim)
+       # Coleta todos os dados do ano; as batidas já vêm agregadas pelo banco
+       # (uma jornada por dia) e as falhas em streaming, sem carregar o ano em memória
+       dados['jornadas'] = self.db.obter_jornadas_periodo(inicio, fim)
        dados['horas'] = self.db.obter_horas_trabalhadas_periodo(inicio, fim)
        
-       # Coleta cálculos mensais
-       for mes in range(1, 13):
-           calculo = self.db.obter_calculo_mensal(mes, ano)
-           if calculo:
-               dados['calculos'].append(calculo)
+       # Coleta cálculos mensais (uma consulta para o ano todo)
+       dados['calculos'] = self.db.obter_calculos_periodo(ano, 1, ano, 12)
                
-       dados['falhas'] = self.db.obter_falhas_periodo(inicio, fim)
+       dados['falhas'] = self.db.iter_falhas_periodo(inicio, fim)
        
        return dados
 
@@ -86,25 +84,25 @@ class RelatorioAnual:
        
        # Processa dados financeiros
        for calc in dados['calculos']:
-           resumo['financeiro']['total_proventos'] += calc[8]  # total_proventos
-           resumo['financeiro']['total_descontos'] += calc[12] # total_descontos
-           resumo['financeiro']['total_liquido'] += calc[13]   # liquido
-           resumo['financeiro']['total_fgts'] += calc[15]      # fgts
-           resumo['financeiro']['total_inss'] += calc[9]       # inss
-           resumo['financeiro']['total_irrf'] += calc[10]      # irrf
+           resumo['financeiro']['total_proventos'] += calc.total_proventos
+           resumo['financeiro']['total_descontos'] += calc.total_descontos
+           resumo['financeiro']['total_liquido'] += calc.liquido
+           resumo['financeiro']['total_fgts'] += calc.fgts
+           resumo['financeiro']['total_inss'] += calc.inss
+           resumo['financeiro']['total_irrf'] += calc.irrf
            
        # Processa horas
        for hora in dados['horas']:
-           resumo['horas']['normais'] += hora[4]
-           resumo['horas']['extras_60'] += hora[5]
-           resumo['horas']['extras_65'] += hora[6]
-           resumo['horas']['extras_75'] += hora[7]
-           resumo['horas']['extras_100'] += hora[8]
-           resumo['horas']['extras_150'] += hora[9]
-           resumo['horas']['noturnas'] += hora[10]
+           resumo['horas']['normais'] += hora.horas_normais
+           resumo['horas']['extras_60'] += hora.horas_extras_60
+           resumo['horas']['extras_65'] += hora.horas_extras_65
+           resumo['horas']['extras_75'] += hora.horas_extras_75
+           resumo['horas']['extras_100'] += hora.horas_extras_100
+           resumo['horas']['extras_150'] += hora.horas_extras_150
+           resumo['horas']['noturnas'] += hora.horas_noturnas
            
        # Calcula indicadores
-       total_dias = len(set(r[1].split()[0] for r in dados['registros']))
+       total_dias = len(dados['jornadas'])
        resumo['indicadores']['dias_trabalhados'] = total_dias
        
        total_he = sum([
@@ -131,13 +129,13 @@ class RelatorioAnual:
        # Cria DataFrame com dados mensais
        df_mensal = pd.DataFrame([
            {
-               'Mês': calendar.month_name[calc[1]],
-               'Proventos': calc[8],
-               'Horas Extras': sum([
-                   dados['horas'][i][5:10] 
-                   for i in range(len(dados['horas']))
-                   if dados['horas'][i][1].startswith(f"{ano}-{calc[1]:02d}")
-               ])
+               'Mês': calendar.month_name[calc.mes],
+               'Proventos': calc.total_proventos,
+               'Horas Extras': sum(
+                   h.horas_extras
+                   for h in dados['horas']
+                   if h.data.month == calc.mes
+               )
            }
            for calc in dados['calculos']
        ])
@@ -287,10 +285,10 @@ class RelatorioAnual:
                'resumo': resumo,
                'dados_mensais': [
                    {
-                       'mes': calc[1],
-                       'proventos': calc[8],
-                       'descontos': calc[12],
-                       'liquido': calc[13]
+                       'mes': calc.mes,
+                       'proventos': calc.total_proventos,
+                       'descontos': calc.total_descontos,
+                       'liquido': calc.liquido
                    }
                    for calc in dados['calculos']
                ]
@@ -310,18 +308,13 @@ class RelatorioAnual:
             fim = datetime(ano, 12, 31)
             
             dados = {
-                'registros': self.db.obter_registros_periodo(inicio, fim),
+                'registros': self.db.iter_registros_periodo(inicio, fim),
                 'horas': self.db.obter_horas_trabalhadas_periodo(inicio, fim),
-                'falhas': self.db.obter_falhas_periodo(inicio, fim),
-                'calculos': []
+                'falhas': self.db.iter_falhas_periodo(inicio, fim),
+                # Cálculos de todos os meses em uma consulta
+                'calculos': self.db.obter_calculos_periodo(ano, 1, ano, 12)
             }
             
-            # Coleta cálculos de todos os meses
-            for mes in range(1, 13):
-                calculo = self.db.obter_calculo_mensal(mes, ano)
-                if calculo:
-                    dados['calculos'].append(calculo)
-            
             if formato == 'pdf':
                 return self.gerar_pdf_anual(dados, ano)
             elif formato == 'csv':
@@ -12,6 +12,7 @@ import requests
 import logging
 from datetime import datetime, timedelta
 import json
+import html
 from config.config import Config
 from src.utils.timezone_helper import get_now
 
@@ -23,6 +24,7 @@ if project_root not in sys.path:
 # Local imports
 from src.relatorios.gerador_relatorios import GeradorRelatorios
 from src.utils.database import Database
+from src.utils.estatisticas import formatar_estatisticas
 
 class TelegramController:
     def __init__(self, token, chat_id, database, gerador_relatorios):
@@ -291,8 +293,8 @@ class TelegramController:
             registros = self.db.obter_registros_dia(hoje) if self.db else []
             
             # Conta entradas e saídas
-            entradas = sum(1 for r in registros if r[2].lower() == 'entrada')
-            saidas = sum(1 for r in registros if r[2].lower() == 'saida')
+            entradas = sum(1 for r in registros if r.tipo.lower() == 'entrada')
+            saidas = sum(1 for r in registros if r.tipo.lower() == 'saida')
             
             # Se entradas > saídas, próximo é saída
             if entradas > saidas:
@@ -326,13 +328,7 @@ class TelegramController:
                     # Já existe registro neste período
                     registros_info = []
                     for reg in registros_periodo:
-                        data_hora_str = reg[1]
-                        if isinstance(data_hora_str, str):
-                            dt = datetime.strptime(data_hora_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                        else:
-                            dt = data_hora_str
-                        tipo = reg[2]
-                        registros_info.append(f"  • {dt.strftime('%H:%M')} - {tipo}")
+                        registros_info.append(f"  • {reg.data_hora.strftime('%H:%M')} - {reg.tipo}")
                     
                     msg = (
                         f"⚠️ Já existe(m) registro(s) neste período ({periodo_nome}):\n"
@@ -434,8 +430,7 @@ class TelegramController:
 
             if registros_hoje:
                 for reg in registros_hoje:
-                    dt = datetime.strptime(reg[1].split('.')[0], '%Y-%m-%d %H:%M:%S')
-                    msg += f"• {dt.strftime('%H:%M')} - {reg[2]} ({reg[3]})\n"
+                    msg += f"• {reg.data_hora.strftime('%H:%M')} - {reg.tipo} ({reg.status})\n"
             else:
                 msg += "Nenhum registro hoje\n"
 
@@ -443,13 +438,13 @@ class TelegramController:
             if horas_hoje:
                 h = horas_hoje[0]
                 msg += (
-                    f"• Normais: {float(h[4]):.2f}h\n"
-                    f"• Extras 60%: {float(h[5]):.2f}h\n"
-                    f"• Extras 65%: {float(h[6]):.2f}h\n"
-                    f"• Extras 75%: {float(h[7]):.2f}h\n"
-                    f"• Extras 100%: {float(h[8]):.2f}h\n"
-                    f"• Extras 150%: {float(h[9]):.2f}h\n"
-                    f"• Noturnas: {float(h[10]):.2f}h\n"
+                    f"• Normais: {float(h.horas_normais):.2f}h\n"
+                    f"• Extras 60%: {float(h.horas_extras_60):.2f}h\n"
+                    f"• Extras 65%: {float(h.horas_extras_65):.2f}h\n"
+                    f"• Extras 75%: {float(h.horas_extras_75):.2f}h\n"
+                    f"• Extras 100%: {float(h.horas_extras_100):.2f}h\n"
+                    f"• Extras 150%: {float(h.horas_extras_150):.2f}h\n"
+                    f"• Noturnas: {float(h.horas_noturnas):.2f}h\n"
                 )
             else:
                 msg += "Nenhuma hora registrada hoje\n"
@@ -467,6 +462,10 @@ class TelegramController:
             else:
                 msg += "• Horários próximos: Indisponíveis\n"
 
+            msg += "\n<b>Banco de Dados:</b>\n"
+            for linha in formatar_estatisticas(self.db.estatisticas(limite=3)):
+                msg += f"• {html.escape(linha)}\n"
+
             self.enviar_mensagem(msg)
 
         except Exception as e:
@@ -530,12 +529,11 @@ class TelegramController:
 
             msg = f"📋 *Registro de Falhas - Últimos {dias} dias*\n\n"
             for f in falhas:
-                dt = datetime.strptime(f[1], '%Y-%m-%d %H:%M:%S')
                 msg += (
-                    f"*Data:* {dt.strftime('%d/%m/%Y %H:%M:%S')}\n"
-                    f"*Tipo:* {f[2]}\n"
-                    f"*Erro:* {f[3]}\n"
-                    f"*Detalhes:* {f[4] or 'N/A'}\n"
+                    f"*Data:* {f.data_hora.strftime('%d/%m/%Y %H:%M:%S')}\n"
+                    f"*Tipo:* {f.tipo}\n"
+                    f"*Erro:* {f.erro}\n"
+                    f"*Detalhes:* {f.detalhes or 'N/A'}\n"
                     f"{'_'*30}\n\n"
                 )
 
@@ -646,24 +644,24 @@ class TelegramController:
             }
 
             for h in horas:
-                data = datetime.strptime(h[1], '%Y-%m-%d').strftime('%d/%m/%Y')
+                data = h.data.strftime('%d/%m/%Y')
                 msg += f"📅 *{data}:*\n"
-                msg += f"• Normais: {float(h[4]):.2f}h\n"
-                msg += f"• HE 60%: {float(h[5]):.2f}h\n"
-                msg += f"• HE 65%: {float(h[6]):.2f}h\n"
-                msg += f"• HE 75%: {float(h[7]):.2f}h\n"
-                msg += f"• HE 100%: {float(h[8]):.2f}h\n"
-                msg += f"• HE 150%: {float(h[9]):.2f}h\n"
-                msg += f"• Noturnas: {float(h[10]):.2f}h\n"
+                msg += f"• Normais: {float(h.horas_normais):.2f}h\n"
+                msg += f"• HE 60%: {float(h.horas_extras_60):.2f}h\n"
+                msg += f"• HE 65%: {float(h.horas_extras_65):.2f}h\n"
+                msg += f"• HE 75%: {float(h.horas_extras_75):.2f}h\n"
+                msg += f"• HE 100%: {float(h.horas_extras_100):.2f}h\n"
+                msg += f"• HE 150%: {float(h.horas_extras_150):.2f}h\n"
+                msg += f"• Noturnas: {float(h.horas_noturnas):.2f}h\n"
                 msg += f"{'_'*30}\n\n"
 
-                total_horas['normais'] += float(h[4])
-                total_horas['he_60'] += float(h[5])
-                total_horas['he_65'] += float(h[6])
-                total_horas['he_75'] += float(h[7])
-                total_horas['he_100'] += float(h[8])
-                total_horas['he_150'] += float(h[9])
-                total_horas['noturnas'] += float(h[10])
+                total_horas['normais'] += float(h.horas_normais)
+                total_horas['he_60'] += float(h.horas_extras_60)
+                total_horas['he_65'] += float(h.horas_extras_65)
+                total_horas['he_75'] += float(h.horas_extras_75)
+                total_horas['he_100'] += float(h.horas_extras_100)
+                total_horas['he_150'] += float(h.horas_extras_150)
+                total_horas['noturnas'] += float(h.horas_noturnas)
 
             msg += "*📊 Totais do Período:*\n"
             total_geral = 0
@@ -0,0 +1,405 @@
+# src/utils/armazenamento.py
+"""
+Interface comum dos backends de armazenamento do ponto.
+
+`Armazenamento` define os métodos que o resto do sistema (automação, cálculos,
+relatórios, listener) usa e implementa a parte que não depende de onde os dados
+ficam: pareamento de batidas, resumo do dia, distribuição de horas e banco de
+horas. Cada backend implementa só a leitura e a gravação:
+
+- `Database` (src/utils/database.py): SQLite ou Postgres, conforme DATABASE_URL
+- `DatabaseMemoria` (src/utils/database_memoria.py): tudo em memória, para
+  benchmarks e testes sem disco nem rede
+
+`abrir_armazenamento()` escolhe o backend por nome (DB_BACKEND) ou por
+'modulo:Classe', então um backend novo não exige mudar quem o usa.
+"""
+
+import importlib
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from src.utils.estatisticas import EstatisticasConsultas
+from src.utils.linhas import para_data, para_datetime
+
+# Jornada diária usada para separar horas extras no resumo diário
+JORNADA_MINUTOS = 8 * 60
+
+# Backends conhecidos por abrir_armazenamento: nome -> 'modulo:Classe' (importado só quando usado)
+BACKENDS = {
+    'sql': 'src.utils.database:Database',
+    'memoria': 'src.utils.database_memoria:DatabaseMemoria',
+}
+
+
+def abrir_armazenamento(backend=None, **kwargs):
+    """
+    Instancia o backend `backend` (padrão: DB_BACKEND ou 'sql'), que pode ser um nome de
+    BACKENDS ou 'modulo:Classe'. Os kwargs vão para o construtor do backend.
+    """
+    backend = backend or os.getenv('DB_BACKEND', 'sql')
+    caminho = BACKENDS.get(backend, backend)
+    modulo, separador, classe = caminho.partition(':')
+    if not separador:
+        raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+    return getattr(importlib.import_module(modulo), classe)(**kwargs)
+
+
+class Armazenamento(ABC):
+    """
+    Base dos backends. As subclasses definem `backend`, `funcionario_id` e `logger`
+    e implementam os métodos abstratos abaixo; um backend incompleto falha já ao ser
+    instanciado, não no meio de um relatório.
+    """
+
+    backend = None
+
+    # Batidas
+
+    @abstractmethod
+    def registrar_ponto(self, data_hora, tipo, status, motivo=None, funcionario_id=None, chave=None):
+        """Grava a batida só se nem `chave` nem a chave padrão (_chave_registro) foram usadas"""
+
+    @abstractmethod
+    def registrar_pontos_em_lote(self, registros, funcionario_id=None):
+        """Insere (data_hora, tipo, status[, motivo]) ignorando repetidos; retorna quantos entraram"""
+
+    @abstractmethod
+    def obter_registros_dia(self, data, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_registros_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def iter_registros_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_ultimo_registro(self, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_jornadas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_resumo_dia(self, data, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_resumos_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        ...
+
+    # Horas, banco de horas e cálculos mensais
+
+    @abstractmethod
+    def salvar_horas_trabalhadas_dia(self, data, horas, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def recalcular_horas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_horas_trabalhadas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def iter_horas_trabalhadas_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_saldo_banco_horas(self, data_ref=None, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def salvar_calculo_mensal(self, dados, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_calculo_mensal(self, mes, ano, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_calculos_periodo(self, ano_inicio, mes_inicio, ano_fim, mes_fim, funcionario_id=None):
+        ...
+
+    # Falhas, configurações e funcionários
+
+    @abstractmethod
+    def registrar_falha(self, tipo, erro, detalhes=None):
+        ...
+
+    @abstractmethod
+    def obter_falhas_periodo(self, data_inicio, data_fim):
+        ...
+
+    @abstractmethod
+    def iter_falhas_periodo(self, data_inicio, data_fim, batch=500):
+        ...
+
+    @abstractmethod
+    def registrar_configuracao(self, chave, valor, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_configuracao(self, chave, funcionario_id=None):
+        ...
+
+    @abstractmethod
+    def obter_configuracoes(self):
+        ...
+
+    @abstractmethod
+    def registrar_funcionario(self, funcionario_id, nome, ativo=True):
+        ...
+
+    @abstractmethod
+    def obter_funcionarios(self, somente_ativos=True):
+        ...
+
+    # Eventos
+
+    @abstractmethod
+    def escutar_eventos(self, tabelas=None, timeout=None):
+        """Itera Evento(...) das alterações, começando por Evento(None, 'CONECTADO'); termina no timeout ou em fechar()"""
+
+    # Ciclo de vida
+
+    def estatisticas(self, limite=None):
+        """Backends sem SQL não medem consultas: snapshot vazio no formato de EstatisticasConsultas"""
+        return EstatisticasConsultas().snapshot(limite=limite)
+
+    def verificar_conexao(self):
+        return True
+
+    @contextmanager
+    def transacao(self):
+        """Backends sem transação gravam na hora; o bloco só agrupa as chamadas"""
+        yield self
+
+    def descarregar_falhas(self, timeout=5.0):
+        return True
+
+    def fechar(self):
+        pass
+
+    # Regras comuns a todos os backends
+
+    def _intervalo_dia(self, data):
+        """Retorna o intervalo semiaberto [dia, dia+1) como strings comparáveis com o índice"""
+        data = para_data(data)
+        inicio = datetime(data.year, data.month, data.day)
+        fim = inicio + timedelta(days=1)
+        return inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _intervalo_data(self, data):
+        """Intervalo semiaberto [dia, dia+1) para colunas DATE"""
+        inicio, fim = self._intervalo_dia(data)
+        return inicio[:10], fim[:10]
+
+    def _funcionario(self, funcionario_id):
+        """funcionario_id informado ou o padrão da instância (FUNCIONARIO_ID)"""
+        return self.funcionario_id if funcionario_id is None else funcionario_id
+
+    def _chave_registro(self, data_hora, tipo):
+        """
+        Chave de idempotência padrão de uma batida: minuto + tipo. Retentativas, o
+        callback do Telegram e o cron que batem o mesmo ponto no mesmo minuto caem na
+        mesma chave. Tem que bater com o trecho chave_registro de consultas.py.
+        """
+        return f"{para_datetime(data_hora):%Y-%m-%d %H:%M}|{tipo.lower()}"
+
+    def _calcular_resumo_dia(self, registros):
+        """
+        Resume as batidas de um dia (lista de (data_hora, tipo) em ordem).
+        Pareia a i-ésima entrada com a i-ésima saída, como calcular_total_horas_dia.
+        """
+        entradas = []
+        saidas = []
+        for data_hora, tipo in registros:
+            data_hora = para_datetime(data_hora)
+            if tipo.lower() == 'entrada':
+                entradas.append(data_hora)
+            elif tipo.lower() == 'saida':
+                saidas.append(data_hora)
+
+        minutos_trabalhados = 0
+        minutos_noturnos = 0
+        pares = min(len(entradas), len(saidas))
+        for i in range(pares):
+            minutos_trabalhados += (saidas[i] - entradas[i]).total_seconds() / 60
+            minutos_noturnos += self._minutos_noturnos(entradas[i], saidas[i])
+
+        intervalos = ','.join(
+            f"{entradas[i].strftime('%H:%M:%S') if i < len(entradas) else ''}"
+            f"-{saidas[i].strftime('%H:%M:%S') if i < len(saidas) else ''}"
+            for i in range(max(len(entradas), len(saidas)))
+        )
+
+        return {
+            'primeira_entrada': entradas[0] if entradas else None,
+            'ultima_saida': saidas[-1] if saidas else None,
+            'minutos_trabalhados': minutos_trabalhados,
+            'pares': pares,
+            'entradas': len(entradas),
+            'saidas': len(saidas),
+            'batidas': len(registros),
+            'completo': len(entradas) == len(saidas),
+            'minutos_extras': max(0, minutos_trabalhados - JORNADA_MINUTOS),
+            'minutos_noturnos': minutos_noturnos,
+            'intervalos': intervalos
+        }
+
+    def _minutos_noturnos(self, entrada, saida):
+        """
+        Minutos do intervalo que caem entre 22h e 5h. Única regra de horas noturnas:
+        vale para resumo_diario (_calcular_resumo_dia) e horas_trabalhadas (_distribuir_horas).
+        """
+        total = 0
+        dia = datetime(entrada.year, entrada.month, entrada.day) - timedelta(days=1)
+        while dia <= saida:
+            inicio_noite = dia + timedelta(hours=22)
+            fim_noite = dia + timedelta(days=1, hours=5)
+            sobreposicao = min(saida, fim_noite) - max(entrada, inicio_noite)
+            if sobreposicao.total_seconds() > 0:
+                total += sobreposicao.total_seconds() / 60
+            dia += timedelta(days=1)
+        return total
+
+    def verificar_registro_periodo(self, data, periodo, funcionario_id=None):
+        """
+        Verifica se já existe registro no período especificado.
+        periodo: 'manha' (antes das 12h), 'tarde' (12h-18h), 'noite' (após 18h)
+        Retorna: lista de registros do período ou []
+        """
+        try:
+            registros = self.obter_registros_dia(data, funcionario_id)
+            registros_periodo = []
+            
+            for reg in registros:
+                hora = reg.data_hora.hour
+                
+                if periodo == 'manha' and hora < 12:
+                    registros_periodo.append(reg)
+                elif periodo == 'tarde' and 12 <= hora < 18:
+                    registros_periodo.append(reg)
+                elif periodo == 'noite' and hora >= 18:
+                    registros_periodo.append(reg)
+            
+            return registros_periodo
+        except Exception as e:
+            self.logger.error(f"Erro ao verificar registro do período: {e}")
+            return []
+
+    def calcular_total_horas_dia(self, data, funcionario_id=None):
+        """
+        Calcula o total de horas trabalhadas no dia a partir de resumo_diario.
+        Retorna: dict com total_minutos, total_formatado, entradas e saidas
+        """
+        try:
+            resumo = self.obter_resumo_dia(data, funcionario_id)
+            if not resumo:
+                return None
+            return self._total_horas_do_resumo(resumo)
+        except Exception as e:
+            self.logger.error(f"Erro ao calcular total de horas: {e}")
+            return None
+
+    def _total_horas_do_resumo(self, resumo):
+        entradas, saidas = self._expandir_intervalos(resumo)
+        total_minutos = resumo['minutos_trabalhados']
+        
+        horas = int(total_minutos // 60)
+        minutos = int(total_minutos % 60)
+        
+        return {
+            'total_minutos': total_minutos,
+            'total_formatado': f"{horas}h{minutos:02d}min",
+            'entradas': entradas,
+            'saidas': saidas,
+            'registros_completos': resumo['completo']
+        }
+
+    def _expandir_intervalos(self, resumo):
+        """Reconstrói as listas de entradas e saídas a partir de resumo['intervalos']"""
+        entradas = []
+        saidas = []
+        if not resumo['intervalos']:
+            return entradas, saidas
+        
+        for intervalo in resumo['intervalos'].split(','):
+            entrada, saida = intervalo.split('-')
+            if entrada:
+                entradas.append(datetime.combine(resumo['data'], time.fromisoformat(entrada)))
+            if saida:
+                saidas.append(datetime.combine(resumo['data'], time.fromisoformat(saida)))
+        return entradas, saidas
+
+    def calcular_horas_trabalhadas_dia(self, data, funcionario_id=None):
+        """Calcula as horas trabalhadas em um dia específico"""
+        try:
+            return self._distribuir_horas(self.obter_registros_dia(data, funcionario_id))
+        except Exception as e:
+            self.logger.error(f"Erro ao calcular horas trabalhadas: {e}")
+            return None
+
+    def _distribuir_horas(self, registros):
+        """Separa as horas dos pares entrada/saída (em ordem) em normais, extras e noturnas"""
+        if len(registros) % 2 != 0:
+            return None  # Número ímpar de registros
+
+        total_horas = {
+            'normais': 0,
+            'extras_60': 0,
+            'extras_65': 0,
+            'extras_75': 0,
+            'extras_100': 0,
+            'extras_150': 0,
+            'noturnas': 0
+        }
+
+        for i in range(0, len(registros), 2):
+            entrada = registros[i].data_hora
+            saida = registros[i+1].data_hora
+
+            # Calcula diferença em horas
+            delta = saida - entrada
+            horas = delta.total_seconds() / 3600
+
+            # Distribuição das horas
+            if horas <= 8:
+                total_horas['normais'] += horas
+            else:
+                total_horas['normais'] += 8
+                total_horas['extras_60'] += (horas - 8)
+
+            # Mesma regra de resumo_diario.minutos_noturnos
+            total_horas['noturnas'] += self._minutos_noturnos(entrada, saida) / 60
+
+        return total_horas
+
+    def _parametros_horas_dia(self, data, horas, funcionario_id):
+        return (
+            self._intervalo_data(data)[0],
+            horas['normais'],
+            horas['extras_60'],
+            horas['extras_65'],
+            horas['extras_75'],
+            horas['extras_100'],
+            horas['extras_150'],
+            horas['noturnas'],
+            funcionario_id
+        )
+
+    def _delta_banco_horas(self, parametros):
+        """(data, extras, débito, funcionario_id) do dia a partir dos parâmetros de salvar_horas_dia"""
+        data, normais, *extras = parametros[:7]
+        jornada = JORNADA_MINUTOS / 60
+        normais = normais or 0
+        debito = jornada - normais if normais < jornada else 0
+        return data, sum(valor or 0 for valor in extras), debito, parametros[8]
@@ -0,0 +1,59 @@
+# src/utils/config_cache.py
+import threading
+import time
+
+
+class CacheConfiguracoes:
+    """
+    Cache em memória da tabela configuracoes com TTL por chave.
+
+    Depois de uma carga completa (carregar), chaves ausentes também são
+    respondidas pelo cache até o TTL expirar, sem ida ao banco.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._valores = {}
+        self._completo_ate = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self):
+        return self.ttl > 0
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor); encontrado=False significa consultar o banco"""
+        if not self.ativo:
+            return False, None
+
+        agora = time.monotonic()
+        with self._lock:
+            item = self._valores.get(chave)
+            if item and item[1] > agora:
+                return True, item[0]
+            if agora < self._completo_ate:
+                return True, None
+        return False, None
+
+    def definir(self, chave, valor):
+        if not self.ativo:
+            return
+        with self._lock:
+            self._valores[chave] = (valor, time.monotonic() + self.ttl)
+
+    def carregar(self, valores):
+        """Substitui o cache pelo conteúdo completo da tabela"""
+        if not self.ativo:
+            return
+        expira = time.monotonic() + self.ttl
+        with self._lock:
+            self._valores = {chave: (valor, expira) for chave, valor in valores.items()}
+            self._completo_ate = expira
+
+    def invalidar(self, chave=None):
+        with self._lock:
+            if chave is None:
+                self._valores.clear()
+            else:
+                self._valores.pop(chave, None)
+            self._completo_ate = 0
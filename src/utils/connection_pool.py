@@ -0,0 +1,82 @@
+# src/utils/connection_pool.py
+import sqlite3
+import threading
+import time
+import logging
+
+
+class SQLiteConnectionPool:
+    """
+    Mantém uma conexão SQLite persistente por thread.
+
+    A conexão é reaproveitada entre chamadas da mesma thread, descartada se
+    ficar ociosa por mais de `max_idle` segundos e validada com `SELECT 1`
+    no checkout quando `check` está ativo.
+    """
+
+    def __init__(self, db_file, max_idle=300, check=True, connect=None):
+        self.db_file = db_file
+        self.max_idle = max_idle
+        self.check = check
+        self._connect = connect or (lambda: sqlite3.connect(self.db_file, check_same_thread=False))
+        self._local = threading.local()
+        self._conexoes = set()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('Database')
+
+    def _abrir(self):
+        conn = self._connect()
+        with self._lock:
+            self._conexoes.add(conn)
+        return conn
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._conexoes.discard(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _conexao_valida(self, conn):
+        try:
+            conn.execute('SELECT 1')
+            return True
+        except Exception as e:
+            self.logger.warning(f"Conexão SQLite inválida descartada: {e}")
+            return False
+
+    def getconn(self):
+        conn = getattr(self._local, 'conn', None)
+        ultimo_uso = getattr(self._local, 'ultimo_uso', 0)
+        em_uso = getattr(self._local, 'em_uso', 0)
+
+        # Uma conexão ainda emprestada (ex.: iterador em andamento) nunca é descartada
+        if conn is not None and not em_uso:
+            if self.max_idle and time.monotonic() - ultimo_uso > self.max_idle:
+                self._descartar(conn)
+                conn = None
+            elif self.check and not self._conexao_valida(conn):
+                self._descartar(conn)
+                conn = None
+
+        if conn is None:
+            conn = self._abrir()
+            self._local.conn = conn
+        self._local.em_uso = em_uso + 1
+        return conn
+
+    def putconn(self, conn):
+        self._local.em_uso = max(0, getattr(self._local, 'em_uso', 1) - 1)
+        self._local.ultimo_uso = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            conexoes = list(self._conexoes)
+            self._conexoes.clear()
+        for conn in conexoes:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
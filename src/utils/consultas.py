@@ -0,0 +1,274 @@
+# src/utils/consultas.py
+"""
+Registro das consultas quentes, compiladas uma única vez por backend.
+
+O texto é escrito com placeholders '?' e convertido para '%s' no Postgres
+apenas na primeira compilação. Como o texto compilado é sempre o mesmo objeto,
+o SQLite reaproveita o statement do cache da conexão e o Postgres usa
+prepared statements no servidor (ver Database._execute_nomeada).
+"""
+
+from functools import lru_cache
+
+from src.utils.linhas import COLUNAS_REGISTRO, COLUNAS_FALHA
+
+COLUNAS_RESUMO = (
+    'data, primeira_entrada, ultima_saida, minutos_trabalhados, pares, '
+    'entradas, saidas, batidas, completo, minutos_extras, minutos_noturnos, intervalos'
+)
+
+CONSULTAS = {
+    'inserir_registro': '''
+        INSERT INTO registros (data_hora, tipo, status, motivo, funcionario_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    # Idempotência: a batida só é inserida se a chave ainda não foi reservada (rowcount 1).
+    # data_hora é a da batida que reservou a chave, para liberá-la junto com a batida
+    'reservar_chave_registro': '''
+        INSERT INTO registros_chaves (funcionario_id, chave, data_hora)
+        VALUES (?, ?, ?)
+        ON CONFLICT DO NOTHING
+    ''',
+    # Chave do cliente e chave padrão (minuto + tipo) no mesmo statement: rowcount 2 se ambas eram novas
+    'reservar_chave_cliente_registro': '''
+        INSERT INTO registros_chaves (funcionario_id, chave, data_hora)
+        VALUES (?, ?, ?), (?, ?, ?)
+        ON CONFLICT DO NOTHING
+    ''',
+    # O WHERE true desfaz a ambiguidade do SQLite entre ON CONFLICT e um JOIN no SELECT
+    'reservar_chaves_registros': '''
+        INSERT INTO registros_chaves (funcionario_id, chave, data_hora)
+        SELECT funcionario_id, {chave_registro}, MIN(data_hora) FROM registros WHERE true
+        GROUP BY funcionario_id, {chave_registro}
+        ON CONFLICT DO NOTHING
+    ''',
+    'inserir_registros_importados': '''
+        INSERT INTO registros (data_hora, tipo, status, motivo, funcionario_id)
+        SELECT data_hora, tipo, status, motivo, ?
+        FROM (
+            SELECT
+                data_hora, tipo, status, motivo, {chave_registro} AS chave,
+                ROW_NUMBER() OVER (PARTITION BY {chave_registro} ORDER BY data_hora) AS ordem
+            FROM registros_importacao
+        ) importados
+        WHERE ordem = 1 AND NOT EXISTS (
+            SELECT 1 FROM registros_chaves c
+            WHERE c.funcionario_id = ? AND c.chave = importados.chave
+        )
+        ORDER BY data_hora
+    ''',
+    'reservar_chaves_importados': '''
+        INSERT INTO registros_chaves (funcionario_id, chave, data_hora)
+        SELECT ?, {chave_registro}, MIN(data_hora) FROM registros_importacao WHERE true
+        GROUP BY {chave_registro}
+        ON CONFLICT DO NOTHING
+    ''',
+    # Batidas removidas ou arquivadas devolvem as chaves, para o período poder ser reimportado
+    'liberar_chaves_periodo': '''
+        DELETE FROM registros_chaves
+        WHERE data_hora >= ? AND data_hora < ?
+    ''',
+    # Mantém a primeira batida de cada (funcionário, minuto, tipo); as demais são duplicatas
+    'remover_registros_duplicados': '''
+        DELETE FROM registros
+        WHERE (id, data_hora) IN (
+            SELECT id, data_hora FROM (
+                SELECT
+                    id, data_hora,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY funcionario_id, {chave_registro}
+                        ORDER BY data_hora, id
+                    ) AS ordem
+                FROM registros
+            ) numerados
+            WHERE ordem > 1
+        )
+    ''',
+    'registros_dia': f'''
+        SELECT {COLUNAS_REGISTRO}
+        FROM registros
+        WHERE funcionario_id = ? AND data_hora >= ? AND data_hora < ?
+        ORDER BY data_hora
+    ''',
+    # Períodos com as duas pontas inclusivas (data_fim costuma ser 23:59:59 do último dia)
+    'registros_periodo': f'''
+        SELECT {COLUNAS_REGISTRO}
+        FROM registros
+        WHERE funcionario_id = ? AND data_hora BETWEEN ? AND ?
+        ORDER BY data_hora
+    ''',
+    'falhas_periodo': f'''
+        SELECT {COLUNAS_FALHA} FROM falhas_registro
+        WHERE data_hora BETWEEN ? AND ?
+        ORDER BY data_hora
+    ''',
+    'batidas_dia': '''
+        SELECT data_hora, tipo FROM registros
+        WHERE funcionario_id = ? AND data_hora >= ? AND data_hora < ?
+        ORDER BY data_hora
+    ''',
+    'salvar_resumo': '''
+        INSERT INTO resumo_diario (
+            data, primeira_entrada, ultima_saida, minutos_trabalhados,
+            pares, entradas, saidas, batidas, completo,
+            minutos_extras, minutos_noturnos, intervalos, funcionario_id, atualizado_em
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (funcionario_id, data) DO UPDATE SET
+            primeira_entrada = EXCLUDED.primeira_entrada,
+            ultima_saida = EXCLUDED.ultima_saida,
+            minutos_trabalhados = EXCLUDED.minutos_trabalhados,
+            pares = EXCLUDED.pares,
+            entradas = EXCLUDED.entradas,
+            saidas = EXCLUDED.saidas,
+            batidas = EXCLUDED.batidas,
+            completo = EXCLUDED.completo,
+            minutos_extras = EXCLUDED.minutos_extras,
+            minutos_noturnos = EXCLUDED.minutos_noturnos,
+            intervalos = EXCLUDED.intervalos,
+            atualizado_em = CURRENT_TIMESTAMP
+    ''',
+    'salvar_horas_dia': '''
+        INSERT INTO horas_trabalhadas (
+            data, horas_normais, horas_extras_60,
+            horas_extras_65, horas_extras_75,
+            horas_extras_100, horas_extras_150,
+            horas_noturnas, funcionario_id, status, observacao
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'CALCULADO', 'Cálculo inicial')
+        ON CONFLICT (funcionario_id, data) DO UPDATE SET
+            horas_normais = EXCLUDED.horas_normais,
+            horas_extras_60 = EXCLUDED.horas_extras_60,
+            horas_extras_65 = EXCLUDED.horas_extras_65,
+            horas_extras_75 = EXCLUDED.horas_extras_75,
+            horas_extras_100 = EXCLUDED.horas_extras_100,
+            horas_extras_150 = EXCLUDED.horas_extras_150,
+            horas_noturnas = EXCLUDED.horas_noturnas,
+            status = 'ATUALIZADO',
+            observacao = 'Cálculo atualizado'
+    ''',
+    # Como salvar_horas_dia, mas com entrada, saída, status e observação informados
+    'registrar_horas_dia': '''
+        INSERT INTO horas_trabalhadas (
+            data, entrada, saida, horas_normais,
+            horas_extras_60, horas_extras_65, horas_extras_75,
+            horas_extras_100, horas_extras_150,
+            horas_noturnas, status, observacao, funcionario_id
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (funcionario_id, data) DO UPDATE SET
+            entrada = EXCLUDED.entrada,
+            saida = EXCLUDED.saida,
+            horas_normais = EXCLUDED.horas_normais,
+            horas_extras_60 = EXCLUDED.horas_extras_60,
+            horas_extras_65 = EXCLUDED.horas_extras_65,
+            horas_extras_75 = EXCLUDED.horas_extras_75,
+            horas_extras_100 = EXCLUDED.horas_extras_100,
+            horas_extras_150 = EXCLUDED.horas_extras_150,
+            horas_noturnas = EXCLUDED.horas_noturnas,
+            status = EXCLUDED.status,
+            observacao = EXCLUDED.observacao
+    ''',
+    'salvar_banco_horas': '''
+        INSERT INTO banco_horas (data, extras, debitos, funcionario_id, atualizado_em)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (funcionario_id, data) DO UPDATE SET
+            extras = EXCLUDED.extras,
+            debitos = EXCLUDED.debitos,
+            atualizado_em = CURRENT_TIMESTAMP
+    ''',
+    'checkpoint_banco_horas': '''
+        SELECT data, extras, debitos FROM banco_horas_checkpoints
+        WHERE funcionario_id = ? AND data < ?
+        ORDER BY data DESC
+        LIMIT 1
+    ''',
+    'deltas_banco_horas': '''
+        SELECT SUM(extras), SUM(debitos) FROM banco_horas
+        WHERE funcionario_id = ? AND data > ? AND data <= ?
+    ''',
+    'resumo_dia': f'''
+        SELECT {COLUNAS_RESUMO} FROM resumo_diario
+        WHERE funcionario_id = ? AND data = ?
+    ''',
+    'resumos_periodo': f'''
+        SELECT {COLUNAS_RESUMO} FROM resumo_diario
+        WHERE funcionario_id = ? AND data >= ? AND data < ?
+        ORDER BY data
+    ''',
+    'obter_configuracao': '''
+        SELECT valor FROM configuracoes
+        WHERE chave = ?
+    ''',
+    'obter_configuracao_funcionario': '''
+        SELECT valor FROM configuracoes_funcionario
+        WHERE funcionario_id = ? AND chave = ?
+    ''',
+    'inserir_falha': '''
+        INSERT INTO falhas_registro (data_hora, tipo, erro, detalhes)
+        VALUES (?, ?, ?, ?)
+    ''',
+    # Uma linha por dia: cada entrada seguida de saída (LEAD) é um par trabalhado e
+    # cada entrada logo após uma saída (LAG) fecha uma pausa
+    'jornadas_periodo': '''
+        WITH batidas AS (
+            SELECT
+                DATE(data_hora) AS dia,
+                data_hora,
+                LOWER(tipo) AS tipo,
+                LEAD(data_hora) OVER dia_ordenado AS seguinte,
+                LEAD(LOWER(tipo)) OVER dia_ordenado AS tipo_seguinte,
+                LAG(data_hora) OVER dia_ordenado AS anterior,
+                LAG(LOWER(tipo)) OVER dia_ordenado AS tipo_anterior
+            FROM registros
+            WHERE funcionario_id = ? AND data_hora >= ? AND data_hora < ?
+            WINDOW dia_ordenado AS (PARTITION BY DATE(data_hora) ORDER BY data_hora)
+        ),
+        marcadas AS (
+            SELECT
+                dia, data_hora, seguinte, anterior,
+                tipo = 'entrada' AND tipo_seguinte = 'saida' AS par,
+                tipo = 'entrada' AND tipo_anterior = 'saida' AS retorno
+            FROM batidas
+        )
+        SELECT
+            dia,
+            COUNT(*),
+            SUM(CASE WHEN par THEN 1 ELSE 0 END),
+            MIN(CASE WHEN par THEN data_hora END),
+            MAX(CASE WHEN par THEN seguinte END),
+            COALESCE(SUM(CASE WHEN par THEN {minutos_trabalhados} END), 0),
+            COALESCE(SUM(CASE WHEN retorno THEN {minutos_pausa} END), 0),
+            {agregar_texto}(CASE WHEN par THEN {intervalo} END, ',')
+        FROM marcadas
+        GROUP BY dia
+        ORDER BY dia
+    ''',
+}
+
+# Trechos de SQL que mudam entre os backends, substituídos em compilar_consultas
+TRECHOS_BACKEND = {
+    'sqlite': {
+        'minutos_trabalhados': "(strftime('%s', seguinte) - strftime('%s', data_hora)) / 60.0",
+        'minutos_pausa': "(strftime('%s', data_hora) - strftime('%s', anterior)) / 60.0",
+        'intervalo': "strftime('%H:%M:%S', data_hora) || '-' || strftime('%H:%M:%S', seguinte)",
+        'agregar_texto': 'group_concat',
+        'chave_registro': "strftime('%Y-%m-%d %H:%M', data_hora) || '|' || LOWER(tipo)",
+    },
+    'postgres': {
+        'minutos_trabalhados': 'CAST(EXTRACT(EPOCH FROM seguinte - data_hora) AS DOUBLE PRECISION) / 60',
+        'minutos_pausa': 'CAST(EXTRACT(EPOCH FROM data_hora - anterior) AS DOUBLE PRECISION) / 60',
+        'intervalo': "to_char(data_hora, 'HH24:MI:SS') || '-' || to_char(seguinte, 'HH24:MI:SS')",
+        'agregar_texto': 'string_agg',
+        'chave_registro': "to_char(data_hora, 'YYYY-MM-DD HH24:MI') || '|' || LOWER(tipo)",
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def compilar_consultas(backend):
+    """Retorna {nome: sql} com os placeholders e trechos do backend; calculado uma vez por processo"""
+    consultas = {}
+    for nome, sql in CONSULTAS.items():
+        for trecho, valor in TRECHOS_BACKEND[backend].items():
+            sql = sql.replace(f'{{{trecho}}}', valor)
+        consultas[nome] = sql.replace('?', '%s') if backend == 'postgres' else sql
+    return consultas
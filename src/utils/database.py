@@ -1,51 +1,421 @@
 # database/schema.py
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import gzip
+import hashlib
+import itertools
+import json
 import logging
 import os
+import re
 import socket
+import threading
+from contextlib import contextmanager
+from time import monotonic, perf_counter
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+from urllib.request import pathname2url
+
+from src.utils.armazenamento import Armazenamento, JORNADA_MINUTOS, abrir_armazenamento
+from src.utils.config_cache import CacheConfiguracoes
+from src.utils.consultas import compilar_consultas
+from src.utils.connection_pool import SQLiteConnectionPool
+from src.utils.fila_falhas import FilaFalhas
+from src.utils.replica import ReplicaLocal
+from src.utils.estatisticas import EstatisticasConsultas, formatar_estatisticas, normalizar_consulta
+from src.utils.linhas import (
+    Registro, HorasTrabalhadas, FalhaRegistro, CalculoMensal, JornadaDia, Evento,
+    COLUNAS_REGISTRO, COLUNAS_HORAS, COLUNAS_FALHA, COLUNAS_CALCULO,
+    para_data, para_datetime
+)
 
 try:
     import psycopg
 except Exception:  # pragma: no cover - ambiente sem psycopg
     psycopg = None
 
-class Database:
-    def __init__(self, db_file=None, database_url=None):
+try:
+    from psycopg_pool import ConnectionPool
+except Exception:  # pragma: no cover - ambiente sem psycopg_pool
+    ConnectionPool = None
+
+# Perfis de PRAGMA aplicados a cada conexão SQLite (SQLITE_PERFIL)
+PERFIS_SQLITE = {
+    'desempenho': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'cache_size': -20000,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'padrao': {
+        'busy_timeout': 5000,
+    },
+}
+
+# Statements mantidos em cache por conexão SQLite (o padrão do módulo sqlite3 é 128)
+SQLITE_CACHE_STATEMENTS = 256
+
+# Migrações do schema, em ordem: (versão, descrição, método que recebe o cursor).
+# Cada uma roda uma única vez por banco; as novas entram sempre no fim.
+MIGRACOES = (
+    (1, 'tabelas, índices e funcionario_id', '_migracao_schema_base'),
+    (2, 'preenche resumo_diario', '_preencher_resumo_diario_vazio'),
+    (3, 'preenche banco_horas', '_preencher_banco_horas_vazio'),
+    (4, 'triggers de eventos (NOTIFY)', '_migracao_eventos'),
+    (5, 'chaves de idempotência das batidas', '_migracao_chaves_registros'),
+)
+SCHEMA_VERSAO = MIGRACOES[-1][0]
+
+# Chave do pg_advisory_xact_lock que serializa as migrações entre processos
+LOCK_MIGRACOES = 7263120
+
+# Consulta a schema_version em bancos que ainda não têm a tabela
+ERROS_TABELA_AUSENTE = (sqlite3.OperationalError,) + (
+    (psycopg.errors.UndefinedTable,) if psycopg is not None else ()
+)
+
+# Conninfo final por (DATABASE_URL, overrides): compartilhada pelos Database do processo
+_CONNINFO_CACHE = {}
+_CONNINFO_LOCK = threading.Lock()
+
+
+# Canal do NOTIFY publicado pelos triggers de eventos e tabelas que o disparam
+CANAL_EVENTOS = 'eventos'
+TABELAS_COM_EVENTOS = ('registros', 'configuracoes', 'configuracoes_funcionario')
+
+
+# Tabelas com dados por funcionário (funcionario_id; 1 nos bancos de um usuário só)
+TABELAS_POR_FUNCIONARIO = (
+    'registros', 'horas_trabalhadas', 'calculadas_mensais',
+    'resumo_diario', 'banco_horas', 'banco_horas_checkpoints',
+)
+
+# Chaves únicas que passam a incluir o funcionário: tabela -> (restrição antiga no Postgres, nova)
+CHAVES_POR_FUNCIONARIO = {
+    'calculadas_mensais': ('calculadas_mensais_mes_ano_key', 'UNIQUE (funcionario_id, mes, ano)'),
+    'resumo_diario': ('resumo_diario_pkey', 'PRIMARY KEY (funcionario_id, data)'),
+    'banco_horas': ('banco_horas_pkey', 'PRIMARY KEY (funcionario_id, data)'),
+    'banco_horas_checkpoints': ('banco_horas_checkpoints_pkey', 'PRIMARY KEY (funcionario_id, data)'),
+}
+
+# Tabelas particionadas por mês (data_hora) no Postgres
+TABELAS_PARTICIONADAS = {
+    'registros': COLUNAS_REGISTRO,
+    'falhas_registro': COLUNAS_FALHA,
+}
+
+
+def _inicio_mes(valor):
+    valor = para_data(valor)
+    return date(valor.year, valor.month, 1)
+
+
+def _proximo_mes(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+class _ChaveRepetida(Exception):
+    """Alguma chave de idempotência da batida já estava reservada; desfaz as reservas feitas"""
+
+
+class _ConexaoTransacao:
+    """
+    Conexão de db.transacao() emprestada aos métodos: o commit fica para o fim da
+    unidade de trabalho e o rollback de cada método para o savepoint em _get_connection.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+
+class Database(Armazenamento):
+    def __init__(self, db_file=None, database_url=None, somente_leitura=False, replica_de=None):
         self.logger = logging.getLogger('Database')
-        self.database_url = database_url or os.getenv('DATABASE_URL') or os.getenv('SUPABASE_DATABASE_URL')
+        # replica_de: este Database é a réplica SQLite local de outro (ver ReplicaLocal)
+        self.replica_de = replica_de
+        if replica_de is not None:
+            self.database_url = None
+        else:
+            self.database_url = database_url or os.getenv('DATABASE_URL') or os.getenv('SUPABASE_DATABASE_URL')
         self.backend = 'postgres' if self.database_url else 'sqlite'
         self.db_file = db_file or os.getenv('DB_PATH', 'registro_ponto.db')
+        self.somente_leitura = somente_leitura
+        # Funcionário dos métodos chamados sem funcionario_id (instalações de um usuário só)
+        self.funcionario_id = int(os.getenv('FUNCIONARIO_ID', '1'))
 
         if self.backend == 'postgres' and psycopg is None:
             raise RuntimeError('psycopg não está instalado. Adicione psycopg[binary] ao requirements.txt.')
 
-        self.init_database()
+        self.pool_min_size = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+        self.pool_max_size = int(os.getenv('DB_POOL_MAX_SIZE', '5'))
+        self.pool_max_idle = float(os.getenv('DB_POOL_MAX_IDLE', '300'))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.pool_check = os.getenv('DB_POOL_CHECK', 'true').lower() in {'1', 'true', 'yes'}
+        self.pragmas_sqlite = self._carregar_pragmas_sqlite()
+        # Consultas acima de DB_SLOW_QUERY_MS (0 desativa) são logadas com os parâmetros
+        self.consulta_lenta_ms = float(os.getenv('DB_SLOW_QUERY_MS', '500'))
+        self.explicar_consultas_lentas = os.getenv('DB_SLOW_QUERY_EXPLAIN', '').lower() in {'1', 'true', 'yes'}
+        self._estatisticas = EstatisticasConsultas()
+        # Prepared statements no Postgres / cache de statements no SQLite. Desative
+        # (DB_PREPARED_STATEMENTS=false) atrás de um pooler em modo transação (porta 6543 do Supabase)
+        self.preparar = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() in {'1', 'true', 'yes'}
+        self._consultas = compilar_consultas(self.backend)
+        self._pool = self._criar_pool()
+        self._encerrando = threading.Event()
+        self._contador_cursores = itertools.count(1)
+        self._contador_savepoints = itertools.count(1)
+        # Conexão da unidade de trabalho aberta por transacao() em cada thread
+        self._transacao_local = threading.local()
+        # A réplica é atualizada por fora (sincronização), então não mantém cache próprio
+        ttl_config = 0 if replica_de is not None else float(os.getenv('DB_CONFIG_CACHE_TTL', '60'))
+        self._cache_config = CacheConfiguracoes(ttl=ttl_config)
+        # Partições mensais criadas com antecedência no Postgres (além do mês atual)
+        self.particoes_futuras = int(os.getenv('DB_PARTICOES_FUTURAS', '3'))
+        self._particoes = set()
+        self._fila_falhas = None
+        self._replica = None
 
+        # Conexões somente leitura não podem criar o schema
+        if not self.somente_leitura:
+            self.init_database()
+            if replica_de is None:
+                self._iniciar_fila_falhas()
+
+        caminho_replica = os.getenv('DB_REPLICA_LOCAL')
+        if caminho_replica and self.backend == 'postgres':
+            self._iniciar_replica(caminho_replica)
+
+        if self._cache_config.ativo:
+            self.obter_configuracoes()
+            if os.getenv('DB_CONFIG_NOTIFY', '').lower() in {'1', 'true', 'yes'}:
+                self._iniciar_escuta_configuracoes()
+
+    def _carregar_pragmas_sqlite(self):
+        """Monta os PRAGMAs a partir do perfil escolhido e das sobrescritas SQLITE_<PRAGMA>"""
+        perfil = os.getenv('SQLITE_PERFIL', 'desempenho').lower()
+        if perfil not in PERFIS_SQLITE:
+            self.logger.warning(f"Perfil SQLite '{perfil}' desconhecido, usando 'desempenho'")
+            perfil = 'desempenho'
+
+        pragmas = dict(PERFIS_SQLITE[perfil])
+        for pragma in PERFIS_SQLITE['desempenho']:
+            valor = os.getenv(f'SQLITE_{pragma.upper()}')
+            if valor is None:
+                continue
+            if not re.fullmatch(r'-?\w+', valor):
+                self.logger.warning(f"Valor inválido para SQLITE_{pragma.upper()}: {valor}")
+                continue
+            pragmas[pragma] = valor
+        return pragmas
+
+    def _connect_sqlite(self):
+        cache_statements = SQLITE_CACHE_STATEMENTS if self.preparar else 0
+        if self.somente_leitura:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_file))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=cache_statements)
+        else:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False,
+                                   cached_statements=cache_statements)
+
+        for pragma, valor in self.pragmas_sqlite.items():
+            # journal_mode exige escrita no arquivo
+            if self.somente_leitura and pragma == 'journal_mode':
+                continue
+            conn.execute(f'PRAGMA {pragma} = {valor}')
+
+        if self.somente_leitura:
+            conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def _configurar_conexao_postgres(self, conn):
+        if self.somente_leitura:
+            conn.read_only = True
+        if not self.preparar:
+            conn.prepare_threshold = None
+
+    def _criar_pool(self):
+        if self.backend == 'sqlite':
+            return SQLiteConnectionPool(
+                self.db_file,
+                max_idle=self.pool_max_idle,
+                check=self.pool_check,
+                connect=self._connect_sqlite
+            )
+
+        if ConnectionPool is None:
+            self.logger.warning('psycopg_pool não está instalado; usando uma conexão nova por chamada.')
+            return None
+
+        return ConnectionPool(
+            self._montar_conninfo(),
+            min_size=self.pool_min_size,
+            max_size=self.pool_max_size,
+            max_idle=self.pool_max_idle,
+            timeout=self.pool_timeout,
+            check=ConnectionPool.check_connection if self.pool_check else None,
+            configure=self._configurar_conexao_postgres,
+            name='sistema-ponto',
+            open=True
+        )
+
+    @contextmanager
     def _get_connection(self):
+        """
+        Empresta uma conexão do pool; commit ao sair sem erro, rollback em caso de exceção.
+        Dentro de db.transacao() devolve a conexão da transação, protegida por um savepoint.
+        """
+        ambiente = getattr(self._transacao_local, 'conn', None)
+        if ambiente is not None:
+            savepoint = f'sp_{next(self._contador_savepoints)}'
+            ambiente.execute(f'SAVEPOINT {savepoint}')
+            try:
+                yield ambiente
+            except Exception:
+                ambiente.execute(f'ROLLBACK TO SAVEPOINT {savepoint}')
+                raise
+            ambiente.execute(f'RELEASE SAVEPOINT {savepoint}')
+            return
+
+        inicio = perf_counter()
         if self.backend == 'postgres':
-            return self._connect_postgres()
-        return sqlite3.connect(self.db_file)
+            if self._pool is None:
+                with self._connect_postgres() as conn:
+                    self._estatisticas.registrar_conexao((perf_counter() - inicio) * 1000)
+                    yield conn
+            else:
+                with self._pool.connection() as conn:
+                    self._estatisticas.registrar_conexao((perf_counter() - inicio) * 1000)
+                    yield conn
+            return
+
+        conn = self._pool.getconn()
+        self._estatisticas.registrar_conexao((perf_counter() - inicio) * 1000)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.putconn(conn)
+
+    @contextmanager
+    def transacao(self):
+        """
+        Unidade de trabalho: dentro de `with db.transacao():`, os métodos chamados nesta
+        thread usam a mesma conexão e tudo é confirmado em um único commit na saída
+        (rollback se o bloco levantar exceção). Cada método roda em um savepoint, então
+        um método que falha e devolve False/None não deixa gravação pela metade nem
+        aborta o resto; para desfazer tudo, levante uma exceção dentro do bloco.
+
+        Leituras dentro da transação vão ao banco principal (enxergam o que ainda não foi
+        confirmado) e a réplica local só recebe as linhas depois do commit. Transações
+        aninhadas viram savepoints. Os métodos de DatabaseAsync rodam em outras threads
+        e não participam.
+
+        registrar_falha não entra na unidade: com a fila de falhas (padrão) a falha vai
+        para o spool, e sem ela é gravada depois do commit ou do rollback, então o
+        registro da falha sobrevive justamente quando o bloco levanta exceção.
+        """
+        if getattr(self._transacao_local, 'conn', None) is not None:
+            with self._get_connection():
+                yield self
+            return
+
+        espelhar = set()
+        falhas = []
+        try:
+            with self._get_connection() as conn:
+                if self.backend == 'sqlite':
+                    # Reserva a escrita no início: sem upgrade de lock no meio da unidade
+                    conn.execute('BEGIN IMMEDIATE')
+                self._transacao_local.conn = _ConexaoTransacao(conn)
+                self._transacao_local.espelhar = espelhar
+                self._transacao_local.falhas = falhas
+                try:
+                    yield self
+                finally:
+                    self._transacao_local.conn = None
+                    self._transacao_local.espelhar = None
+                    self._transacao_local.falhas = None
+        except BaseException:
+            # Gravações desfeitas: cache e partições lembradas podem não valer mais
+            self._cache_config.invalidar()
+            self._particoes.clear()
+            raise
+        finally:
+            for falha in falhas:
+                self._gravar_falha(*falha)
+        if espelhar:
+            self._espelhar(*espelhar)
+
+    def fechar(self):
+        """Fecha todas as conexões mantidas pelo pool"""
+        self._encerrando.set()
+        if self._fila_falhas is not None:
+            self._fila_falhas.fechar(timeout=float(os.getenv('FALHAS_FECHAR_TIMEOUT', '5')))
+            self._fila_falhas = None
+        if self._replica is not None:
+            self._replica.local.fechar()
+            self._replica = None
+        snapshot = self._estatisticas.snapshot(limite=5)
+        if snapshot['total_consultas']:
+            self.logger.info("Estatísticas do banco:\n  " + "\n  ".join(formatar_estatisticas(snapshot, limite=5)))
+        try:
+            if self._pool is not None:
+                self._pool.close()
+        except Exception as e:
+            self.logger.warning(f"Erro ao fechar pool de conexões: {e}")
 
     def _connect_postgres(self):
+        conn = psycopg.connect(self._montar_conninfo())
+        self._configurar_conexao_postgres(conn)
+        return conn
+
+    def _montar_conninfo(self):
+        """
+        Conninfo final, com PGHOST_OVERRIDE/PGHOSTADDR aplicados, montada uma vez por processo.
+        Com PGHOST_FORCE_IPV4 o IPv4 resolvido vale por PGHOST_DNS_TTL segundos (padrão 300);
+        se a nova resolução falhar, o último endereço conhecido continua em uso.
+        """
+        host_override = os.getenv('PGHOST_OVERRIDE')
+        hostaddr_override = os.getenv('PGHOSTADDR')
+        force_ipv4 = os.getenv('PGHOST_FORCE_IPV4', '').lower() in {'1', 'true', 'yes'}
+        chave = (self.database_url, host_override, hostaddr_override, force_ipv4)
+        agora = monotonic()
+        with _CONNINFO_LOCK:
+            anterior = _CONNINFO_CACHE.get(chave)
+        if anterior and anterior[1] > agora:
+            return anterior[0]
+
         conninfo = self.database_url
         parsed = urlparse(conninfo)
 
-        host_override = os.getenv('PGHOST_OVERRIDE')
         if host_override and parsed.hostname:
             parsed = parsed._replace(netloc=parsed.netloc.replace(parsed.hostname, host_override))
             conninfo = urlunparse(parsed)
 
-        hostaddr_override = os.getenv('PGHOSTADDR')
         if hostaddr_override:
             query = parse_qs(parsed.query)
             query['hostaddr'] = [hostaddr_override]
             parsed = parsed._replace(query=urlencode(query, doseq=True))
             conninfo = urlunparse(parsed)
 
-        force_ipv4 = os.getenv('PGHOST_FORCE_IPV4', '').lower() in {'1', 'true', 'yes'}
+        expira = float('inf')
         if force_ipv4 and parsed.hostname:
+            ttl = float(os.getenv('PGHOST_DNS_TTL', '300'))
+            expira = agora + ttl
             try:
                 ipv4 = socket.gethostbyname(parsed.hostname)
                 query = parse_qs(parsed.query)
@@ -55,8 +425,14 @@ class Database:
                 conninfo = urlunparse(parsed)
             except Exception as e:
                 self.logger.warning(f"Falha ao resolver IPv4 para {parsed.hostname}: {e}")
+                # Tenta de novo em breve, sem repetir a resolução a cada conexão até lá
+                expira = agora + min(ttl, 30)
+                if anterior:
+                    conninfo = anterior[0]
 
-        return psycopg.connect(conninfo)
+        with _CONNINFO_LOCK:
+            _CONNINFO_CACHE[chave] = (conninfo, expira)
+        return conninfo
 
     def _format_query(self, query: str) -> str:
         if self.backend == 'postgres':
@@ -65,10 +441,77 @@ class Database:
 
     def _execute(self, cursor, query: str, params=None):
         query = self._format_query(query)
+        inicio = perf_counter()
         if params is None:
             cursor.execute(query)
         else:
             cursor.execute(query, params)
+        self._medir_consulta(cursor, query, params, inicio)
+
+    def _execute_nomeada(self, cursor, nome, params=()):
+        """Executa uma consulta do registro (src/utils/consultas.py) já compilada para o backend"""
+        query = self._consultas[nome]
+        inicio = perf_counter()
+        if self.backend == 'postgres' and self.preparar:
+            cursor.execute(query, params, prepare=True)
+        else:
+            cursor.execute(query, params)
+        self._medir_consulta(cursor, query, params, inicio)
+
+    def _executemany_nomeada(self, cursor, nome, linhas):
+        query = self._consultas[nome]
+        inicio = perf_counter()
+        cursor.executemany(query, linhas)
+        self._medir_consulta(cursor, query, None, inicio)
+
+    def _executemany(self, cursor, query: str, linhas):
+        query = self._format_query(query)
+        inicio = perf_counter()
+        cursor.executemany(query, linhas)
+        self._medir_consulta(cursor, query, None, inicio)
+
+    def _medir_consulta(self, cursor, query, params, inicio):
+        duracao_ms = (perf_counter() - inicio) * 1000
+        lenta = self._contabilizar_consulta(query, duracao_ms, getattr(cursor, 'rowcount', -1), params)
+        if lenta and self.explicar_consultas_lentas:
+            self._explicar_consulta(cursor, query, params)
+
+    def _contabilizar_consulta(self, query, duracao_ms, linhas=None, params=None):
+        """Acumula a execução nas estatísticas; retorna True se passou do limite de consulta lenta"""
+        consulta = normalizar_consulta(query)
+        lenta = 0 < self.consulta_lenta_ms <= duracao_ms
+        self._estatisticas.registrar_consulta(consulta, duracao_ms, linhas, lenta)
+        if lenta:
+            self.logger.warning(
+                f"Consulta lenta ({duracao_ms:.0f}ms): {consulta} | parâmetros: {repr(params)[:200]}"
+            )
+        return lenta
+
+    def _explicar_consulta(self, cursor, query, params):
+        """Loga o plano da consulta lenta (EXPLAIN ANALYZE só para leituras no Postgres)"""
+        comando = query.lstrip().split(None, 1)[0].upper()
+        if comando not in {'SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'}:
+            return
+        try:
+            conn = cursor.connection
+            if self.backend == 'postgres':
+                prefixo = 'EXPLAIN (ANALYZE, BUFFERS) ' if comando in {'SELECT', 'WITH'} else 'EXPLAIN '
+                # Savepoint: uma falha no EXPLAIN não pode abortar a transação do chamador
+                with conn.transaction():
+                    plano = conn.execute(prefixo + query, params).fetchall()
+            else:
+                plano = conn.execute('EXPLAIN QUERY PLAN ' + query, params or ()).fetchall()
+            self.logger.warning("Plano da consulta lenta:\n  " + "\n  ".join(str(linha[-1]) for linha in plano))
+        except Exception as e:
+            self.logger.warning(f"Não foi possível obter o plano da consulta lenta: {e}")
+
+    def estatisticas(self, limite=None):
+        """
+        Snapshot das estatísticas de consultas desde a criação do Database:
+        chamadas, tempo total/médio/p50/p95/máximo, linhas e histograma por
+        consulta normalizada (as mais caras primeiro), além do tempo de obtenção de conexões.
+        """
+        return self._estatisticas.snapshot(limite=limite)
 
     def verificar_conexao(self):
         """Verifica se a conexão com o banco está disponível"""
@@ -81,195 +524,940 @@ class Database:
             return False
 
     def init_database(self):
+        """
+        Leva o schema à versão SCHEMA_VERSAO aplicando as migrações pendentes de MIGRACOES.
+        Com o banco em dia, custa uma consulta a schema_version; no Postgres nem isso quando
+        o marcador local (DB_SCHEMA_MARCADOR) já registra a versão atual para esta URL.
+        """
+        if self._marcador_schema() >= SCHEMA_VERSAO:
+            return
+        versao = self._versao_schema()
+        if versao < SCHEMA_VERSAO:
+            self._aplicar_migracoes(versao)
+        self._gravar_marcador_schema()
+
+    def _versao_schema(self):
+        """Última migração registrada em schema_version (0 se a tabela ainda não existe)"""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(cursor, 'SELECT MAX(versao) FROM schema_version')
+                return cursor.fetchone()[0] or 0
+        except ERROS_TABELA_AUSENTE:
+            return 0
+
+    def _aplicar_migracoes(self, versao):
+        """
+        Aplica, em ordem, as migrações acima de `versao`, cada uma em uma transação junto
+        com o registro em schema_version. No Postgres um advisory lock serializa processos
+        iniciando ao mesmo tempo; quem esperou o lock pula o que o outro já aplicou.
+        """
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    versao INTEGER PRIMARY KEY,
+                    descricao TEXT NOT NULL,
+                    aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
 
-            if self.backend == 'postgres':
+            for numero, descricao, metodo in MIGRACOES:
+                if numero <= versao:
+                    continue
+                if self.backend == 'postgres':
+                    self._execute(cursor, 'SELECT pg_advisory_xact_lock(?)', (LOCK_MIGRACOES,))
+                self._execute(cursor, 'SELECT 1 FROM schema_version WHERE versao = ?', (numero,))
+                if cursor.fetchone():
+                    conn.commit()
+                    continue
+                getattr(self, metodo)(cursor)
                 self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS registros (
-                        id SERIAL PRIMARY KEY,
-                        data_hora TIMESTAMP NOT NULL,
-                        tipo TEXT NOT NULL,
-                        status TEXT NOT NULL,
-                        motivo TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+                    INSERT INTO schema_version (versao, descricao)
+                    VALUES (?, ?)
+                ''', (numero, descricao))
+                conn.commit()
+                self.logger.info(f"Migração {numero} aplicada: {descricao}")
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS horas_trabalhadas (
-                        id SERIAL PRIMARY KEY,
-                        data DATE NOT NULL,
-                        entrada TIMESTAMP,
-                        saida TIMESTAMP,
-                        horas_normais DOUBLE PRECISION,
-                        horas_extras_60 DOUBLE PRECISION DEFAULT 0,
-                        horas_extras_65 DOUBLE PRECISION DEFAULT 0,
-                        horas_extras_75 DOUBLE PRECISION DEFAULT 0,
-                        horas_extras_100 DOUBLE PRECISION DEFAULT 0,
-                        horas_extras_150 DOUBLE PRECISION DEFAULT 0,
-                        horas_noturnas DOUBLE PRECISION DEFAULT 0,
-                        status TEXT NOT NULL,
-                        observacao TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+    def _marcador_schema(self):
+        """Versão do schema lembrada localmente para esta DATABASE_URL (0 se não houver)"""
+        caminho = os.getenv('DB_SCHEMA_MARCADOR', '.schema_versao')
+        if self.backend != 'postgres' or not caminho:
+            return 0
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo).get(self._chave_marcador_schema(), 0)
+        except (OSError, ValueError):
+            return 0
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS falhas_registro (
-                        id SERIAL PRIMARY KEY,
-                        data_hora TIMESTAMP NOT NULL,
-                        tipo TEXT NOT NULL,
-                        erro TEXT NOT NULL,
-                        detalhes TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+    def _gravar_marcador_schema(self):
+        caminho = os.getenv('DB_SCHEMA_MARCADOR', '.schema_versao')
+        if self.backend != 'postgres' or not caminho:
+            return
+        try:
+            try:
+                with open(caminho, 'r', encoding='utf-8') as arquivo:
+                    marcadores = json.load(arquivo)
+            except (OSError, ValueError):
+                marcadores = {}
+            marcadores[self._chave_marcador_schema()] = SCHEMA_VERSAO
+            temporario = f'{caminho}.{os.getpid()}.tmp'
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(marcadores, arquivo)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            self.logger.debug(f"Marcador de schema não gravado: {e}")
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS calculadas_mensais (
-                        id SERIAL PRIMARY KEY,
-                        mes INTEGER NOT NULL,
-                        ano INTEGER NOT NULL,
-                        salario_base DOUBLE PRECISION NOT NULL,
-                        periculosidade DOUBLE PRECISION DEFAULT 0,
-                        adicional_noturno DOUBLE PRECISION DEFAULT 0,
-                        horas_extras DOUBLE PRECISION DEFAULT 0,
-                        dsr DOUBLE PRECISION DEFAULT 0,
-                        total_proventos DOUBLE PRECISION NOT NULL,
-                        inss DOUBLE PRECISION NOT NULL,
-                        irrf DOUBLE PRECISION NOT NULL,
-                        outros_descontos DOUBLE PRECISION DEFAULT 0,
-                        total_descontos DOUBLE PRECISION NOT NULL,
-                        liquido DOUBLE PRECISION NOT NULL,
-                        base_fgts DOUBLE PRECISION NOT NULL,
-                        fgts DOUBLE PRECISION NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(mes, ano)
-                    )
-                ''')
+    def _chave_marcador_schema(self):
+        # A URL tem a senha: o marcador guarda só um hash dela
+        return hashlib.sha256(self.database_url.encode('utf-8')).hexdigest()[:16]
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS configuracoes (
-                        id SERIAL PRIMARY KEY,
-                        chave TEXT UNIQUE NOT NULL,
-                        valor TEXT NOT NULL,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-            else:
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS registros (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        data_hora DATETIME NOT NULL,
-                        tipo TEXT NOT NULL,
-                        status TEXT NOT NULL,
-                        motivo TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+    def _migracao_schema_base(self, cursor):
+        """Migração 1: tabelas, índices e funcionario_id (também atualiza bancos anteriores ao versionamento)"""
+        migradas = self._migrar_funcionario_id(cursor)
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS horas_trabalhadas (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        data DATE NOT NULL,
-                        entrada DATETIME,
-                        saida DATETIME,
-                        horas_normais REAL,
-                        horas_extras_60 REAL DEFAULT 0,
-                        horas_extras_65 REAL DEFAULT 0,
-                        horas_extras_75 REAL DEFAULT 0,
-                        horas_extras_100 REAL DEFAULT 0,
-                        horas_extras_150 REAL DEFAULT 0,
-                        horas_noturnas REAL DEFAULT 0,
-                        status TEXT NOT NULL,
-                        observacao TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+        if self.backend == 'postgres':
+            self._criar_tabela_particionada(cursor, 'registros', '''
+                id SERIAL,
+                data_hora TIMESTAMP NOT NULL,
+                tipo TEXT NOT NULL,
+                status TEXT NOT NULL,
+                motivo TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                funcionario_id INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (id, data_hora)
+            ''')
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS falhas_registro (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        data_hora DATETIME NOT NULL,
-                        tipo TEXT NOT NULL,
-                        erro TEXT NOT NULL,
-                        detalhes TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS horas_trabalhadas (
+                    id SERIAL PRIMARY KEY,
+                    data DATE NOT NULL,
+                    entrada TIMESTAMP,
+                    saida TIMESTAMP,
+                    horas_normais DOUBLE PRECISION,
+                    horas_extras_60 DOUBLE PRECISION DEFAULT 0,
+                    horas_extras_65 DOUBLE PRECISION DEFAULT 0,
+                    horas_extras_75 DOUBLE PRECISION DEFAULT 0,
+                    horas_extras_100 DOUBLE PRECISION DEFAULT 0,
+                    horas_extras_150 DOUBLE PRECISION DEFAULT 0,
+                    horas_noturnas DOUBLE PRECISION DEFAULT 0,
+                    status TEXT NOT NULL,
+                    observacao TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS calculadas_mensais (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        mes INTEGER NOT NULL,
-                        ano INTEGER NOT NULL,
-                        salario_base REAL NOT NULL,
-                        periculosidade REAL DEFAULT 0,
-                        adicional_noturno REAL DEFAULT 0,
-                        horas_extras REAL DEFAULT 0,
-                        dsr REAL DEFAULT 0,
-                        total_proventos REAL NOT NULL,
-                        inss REAL NOT NULL,
-                        irrf REAL NOT NULL,
-                        outros_descontos REAL DEFAULT 0,
-                        total_descontos REAL NOT NULL,
-                        liquido REAL NOT NULL,
-                        base_fgts REAL NOT NULL,
-                        fgts REAL NOT NULL,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(mes, ano)
-                    )
-                ''')
+            self._criar_tabela_particionada(cursor, 'falhas_registro', '''
+                id SERIAL,
+                data_hora TIMESTAMP NOT NULL,
+                tipo TEXT NOT NULL,
+                erro TEXT NOT NULL,
+                detalhes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, data_hora)
+            ''')
 
-                self._execute(cursor, '''
-                    CREATE TABLE IF NOT EXISTS configuracoes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        chave TEXT UNIQUE NOT NULL,
-                        valor TEXT NOT NULL,
-                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS calculadas_mensais (
+                    id SERIAL PRIMARY KEY,
+                    mes INTEGER NOT NULL,
+                    ano INTEGER NOT NULL,
+                    salario_base DOUBLE PRECISION NOT NULL,
+                    periculosidade DOUBLE PRECISION DEFAULT 0,
+                    adicional_noturno DOUBLE PRECISION DEFAULT 0,
+                    horas_extras DOUBLE PRECISION DEFAULT 0,
+                    dsr DOUBLE PRECISION DEFAULT 0,
+                    total_proventos DOUBLE PRECISION NOT NULL,
+                    inss DOUBLE PRECISION NOT NULL,
+                    irrf DOUBLE PRECISION NOT NULL,
+                    outros_descontos DOUBLE PRECISION DEFAULT 0,
+                    total_descontos DOUBLE PRECISION NOT NULL,
+                    liquido DOUBLE PRECISION NOT NULL,
+                    base_fgts DOUBLE PRECISION NOT NULL,
+                    fgts DOUBLE PRECISION NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    UNIQUE(funcionario_id, mes, ano)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS configuracoes (
+                    id SERIAL PRIMARY KEY,
+                    chave TEXT UNIQUE NOT NULL,
+                    valor TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS resumo_diario (
+                    data DATE NOT NULL,
+                    primeira_entrada TIMESTAMP,
+                    ultima_saida TIMESTAMP,
+                    minutos_trabalhados DOUBLE PRECISION DEFAULT 0,
+                    pares INTEGER DEFAULT 0,
+                    entradas INTEGER DEFAULT 0,
+                    saidas INTEGER DEFAULT 0,
+                    batidas INTEGER DEFAULT 0,
+                    completo BOOLEAN DEFAULT FALSE,
+                    minutos_extras DOUBLE PRECISION DEFAULT 0,
+                    minutos_noturnos DOUBLE PRECISION DEFAULT 0,
+                    intervalos TEXT,
+                    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (funcionario_id, data)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS banco_horas (
+                    data DATE NOT NULL,
+                    extras DOUBLE PRECISION DEFAULT 0,
+                    debitos DOUBLE PRECISION DEFAULT 0,
+                    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (funcionario_id, data)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS banco_horas_checkpoints (
+                    data DATE NOT NULL,
+                    extras DOUBLE PRECISION DEFAULT 0,
+                    debitos DOUBLE PRECISION DEFAULT 0,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (funcionario_id, data)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS funcionarios (
+                    id INTEGER PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    ativo BOOLEAN DEFAULT TRUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS configuracoes_funcionario (
+                    funcionario_id INTEGER NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (funcionario_id, chave)
+                )
+            ''')
+        else:
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS registros (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_hora DATETIME NOT NULL,
+                    tipo TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    motivo TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS horas_trabalhadas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data DATE NOT NULL,
+                    entrada DATETIME,
+                    saida DATETIME,
+                    horas_normais REAL,
+                    horas_extras_60 REAL DEFAULT 0,
+                    horas_extras_65 REAL DEFAULT 0,
+                    horas_extras_75 REAL DEFAULT 0,
+                    horas_extras_100 REAL DEFAULT 0,
+                    horas_extras_150 REAL DEFAULT 0,
+                    horas_noturnas REAL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    observacao TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS falhas_registro (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_hora DATETIME NOT NULL,
+                    tipo TEXT NOT NULL,
+                    erro TEXT NOT NULL,
+                    detalhes TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS calculadas_mensais (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    mes INTEGER NOT NULL,
+                    ano INTEGER NOT NULL,
+                    salario_base REAL NOT NULL,
+                    periculosidade REAL DEFAULT 0,
+                    adicional_noturno REAL DEFAULT 0,
+                    horas_extras REAL DEFAULT 0,
+                    dsr REAL DEFAULT 0,
+                    total_proventos REAL NOT NULL,
+                    inss REAL NOT NULL,
+                    irrf REAL NOT NULL,
+                    outros_descontos REAL DEFAULT 0,
+                    total_descontos REAL NOT NULL,
+                    liquido REAL NOT NULL,
+                    base_fgts REAL NOT NULL,
+                    fgts REAL NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    UNIQUE(funcionario_id, mes, ano)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS configuracoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chave TEXT UNIQUE NOT NULL,
+                    valor TEXT NOT NULL,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS resumo_diario (
+                    data DATE NOT NULL,
+                    primeira_entrada DATETIME,
+                    ultima_saida DATETIME,
+                    minutos_trabalhados REAL DEFAULT 0,
+                    pares INTEGER DEFAULT 0,
+                    entradas INTEGER DEFAULT 0,
+                    saidas INTEGER DEFAULT 0,
+                    batidas INTEGER DEFAULT 0,
+                    completo INTEGER DEFAULT 0,
+                    minutos_extras REAL DEFAULT 0,
+                    minutos_noturnos REAL DEFAULT 0,
+                    intervalos TEXT,
+                    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (funcionario_id, data)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS banco_horas (
+                    data DATE NOT NULL,
+                    extras REAL DEFAULT 0,
+                    debitos REAL DEFAULT 0,
+                    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (funcionario_id, data)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS banco_horas_checkpoints (
+                    data DATE NOT NULL,
+                    extras REAL DEFAULT 0,
+                    debitos REAL DEFAULT 0,
+                    funcionario_id INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (funcionario_id, data)
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS funcionarios (
+                    id INTEGER PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    ativo BOOLEAN DEFAULT TRUE,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self._execute(cursor, '''
+                CREATE TABLE IF NOT EXISTS configuracoes_funcionario (
+                    funcionario_id INTEGER NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (funcionario_id, chave)
+                )
+            ''')
+
+        for tabela, colunas in migradas:
+            self._execute(cursor, f'''
+                INSERT INTO {tabela} ({colunas}, funcionario_id)
+                SELECT {colunas}, 1 FROM {tabela}_sem_funcionario
+            ''')
+            self._execute(cursor, f'DROP TABLE {tabela}_sem_funcionario')
+        self._execute(cursor, '''
+            INSERT INTO funcionarios (id, nome)
+            SELECT 1, 'Funcionário 1'
+            WHERE NOT EXISTS (SELECT 1 FROM funcionarios)
+        ''')
+
+        self._criar_indices(cursor)
+
+        if self.backend == 'postgres':
+            mes_atual = _inicio_mes(datetime.now())
+            ultimo_mes = mes_atual
+            for _ in range(self.particoes_futuras):
+                ultimo_mes = _proximo_mes(ultimo_mes)
+            for tabela in TABELAS_PARTICIONADAS:
+                self._garantir_particoes(tabela, mes_atual, ultimo_mes, cursor)
+
+    def _colunas_tabela(self, cursor, tabela):
+        """Colunas de `tabela` em ordem ([] se ela ainda não existe)"""
+        if self.backend == 'postgres':
+            self._execute(cursor, '''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = ?
+                ORDER BY ordinal_position
+            ''', (tabela,))
+            return [linha[0] for linha in cursor.fetchall()]
+        self._execute(cursor, f'PRAGMA table_info({tabela})')
+        return [linha[1] for linha in cursor.fetchall()]
+
+    def _migrar_funcionario_id(self, cursor):
+        """
+        Bancos anteriores ao cadastro de funcionários: os dados existentes passam a ser
+        do funcionário 1 e as chaves por data/mês ganham funcionario_id na frente.
+        O SQLite não troca chave primária com ALTER TABLE; nesses casos a tabela antiga é
+        renomeada e copiada por _migracao_schema_base depois que a nova é criada.
+        Retorna: [(tabela, colunas antigas)] a copiar
+        """
+        migradas = []
+        for tabela in TABELAS_POR_FUNCIONARIO:
+            colunas = self._colunas_tabela(cursor, tabela)
+            if not colunas or 'funcionario_id' in colunas:
+                continue
+            chave = CHAVES_POR_FUNCIONARIO.get(tabela)
+            if chave and self.backend != 'postgres':
+                self._execute(cursor, f'ALTER TABLE {tabela} RENAME TO {tabela}_sem_funcionario')
+                migradas.append((tabela, ', '.join(colunas)))
+                continue
+            self._execute(cursor, f'ALTER TABLE {tabela} ADD COLUMN funcionario_id INTEGER NOT NULL DEFAULT 1')
+            if chave:
+                antiga, nova = chave
+                self._execute(cursor, f'ALTER TABLE {tabela} DROP CONSTRAINT IF EXISTS {antiga}')
+                self._execute(cursor, f'ALTER TABLE {tabela} ADD {nova}')
+            self.logger.info(f"Tabela {tabela} migrada: dados existentes atribuídos ao funcionário 1")
+        return migradas
+
+    def _criar_tabela_particionada(self, cursor, tabela, colunas):
+        """
+        Cria `tabela` particionada por mês em data_hora. Uma tabela comum já existente
+        (bancos anteriores ao particionamento) é migrada na mesma transação: os dados são
+        copiados para as partições dos meses que abrangem e a tabela antiga é removida.
+        """
+        self._execute(cursor, 'SELECT relkind FROM pg_class WHERE oid = to_regclass(?)', (tabela,))
+        linha = cursor.fetchone()
+        tipo = linha[0] if linha else None
+        if tipo == 'p':
+            return
+
+        legado = f'{tabela}_legado'
+        if tipo == 'r':
+            self._execute(cursor, f'ALTER TABLE {tabela} RENAME TO {legado}')
+            self._execute(cursor, f'ALTER TABLE {legado} DROP CONSTRAINT IF EXISTS {tabela}_pkey')
+
+        self._execute(cursor, f'CREATE TABLE {tabela} ({colunas}) PARTITION BY RANGE (data_hora)')
+        if tipo != 'r':
+            return
 
+        self._execute(cursor, f'SELECT MIN(data_hora), MAX(data_hora) FROM {legado}')
+        minimo, maximo = cursor.fetchone()
+        if minimo is not None:
+            mes, ultimo = _inicio_mes(minimo), _inicio_mes(maximo)
+            while mes <= ultimo:
+                self._criar_particao(cursor, tabela, mes)
+                mes = _proximo_mes(mes)
+            colunas_tabela = TABELAS_PARTICIONADAS[tabela]
+            self._execute(cursor, f'INSERT INTO {tabela} ({colunas_tabela}) SELECT {colunas_tabela} FROM {legado}')
+            self._execute(cursor, f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), MAX(id)) FROM {tabela}")
+        self._execute(cursor, f'DROP TABLE {legado}')
+        self.logger.info(f"Tabela {tabela} migrada para particionamento mensal")
+
+    def _criar_particao(self, cursor, tabela, mes):
+        nome = f'{tabela}_p{mes:%Y_%m}'
+        # Com uma tabela desanexada de mesmo nome, o CREATE IF NOT EXISTS não faria nada
+        # e toda inserção do mês falharia com "no partition of relation found for row"
+        self._execute(cursor, '''
+            SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = c.oid)
+            FROM pg_class c WHERE c.oid = to_regclass(?)
+        ''', (nome,))
+        linha = cursor.fetchone()
+        if linha and not linha[0]:
+            raise RuntimeError(
+                f"A tabela {nome} existe mas não é partição de {tabela}; "
+                f"reanexe com ALTER TABLE {tabela} ATTACH PARTITION ou renomeie-a"
+            )
+        self._execute(cursor, f'''
+            CREATE TABLE IF NOT EXISTS {nome}
+            PARTITION OF {tabela}
+            FOR VALUES FROM ('{mes.isoformat()}') TO ('{_proximo_mes(mes).isoformat()}')
+        ''')
+
+    def _garantir_particoes(self, tabela, inicio, fim=None, cursor=None):
+        """
+        Garante as partições mensais de `tabela` entre as datas `inicio` e `fim` (inclusive).
+        Sem cursor, cria em uma transação própria e lembra o mês, para que registrar_ponto
+        e registrar_falha só paguem o DDL na primeira batida de cada mês.
+        """
+        if self.backend != 'postgres':
+            return
+        mes, ultimo = _inicio_mes(inicio), _inicio_mes(fim or inicio)
+        pendentes = []
+        while mes <= ultimo:
+            if cursor is not None or (tabela, mes) not in self._particoes:
+                pendentes.append(mes)
+            mes = _proximo_mes(mes)
+        if not pendentes:
+            return
+
+        if cursor is not None:
+            for mes in pendentes:
+                self._criar_particao(cursor, tabela, mes)
+            return
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for mes in pendentes:
+                self._criar_particao(cursor, tabela, mes)
             conn.commit()
+        self._particoes.update((tabela, mes) for mes in pendentes)
 
-    def registrar_ponto(self, data_hora, tipo, status, motivo=None):
+    def listar_particoes(self, tabela):
+        """Partições mensais de `tabela` como [(nome, primeiro dia do mês)], em ordem (só Postgres)"""
+        if self.backend != 'postgres':
+            return []
         try:
-            data_formatada = data_hora.strftime('%Y-%m-%d %H:%M:%S')
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 self._execute(cursor, '''
-                    INSERT INTO registros (data_hora, tipo, status, motivo)
-                    VALUES (?, ?, ?, ?)
-                ''', (data_formatada, tipo, status, motivo))
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(?)
+                ''', (tabela,))
+                particoes = []
+                for (nome,) in cursor.fetchall():
+                    sufixo = re.fullmatch(rf'{tabela}_p(\d{{4}})_(\d{{2}})', nome)
+                    if sufixo:
+                        particoes.append((nome, date(int(sufixo.group(1)), int(sufixo.group(2)), 1)))
+                return sorted(particoes, key=lambda particao: particao[1])
+        except Exception as e:
+            self.logger.error(f"Erro ao listar partições de {tabela}: {e}")
+            return []
+
+    def arquivar_particoes(self, antes_de, destino, remover=False):
+        """
+        Arquiva as partições de registros e falhas_registro de meses anteriores a `antes_de`:
+        exporta cada uma para `destino/<particao>.csv.gz` (COPY, com cabeçalho) e a desanexa
+        da tabela principal, liberando as chaves de idempotência das batidas do mês. Com remover=True a partição desanexada também é apagada;
+        sem ele, é renomeada para <particao>_arquivada, liberando o nome para uma nova
+        partição do mês caso cheguem batidas retroativas.
+        Retorna: lista de (particao, arquivo, linhas) arquivadas
+        """
+        if self.backend != 'postgres':
+            self.logger.warning('Arquivamento de partições só está disponível no Postgres.')
+            return []
+
+        limite = _inicio_mes(antes_de)
+        os.makedirs(destino, exist_ok=True)
+        arquivadas = []
+        for tabela in TABELAS_PARTICIONADAS:
+            for nome, mes in self.listar_particoes(tabela):
+                if mes >= limite:
+                    continue
+                arquivo = os.path.join(destino, f'{nome}.csv.gz')
+                sequencia = 1
+                while os.path.exists(arquivo):
+                    # Mês arquivado de novo depois de batidas retroativas
+                    sequencia += 1
+                    arquivo = os.path.join(destino, f'{nome}-{sequencia}.csv.gz')
+                temporario = f'{arquivo}.parcial'
+                try:
+                    with self._get_connection() as conn:
+                        cursor = conn.cursor()
+                        query_copy = f'COPY (SELECT * FROM {nome} ORDER BY data_hora) TO STDOUT WITH (FORMAT csv, HEADER)'
+                        inicio = perf_counter()
+                        with gzip.open(temporario, 'wb') as saida:
+                            with cursor.copy(query_copy) as copy:
+                                for bloco in copy:
+                                    saida.write(bloco)
+                        self._contabilizar_consulta(query_copy, (perf_counter() - inicio) * 1000)
+                        self._execute(cursor, f'SELECT COUNT(*) FROM {nome}')
+                        linhas = cursor.fetchone()[0]
+                        self._execute(cursor, f'ALTER TABLE {tabela} DETACH PARTITION {nome}')
+                        if tabela == 'registros':
+                            # Na mesma transação do DETACH: o mês arquivado pode ser reimportado
+                            self._execute_nomeada(cursor, 'liberar_chaves_periodo', (mes, _proximo_mes(mes)))
+                        if remover:
+                            self._execute(cursor, f'DROP TABLE {nome}')
+                        else:
+                            self._guardar_particao_arquivada(cursor, nome)
+                        conn.commit()
+                    os.replace(temporario, arquivo)
+                    self._particoes.discard((tabela, mes))
+                    arquivadas.append((nome, arquivo, linhas))
+                    self.logger.info(f"Partição {nome} arquivada em {arquivo} ({linhas} linhas)")
+                except Exception as e:
+                    self.logger.error(f"Erro ao arquivar partição {nome}: {e}")
+                    if os.path.exists(temporario):
+                        os.remove(temporario)
+        return arquivadas
+
+    def _guardar_particao_arquivada(self, cursor, nome):
+        """Renomeia a partição desanexada para <nome>_arquivada, somando às linhas de um arquivamento anterior"""
+        arquivada = f'{nome}_arquivada'
+        self._execute(cursor, 'SELECT to_regclass(?) IS NOT NULL', (arquivada,))
+        if cursor.fetchone()[0]:
+            self._execute(cursor, f'INSERT INTO {arquivada} SELECT * FROM {nome}')
+            self._execute(cursor, f'DROP TABLE {nome}')
+        else:
+            self._execute(cursor, f'ALTER TABLE {nome} RENAME TO {arquivada}')
+
+    def _criar_indices(self, cursor):
+        """
+        Cria os índices das tabelas mais consultadas.
+        Usa IF NOT EXISTS, então também serve de migração para bancos já existentes.
+        Os de registros começam por funcionario_id e cobrem todas as colunas lidas, então
+        as consultas de um funcionário varrem só a faixa dele no índice, sem tocar a tabela,
+        qualquer que seja o número de funcionários.
+        """
+        if self.backend == 'postgres':
+            indices = [
+                'CREATE INDEX IF NOT EXISTS idx_registros_funcionario_data_hora '
+                'ON registros (funcionario_id, data_hora) INCLUDE (id, tipo, status, motivo, created_at)',
+                'CREATE INDEX IF NOT EXISTS idx_falhas_registro_data_hora ON falhas_registro (data_hora)',
+                'CREATE INDEX IF NOT EXISTS idx_calculadas_mensais_funcionario_ano_mes '
+                'ON calculadas_mensais (funcionario_id, ano, mes)',
+            ]
+        else:
+            # No SQLite o id é o rowid e já está em todo índice
+            indices = [
+                'CREATE INDEX IF NOT EXISTS idx_registros_funcionario_data_hora '
+                'ON registros (funcionario_id, data_hora, tipo, status, motivo, created_at)',
+                'CREATE INDEX IF NOT EXISTS idx_falhas_registro_data_hora ON falhas_registro (data_hora)',
+                'CREATE INDEX IF NOT EXISTS idx_calculadas_mensais_funcionario_ano_mes '
+                'ON calculadas_mensais (funcionario_id, ano, mes)',
+            ]
+
+        for indice in indices:
+            self._execute(cursor, indice)
+        self._execute(cursor, 'DROP INDEX IF EXISTS idx_registros_data_hora')
+        self._execute(cursor, 'DROP INDEX IF EXISTS idx_calculadas_mensais_ano_mes')
+        self._garantir_horas_unicas(cursor)
+
+    def _garantir_horas_unicas(self, cursor):
+        """
+        Índice único em horas_trabalhadas (funcionario_id, data), alvo do ON CONFLICT de
+        salvar_horas_dia. Em bancos antigos, antes de criá-lo mantém só a linha mais recente
+        de cada dia, normaliza datas gravadas com hora no SQLite e remove os índices anteriores.
+        """
+        if self.backend == 'postgres':
+            self._execute(cursor, "SELECT to_regclass('idx_horas_trabalhadas_funcionario_data')")
+            if cursor.fetchone()[0] is not None:
+                return
+            self._execute(cursor, '''
+                DELETE FROM horas_trabalhadas h
+                USING horas_trabalhadas recente
+                WHERE h.funcionario_id = recente.funcionario_id
+                  AND h.data = recente.data AND h.id < recente.id
+            ''')
+        else:
+            self._execute(cursor, '''
+                SELECT 1 FROM sqlite_master
+                WHERE type = 'index' AND name = 'idx_horas_trabalhadas_funcionario_data'
+            ''')
+            if cursor.fetchone():
+                return
+            self._execute(cursor, '''
+                DELETE FROM horas_trabalhadas
+                WHERE id NOT IN (
+                    SELECT MAX(id) FROM horas_trabalhadas GROUP BY funcionario_id, DATE(data)
+                )
+            ''')
+            self._execute(cursor, 'UPDATE horas_trabalhadas SET data = DATE(data) WHERE data <> DATE(data)')
+
+        self._execute(cursor, 'DROP INDEX IF EXISTS idx_horas_trabalhadas_data')
+        self._execute(cursor, 'DROP INDEX IF EXISTS idx_horas_trabalhadas_data_unica')
+        self._execute(cursor, '''
+            CREATE UNIQUE INDEX idx_horas_trabalhadas_funcionario_data
+            ON horas_trabalhadas (funcionario_id, data)
+        ''')
+
+    def registrar_ponto(self, data_hora, tipo, status, motivo=None, funcionario_id=None, chave=None):
+        """
+        Grava uma batida. Toda batida reserva a chave de idempotência padrão (minuto +
+        tipo, ver _chave_registro); `chave`, se informada pelo cliente, é reservada junto,
+        no mesmo statement. Se qualquer uma já foi usada pelo funcionário, nada é gravado
+        (nem a outra reserva) e o retorno também é True.
+        """
+        try:
+            funcionario_id = self._funcionario(funcionario_id)
+            data_formatada = data_hora.strftime('%Y-%m-%d %H:%M:%S')
+            padrao = self._chave_registro(data_hora, tipo)
+            chave = chave or padrao
+            self._garantir_particoes('registros', data_hora)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                if chave == padrao:
+                    self._execute_nomeada(cursor, 'reservar_chave_registro', (funcionario_id, chave, data_formatada))
+                    reservadas = 1
+                else:
+                    self._execute_nomeada(cursor, 'reservar_chave_cliente_registro',
+                                          (funcionario_id, chave, data_formatada, funcionario_id, padrao, data_formatada))
+                    reservadas = 2
+                if cursor.rowcount != reservadas:
+                    # Levantar faz _get_connection desfazer a reserva que tenha entrado
+                    raise _ChaveRepetida()
+                self._execute_nomeada(cursor, 'inserir_registro',
+                                      (data_formatada, tipo, status, motivo, funcionario_id))
+                self._atualizar_resumo_dia(cursor, data_hora, funcionario_id)
                 conn.commit()
                 self.logger.info(f"Registro de ponto salvo: {data_formatada} - {tipo} - {status}")
-                return True
+            self._espelhar('registros', 'resumo_diario')
+            return True
+        except _ChaveRepetida:
+            self.logger.info(f"Registro de ponto repetido ignorado: {data_formatada} - {tipo} ({chave})")
+            return True
         except Exception as e:
             self.logger.error(f"Erro ao registrar ponto: {e}")
             self.registrar_falha("registro_ponto", str(e))
             return False
 
+    def registrar_pontos_em_lote(self, registros, funcionario_id=None):
+        """
+        Insere vários registros de ponto de um funcionário em uma única transação.
+        registros: iterável de (data_hora, tipo, status, motivo); motivo é opcional.
+        Registros cuja chave de idempotência (minuto + tipo) já foi usada, ou repetida
+        no lote, são ignorados; das repetidas no lote fica a primeira batida.
+        Retorna: quantidade de registros inseridos, ou None em caso de erro
+        """
+        try:
+            funcionario_id = self._funcionario(funcionario_id)
+            dias = set()
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._carregar_importacao(cursor, registros, dias)
+                if self.backend == 'postgres':
+                    # Um registrar_ponto concorrente não reserva chave entre a verificação e a reserva
+                    self._execute(cursor, 'LOCK TABLE registros_chaves IN SHARE ROW EXCLUSIVE MODE')
+                self._execute_nomeada(cursor, 'inserir_registros_importados', (funcionario_id, funcionario_id))
+                inseridos = cursor.rowcount
+                self._execute_nomeada(cursor, 'reservar_chaves_importados', (funcionario_id,))
+                self._execute(cursor, 'DROP TABLE registros_importacao')
+                if inseridos:
+                    for dia in sorted(dias):
+                        self._atualizar_resumo_dia(cursor, dia, funcionario_id)
+                conn.commit()
+                self.logger.info(f"Importação em lote concluída: {inseridos} registros inseridos")
+            self._espelhar('registros', 'resumo_diario')
+            return inseridos
+        except Exception as e:
+            self.logger.error(f"Erro ao registrar pontos em lote: {e}")
+            self.registrar_falha("registro_ponto_lote", str(e))
+            return None
+
+    def _normalizar_lote(self, registros, dias=None):
+        for registro in registros:
+            data_hora, tipo, status = registro[0], registro[1], registro[2]
+            motivo = registro[3] if len(registro) > 3 else None
+            if isinstance(data_hora, datetime):
+                data_hora = data_hora.strftime('%Y-%m-%d %H:%M:%S')
+            if dias is not None:
+                dias.add(data_hora[:10])
+            yield data_hora, tipo, status, motivo
+
+    def _carregar_importacao(self, cursor, registros, dias=None):
+        """Carrega o lote na tabela temporária registros_importacao (COPY no Postgres)"""
+        # Sobra de um lote interrompido em uma conexão do pool
+        self._execute(cursor, 'DROP TABLE IF EXISTS registros_importacao')
+        self._execute(cursor, '''
+            CREATE TEMP TABLE registros_importacao (
+                data_hora TIMESTAMP NOT NULL,
+                tipo TEXT NOT NULL,
+                status TEXT NOT NULL,
+                motivo TEXT
+            )
+        ''')
+        if self.backend != 'postgres':
+            self._executemany(cursor, '''
+                INSERT INTO registros_importacao (data_hora, tipo, status, motivo)
+                VALUES (?, ?, ?, ?)
+            ''', self._normalizar_lote(registros, dias))
+            return
+
+        query_copy = 'COPY registros_importacao (data_hora, tipo, status, motivo) FROM STDIN'
+        inicio = perf_counter()
+        linhas = 0
+        with cursor.copy(query_copy) as copy:
+            for registro in self._normalizar_lote(registros, dias):
+                copy.write_row(registro)
+                linhas += 1
+        self._contabilizar_consulta(query_copy, (perf_counter() - inicio) * 1000, linhas)
+        if dias:
+            self._garantir_particoes('registros', min(dias), max(dias), cursor)
+
+    def _atualizar_resumo_dia(self, cursor, data, funcionario_id):
+        """Recalcula a linha de resumo_diario do dia a partir das batidas do próprio dia"""
+        inicio, fim = self._intervalo_dia(data)
+        self._execute_nomeada(cursor, 'batidas_dia', (funcionario_id, inicio, fim))
+        self._salvar_resumos(cursor, funcionario_id, [(inicio[:10], cursor.fetchall())])
+
+    def _salvar_resumos(self, cursor, funcionario_id, dias):
+        """Grava (upsert) o resumo de cada (dia, registros_do_dia) do funcionário"""
+        linhas = []
+        for dia, registros in dias:
+            resumo = self._calcular_resumo_dia(registros)
+            linhas.append((
+                dia,
+                resumo['primeira_entrada'].strftime('%Y-%m-%d %H:%M:%S') if resumo['primeira_entrada'] else None,
+                resumo['ultima_saida'].strftime('%Y-%m-%d %H:%M:%S') if resumo['ultima_saida'] else None,
+                resumo['minutos_trabalhados'], resumo['pares'],
+                resumo['entradas'], resumo['saidas'], resumo['batidas'], resumo['completo'],
+                resumo['minutos_extras'], resumo['minutos_noturnos'],
+                resumo['intervalos'], funcionario_id
+            ))
+
+        self._executemany_nomeada(cursor, 'salvar_resumo', linhas)
+
+    def reconstruir_resumo_diario(self):
+        """Recalcula resumo_diario inteiro a partir de registros (migração/correção)"""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                total = self._reconstruir_resumo_diario(cursor)
+                conn.commit()
+                return total
+        except Exception as e:
+            self.logger.error(f"Erro ao reconstruir resumo diário: {e}")
+            return None
+
+    def compactar_registros_duplicados(self):
+        """
+        Remove em um único DELETE as batidas repetidas (mesmo funcionário, minuto e tipo),
+        mantendo a primeira, e reconstrói resumo_diario. Retorna quantas foram removidas,
+        ou None em caso de erro. horas_trabalhadas não é recalculada aqui. As chaves de
+        idempotência continuam reservadas: cada minuto + tipo ainda tem a batida mantida.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute_nomeada(cursor, 'remover_registros_duplicados')
+                removidos = cursor.rowcount
+                self._execute_nomeada(cursor, 'reservar_chaves_registros')
+                if removidos:
+                    self._reconstruir_resumo_diario(cursor)
+                conn.commit()
+            self.logger.info(f"Compactação de registros concluída: {removidos} duplicados removidos")
+            if removidos and self._replica is not None:
+                # A sincronização incremental só copia linhas novas, não remoções
+                self.logger.warning("A réplica local ainda tem os duplicados; apague o arquivo de DB_REPLICA_LOCAL para recriá-la")
+            return removidos
+        except Exception as e:
+            self.logger.error(f"Erro ao compactar registros duplicados: {e}")
+            return None
+
+    def _reconstruir_resumo_diario(self, cursor):
+        self._execute(cursor, '''
+            SELECT funcionario_id, data_hora, tipo FROM registros
+            ORDER BY funcionario_id, data_hora
+        ''')
+        funcionarios = {}
+        for funcionario_id, data_hora, tipo in cursor.fetchall():
+            data_hora = para_datetime(data_hora)
+            dias = funcionarios.setdefault(funcionario_id, {})
+            dias.setdefault(data_hora.strftime('%Y-%m-%d'), []).append((data_hora, tipo))
+
+        self._execute(cursor, 'DELETE FROM resumo_diario')
+        for funcionario_id, dias in funcionarios.items():
+            self._salvar_resumos(cursor, funcionario_id, dias.items())
+        total = sum(len(dias) for dias in funcionarios.values())
+        self.logger.info(f"Resumo diário reconstruído: {total} dias")
+        return total
+
+    def _preencher_resumo_diario_vazio(self, cursor):
+        """Migração 2: bancos anteriores ao resumo_diario ganham a tabela preenchida"""
+        self._execute(cursor, 'SELECT 1 FROM resumo_diario LIMIT 1')
+        if cursor.fetchone():
+            return
+        self._execute(cursor, 'SELECT 1 FROM registros LIMIT 1')
+        if cursor.fetchone():
+            self._reconstruir_resumo_diario(cursor)
+
+    def _linha_para_resumo(self, linha):
+        return {
+            'data': para_data(linha[0]),
+            'primeira_entrada': para_datetime(linha[1]),
+            'ultima_saida': para_datetime(linha[2]),
+            'minutos_trabalhados': linha[3],
+            'pares': linha[4],
+            'entradas': linha[5],
+            'saidas': linha[6],
+            'batidas': linha[7],
+            'completo': bool(linha[8]),
+            'minutos_extras': linha[9],
+            'minutos_noturnos': linha[10],
+            'intervalos': linha[11] or ''
+        }
+
+    def obter_resumo_dia(self, data, funcionario_id=None):
+        """Obtém o resumo pré-calculado de um dia (ou None se não houver batidas)"""
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_resumo_dia(data, funcionario_id)
+        try:
+            dia, _ = self._intervalo_data(data)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute_nomeada(cursor, 'resumo_dia', (funcionario_id, dia))
+                linha = cursor.fetchone()
+                return self._linha_para_resumo(linha) if linha else None
+        except Exception as e:
+            self.logger.error(f"Erro ao obter resumo do dia: {e}")
+            return None
+
+    def obter_resumos_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        """Obtém os resumos diários de [data_inicio, data_fim] (datas inclusivas) em uma consulta"""
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_resumos_periodo(data_inicio, data_fim, funcionario_id)
+        try:
+            inicio, _ = self._intervalo_data(data_inicio)
+            _, fim = self._intervalo_data(data_fim)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute_nomeada(cursor, 'resumos_periodo', (funcionario_id, inicio, fim))
+                return [self._linha_para_resumo(linha) for linha in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter resumos do período: {e}")
+            return []
+
     def registrar_horas_trabalhadas(self, data, entrada, saida, horas_normais, 
-                                  horas_extras, horas_noturnas, status, observacao=None):
+                                  horas_extras, horas_noturnas, status, observacao=None,
+                                  funcionario_id=None):
         try:
+            funcionario_id = self._funcionario(funcionario_id)
+            dia = self._intervalo_data(data)[0]
+            extras = [horas_extras.get(faixa, 0) for faixa in ('60', '65', '75', '100', '150')]
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    INSERT INTO horas_trabalhadas (
-                        data, entrada, saida, horas_normais,
-                        horas_extras_60, horas_extras_65, horas_extras_75,
-                        horas_extras_100, horas_extras_150,
-                        horas_noturnas, status, observacao
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    data, entrada, saida, horas_normais,
-                    horas_extras.get('60', 0), horas_extras.get('65', 0),
-                    horas_extras.get('75', 0), horas_extras.get('100', 0),
-                    horas_extras.get('150', 0), horas_noturnas,
-                    status, observacao
+                self._execute_nomeada(cursor, 'registrar_horas_dia', (
+                    dia, entrada, saida, horas_normais, *extras, horas_noturnas,
+                    status, observacao, funcionario_id
                 ))
+                self._execute_nomeada(cursor, 'salvar_banco_horas', self._delta_banco_horas(
+                    (dia, horas_normais, *extras, horas_noturnas, funcionario_id)
+                ))
+                self._rolar_checkpoints_banco_horas(cursor, funcionario_id, dia)
                 conn.commit()
                 self.logger.info(f"Horas trabalhadas registradas: {data}")
                 return True
@@ -278,73 +1466,130 @@ class Database:
             self.registrar_falha("registro_horas", str(e))
             return False
 
+    def _iniciar_replica(self, caminho):
+        """Réplica SQLite local para leituras (DB_REPLICA_LOCAL), atualizada até DB_REPLICA_MAX_ATRASO segundos"""
+        try:
+            self._replica = ReplicaLocal(
+                self,
+                Database(db_file=caminho, replica_de=self),
+                max_atraso=float(os.getenv('DB_REPLICA_MAX_ATRASO', '60'))
+            )
+        except Exception as e:
+            self.logger.warning(f"Réplica local indisponível, lendo direto do Postgres: {e}")
+            self._replica = None
+
+    def _leitura_local(self):
+        """Database da réplica local, se configurada e dentro do atraso máximo"""
+        if self._replica is None or getattr(self._transacao_local, 'conn', None) is not None:
+            return None
+        return self._replica.pronta()
+
+    def _espelhar(self, *tabelas):
+        """Traz para a réplica local as linhas que acabaram de ser gravadas no Postgres"""
+        if self._replica is None:
+            return
+        pendentes = getattr(self._transacao_local, 'espelhar', None)
+        if pendentes is not None:
+            # Dentro de db.transacao() as linhas só existem para a réplica após o commit
+            pendentes.update(tabelas)
+            return
+        self._replica.sincronizar(tabelas)
+
+    def _iniciar_fila_falhas(self):
+        """Falhas gravadas em segundo plano (FALHAS_BUFFER=false grava direto, como antes)"""
+        if os.getenv('FALHAS_BUFFER', 'true').lower() not in {'1', 'true', 'yes'}:
+            return
+        try:
+            self._fila_falhas = FilaFalhas(
+                self._gravar_falhas,
+                os.getenv('FALHAS_SPOOL_DIR', 'falhas_pendentes'),
+                capacidade=int(os.getenv('FALHAS_BUFFER_TAMANHO', '1000')),
+                backoff_max=float(os.getenv('FALHAS_BACKOFF_MAX', '60')),
+                compactar_bytes=int(os.getenv('FALHAS_SPOOL_COMPACTAR', str(1024 * 1024)))
+            )
+            self._fila_falhas.iniciar()
+        except Exception as e:
+            self.logger.warning(f"Fila de falhas indisponível, gravando direto no banco: {e}")
+            self._fila_falhas = None
+
+    def _gravar_falhas(self, lote):
+        """Grava um lote da fila de falhas; erros sobem para o backoff da fila"""
+        self._garantir_particoes('falhas_registro', min(f[0] for f in lote), max(f[0] for f in lote))
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            self._executemany_nomeada(cursor, 'inserir_falha', lote)
+            conn.commit()
+        self._espelhar('falhas_registro')
+
+    def descarregar_falhas(self, timeout=5.0):
+        """Grava agora as falhas pendentes da fila; retorna True se não sobrou nenhuma"""
+        if self._fila_falhas is None:
+            return True
+        return self._fila_falhas.descarregar(timeout)
+
     def registrar_falha(self, tipo, erro, detalhes=None):
+        agora = datetime.now()
+        if self._fila_falhas is not None:
+            try:
+                self._fila_falhas.registrar(agora, tipo, erro, detalhes)
+                self.logger.error(f"Falha registrada: {tipo} - {erro}")
+                return
+            except Exception as e:
+                self.logger.warning(f"Erro no spool de falhas, gravando direto no banco: {e}")
+        pendentes = getattr(self._transacao_local, 'falhas', None)
+        if pendentes is not None:
+            # Dentro de db.transacao(): gravada ao fim da unidade, fora do rollback
+            pendentes.append((agora, tipo, erro, detalhes))
+            return
+        self._gravar_falha(agora, tipo, erro, detalhes)
+
+    def _gravar_falha(self, agora, tipo, erro, detalhes):
         try:
+            self._garantir_particoes('falhas_registro', agora)
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    INSERT INTO falhas_registro (data_hora, tipo, erro, detalhes)
-                    VALUES (?, ?, ?, ?)
-                ''', (datetime.now(), tipo, erro, detalhes))
+                self._execute_nomeada(cursor, 'inserir_falha', (agora, tipo, erro, detalhes))
                 conn.commit()
                 self.logger.error(f"Falha registrada: {tipo} - {erro}")
         except Exception as e:
             self.logger.critical(f"Erro ao registrar falha: {e}")
 
-    def salvar_calculo_mensal(self, dados):
+    def salvar_calculo_mensal(self, dados, funcionario_id=None):
         try:
+            funcionario_id = self._funcionario(funcionario_id)
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                if self.backend == 'postgres':
-                    self._execute(cursor, '''
-                        INSERT INTO calculadas_mensais (
-                            mes, ano, salario_base, periculosidade,
-                            adicional_noturno, horas_extras, dsr,
-                            total_proventos, inss, irrf,
-                            outros_descontos, total_descontos,
-                            liquido, base_fgts, fgts
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT (mes, ano) DO UPDATE SET
-                            salario_base = EXCLUDED.salario_base,
-                            periculosidade = EXCLUDED.periculosidade,
-                            adicional_noturno = EXCLUDED.adicional_noturno,
-                            horas_extras = EXCLUDED.horas_extras,
-                            dsr = EXCLUDED.dsr,
-                            total_proventos = EXCLUDED.total_proventos,
-                            inss = EXCLUDED.inss,
-                            irrf = EXCLUDED.irrf,
-                            outros_descontos = EXCLUDED.outros_descontos,
-                            total_descontos = EXCLUDED.total_descontos,
-                            liquido = EXCLUDED.liquido,
-                            base_fgts = EXCLUDED.base_fgts,
-                            fgts = EXCLUDED.fgts
-                    ''', (
-                        dados['mes'], dados['ano'], dados['salario_base'],
-                        dados['periculosidade'], dados['adicional_noturno'],
-                        dados['horas_extras'], dados['dsr'], dados['total_proventos'],
-                        dados['inss'], dados['irrf'], dados['outros_descontos'],
-                        dados['total_descontos'], dados['liquido'],
-                        dados['base_fgts'], dados['fgts']
-                    ))
-                else:
-                    self._execute(cursor, '''
-                        INSERT OR REPLACE INTO calculadas_mensais (
-                            mes, ano, salario_base, periculosidade,
-                            adicional_noturno, horas_extras, dsr,
-                            total_proventos, inss, irrf,
-                            outros_descontos, total_descontos,
-                            liquido, base_fgts, fgts
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        dados['mes'], dados['ano'], dados['salario_base'],
-                        dados['periculosidade'], dados['adicional_noturno'],
-                        dados['horas_extras'], dados['dsr'], dados['total_proventos'],
-                        dados['inss'], dados['irrf'], dados['outros_descontos'],
-                        dados['total_descontos'], dados['liquido'],
-                        dados['base_fgts'], dados['fgts']
-                    ))
+                self._execute(cursor, '''
+                    INSERT INTO calculadas_mensais (
+                        mes, ano, salario_base, periculosidade,
+                        adicional_noturno, horas_extras, dsr,
+                        total_proventos, inss, irrf,
+                        outros_descontos, total_descontos,
+                        liquido, base_fgts, fgts, funcionario_id
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (funcionario_id, mes, ano) DO UPDATE SET
+                        salario_base = EXCLUDED.salario_base,
+                        periculosidade = EXCLUDED.periculosidade,
+                        adicional_noturno = EXCLUDED.adicional_noturno,
+                        horas_extras = EXCLUDED.horas_extras,
+                        dsr = EXCLUDED.dsr,
+                        total_proventos = EXCLUDED.total_proventos,
+                        inss = EXCLUDED.inss,
+                        irrf = EXCLUDED.irrf,
+                        outros_descontos = EXCLUDED.outros_descontos,
+                        total_descontos = EXCLUDED.total_descontos,
+                        liquido = EXCLUDED.liquido,
+                        base_fgts = EXCLUDED.base_fgts,
+                        fgts = EXCLUDED.fgts
+                ''', (
+                    dados['mes'], dados['ano'], dados['salario_base'],
+                    dados['periculosidade'], dados['adicional_noturno'],
+                    dados['horas_extras'], dados['dsr'], dados['total_proventos'],
+                    dados['inss'], dados['irrf'], dados['outros_descontos'],
+                    dados['total_descontos'], dados['liquido'],
+                    dados['base_fgts'], dados['fgts'], funcionario_id
+                ))
                 conn.commit()
                 self.logger.info(f"Cálculo mensal salvo: {dados['mes']}/{dados['ano']}")
                 return True
@@ -353,363 +1598,753 @@ class Database:
             self.registrar_falha("calculo_mensal", str(e))
             return False
 
-    def obter_registros_periodo(self, data_inicio, data_fim):
+    def obter_registros_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        """No Postgres o filtro em data_hora limita a leitura às partições mensais do período"""
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_registros_periodo(data_inicio, data_fim, funcionario_id)
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT id, data_hora, tipo, status, motivo, created_at
-                    FROM registros
-                    WHERE data_hora BETWEEN ? AND ?
-                    ORDER BY data_hora
-                ''', (data_inicio, data_fim))
-                return cursor.fetchall()
+                self._execute_nomeada(cursor, 'registros_periodo', (funcionario_id, data_inicio, data_fim))
+                return [Registro.de_linha(linha) for linha in cursor.fetchall()]
         except Exception as e:
             self.logger.error(f"Erro ao obter registros do período: {e}")
             return []
 
-    def obter_horas_trabalhadas_periodo(self, data_inicio, data_fim):
+    def obter_jornadas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        """
+        Jornadas de data_inicio a data_fim (inclusive), uma JornadaDia por dia com batidas.
+        Os pares entrada→saída, as pausas e os totais são calculados no banco com LAG/LEAD,
+        então um resumo mensal ou anual transfere uma linha por dia em vez de cada batida.
+        """
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_jornadas_periodo(data_inicio, data_fim, funcionario_id)
         try:
+            inicio = self._intervalo_dia(data_inicio)[0]
+            fim = self._intervalo_dia(data_fim)[1]
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT * FROM horas_trabalhadas
-                    WHERE data BETWEEN ? AND ?
+                self._execute_nomeada(cursor, 'jornadas_periodo', (funcionario_id, inicio, fim))
+                return [JornadaDia.de_linha(linha) for linha in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter jornadas do período: {e}")
+            return []
+
+    def obter_horas_trabalhadas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(cursor, f'''
+                    SELECT {COLUNAS_HORAS} FROM horas_trabalhadas
+                    WHERE funcionario_id = ? AND data BETWEEN ? AND ?
                     ORDER BY data
-                ''', (data_inicio, data_fim))
-                return cursor.fetchall()
+                ''', (self._funcionario(funcionario_id), data_inicio, data_fim))
+                return [HorasTrabalhadas.de_linha(linha) for linha in cursor.fetchall()]
         except Exception as e:
             self.logger.error(f"Erro ao obter horas trabalhadas do período: {e}")
             return []
 
     def obter_falhas_periodo(self, data_inicio, data_fim):
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_falhas_periodo(data_inicio, data_fim)
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT * FROM falhas_registro
-                    WHERE data_hora BETWEEN ? AND ?
-                    ORDER BY data_hora
-                ''', (data_inicio, data_fim))
-                return cursor.fetchall()
+                self._execute_nomeada(cursor, 'falhas_periodo', (data_inicio, data_fim))
+                return [FalhaRegistro.de_linha(linha) for linha in cursor.fetchall()]
         except Exception as e:
             self.logger.error(f"Erro ao obter falhas do período: {e}")
             return []
 
-    def obter_calculo_mensal(self, mes, ano):
+    def _iterar_consulta(self, query, params, batch, conversor):
+        """
+        Executa a consulta e devolve as linhas (convertidas por `conversor`) aos poucos, `batch` por vez.
+        No Postgres usa um cursor nomeado (server-side) em uma conexão emprestada do pool só
+        para ele. No SQLite a conexão do pool é a da thread, e outro método chamado com o
+        iterador suspenso faria commit ou rollback nela; por isso cada iterador lê por uma
+        conexão própria, fechada quando ele termina ou é fechado. Sem WAL, um leitor aberto
+        impediria o commit de quem grava, então a consulta é lida inteira antes da primeira
+        linha sair. Dentro de db.transacao() o iterador lê pela conexão da transação, para
+        enxergar o que ainda não foi confirmado.
+        """
+        ambiente = getattr(self._transacao_local, 'conn', None)
+        if self.backend == 'postgres':
+            with self._get_connection() as conn:
+                cursor = conn.cursor(name=f'iter_{next(self._contador_cursores)}')
+                cursor.itersize = batch
+                yield from self._ler_em_lotes(cursor, query, params, batch, conversor)
+        elif ambiente is not None:
+            yield from self._ler_em_lotes(ambiente.cursor(), query, params, batch, conversor)
+        else:
+            inicio = perf_counter()
+            conn = self._connect_sqlite()
+            self._estatisticas.registrar_conexao((perf_counter() - inicio) * 1000)
+            try:
+                if str(self.pragmas_sqlite.get('journal_mode', '')).upper() == 'WAL':
+                    yield from self._ler_em_lotes(conn.cursor(), query, params, batch, conversor)
+                    return
+                linhas = list(self._ler_em_lotes(conn.cursor(), query, params, batch, conversor))
+            finally:
+                conn.close()
+            yield from linhas
+
+    def _ler_em_lotes(self, cursor, query, params, batch, conversor):
+        try:
+            self._execute(cursor, query, params)
+            while True:
+                linhas = cursor.fetchmany(batch)
+                if not linhas:
+                    break
+                yield from map(conversor, linhas)
+        finally:
+            cursor.close()
+
+    def iter_registros_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        """Versão em streaming de obter_registros_periodo"""
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            yield from local.iter_registros_periodo(data_inicio, data_fim, batch, funcionario_id)
+            return
+        try:
+            yield from self._iterar_consulta(f'''
+                SELECT {COLUNAS_REGISTRO}
+                FROM registros
+                WHERE funcionario_id = ? AND data_hora BETWEEN ? AND ?
+                ORDER BY data_hora
+            ''', (funcionario_id, data_inicio, data_fim), batch, Registro.de_linha)
+        except Exception as e:
+            self.logger.error(f"Erro ao iterar registros do período: {e}")
+
+    def iter_horas_trabalhadas_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        """Versão em streaming de obter_horas_trabalhadas_periodo"""
+        try:
+            yield from self._iterar_consulta(f'''
+                SELECT {COLUNAS_HORAS} FROM horas_trabalhadas
+                WHERE funcionario_id = ? AND data BETWEEN ? AND ?
+                ORDER BY data
+            ''', (self._funcionario(funcionario_id), data_inicio, data_fim), batch, HorasTrabalhadas.de_linha)
+        except Exception as e:
+            self.logger.error(f"Erro ao iterar horas trabalhadas do período: {e}")
+
+    def iter_falhas_periodo(self, data_inicio, data_fim, batch=500):
+        """Versão em streaming de obter_falhas_periodo"""
+        local = self._leitura_local()
+        if local is not None:
+            yield from local.iter_falhas_periodo(data_inicio, data_fim, batch)
+            return
+        try:
+            yield from self._iterar_consulta(f'''
+                SELECT {COLUNAS_FALHA} FROM falhas_registro
+                WHERE data_hora BETWEEN ? AND ?
+                ORDER BY data_hora
+            ''', (data_inicio, data_fim), batch, FalhaRegistro.de_linha)
+        except Exception as e:
+            self.logger.error(f"Erro ao iterar falhas do período: {e}")
+
+    def obter_calculo_mensal(self, mes, ano, funcionario_id=None):
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT * FROM calculadas_mensais
-                    WHERE mes = ? AND ano = ?
-                ''', (mes, ano))
-                return cursor.fetchone()
+                self._execute(cursor, f'''
+                    SELECT {COLUNAS_CALCULO} FROM calculadas_mensais
+                    WHERE funcionario_id = ? AND ano = ? AND mes = ?
+                ''', (self._funcionario(funcionario_id), ano, mes))
+                linha = cursor.fetchone()
+                return CalculoMensal.de_linha(linha) if linha else None
         except Exception as e:
             self.logger.error(f"Erro ao obter cálculo mensal: {e}")
             return None
+
+    def obter_calculos_periodo(self, ano_inicio, mes_inicio, ano_fim, mes_fim, funcionario_id=None):
+        """
+        Obtém os cálculos mensais de mes_inicio/ano_inicio até mes_fim/ano_fim (inclusive)
+        em uma única consulta, ordenados por ano e mês.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(cursor, f'''
+                    SELECT {COLUNAS_CALCULO} FROM calculadas_mensais
+                    WHERE funcionario_id = ? AND (ano, mes) >= (?, ?) AND (ano, mes) <= (?, ?)
+                    ORDER BY ano, mes
+                ''', (self._funcionario(funcionario_id), ano_inicio, mes_inicio, ano_fim, mes_fim))
+                return [CalculoMensal.de_linha(linha) for linha in cursor.fetchall()]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter cálculos do período: {e}")
+            return []
         
-    def obter_ultimo_registro(self):
-        """Obtém o último registro de ponto do sistema"""
+    def obter_ultimo_registro(self, funcionario_id=None):
+        """Obtém o último registro de ponto do funcionário"""
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_ultimo_registro(funcionario_id)
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT id, data_hora, tipo, status, motivo 
+                self._execute(cursor, f'''
+                    SELECT {COLUNAS_REGISTRO}
                     FROM registros 
+                    WHERE funcionario_id = ?
                     ORDER BY data_hora DESC 
                     LIMIT 1
-                ''')
-                return cursor.fetchone()
+                ''', (funcionario_id,))
+                linha = cursor.fetchone()
+                return Registro.de_linha(linha) if linha else None
         except Exception as e:
             self.logger.error(f"Erro ao obter último registro: {e}")
             return None
 
-    def obter_registros_dia(self, data):
+    def obter_registros_dia(self, data, funcionario_id=None):
         """Obtém todos os registros de um dia específico"""
+        funcionario_id = self._funcionario(funcionario_id)
+        local = self._leitura_local()
+        if local is not None:
+            return local.obter_registros_dia(data, funcionario_id)
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT id, data_hora, tipo, status, motivo 
-                    FROM registros 
-                    WHERE DATE(data_hora) = DATE(?)
-                    ORDER BY data_hora
-                ''', (data,))
-                return cursor.fetchall()
+                self._execute_nomeada(cursor, 'registros_dia', (funcionario_id, *self._intervalo_dia(data)))
+                return [Registro.de_linha(linha) for linha in cursor.fetchall()]
         except Exception as e:
             self.logger.error(f"Erro ao obter registros do dia: {e}")
             return []
 
-    def verificar_registro_periodo(self, data, periodo):
+    def salvar_horas_trabalhadas_dia(self, data, horas, funcionario_id=None):
+        """Salva o cálculo de horas trabalhadas do dia (insere ou atualiza em um único comando)"""
+        try:
+            funcionario_id = self._funcionario(funcionario_id)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                parametros = self._parametros_horas_dia(data, horas, funcionario_id)
+                self._execute_nomeada(cursor, 'salvar_horas_dia', parametros)
+                self._execute_nomeada(cursor, 'salvar_banco_horas', self._delta_banco_horas(parametros))
+                self._rolar_checkpoints_banco_horas(cursor, funcionario_id, parametros[0])
+                conn.commit()
+                return True
+
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar horas trabalhadas: {e}")
+            self.registrar_falha("salvar_horas", str(e))
+            return False
+
+    def recalcular_horas_periodo(self, data_inicio, data_fim, funcionario_id=None):
         """
-        Verifica se já existe registro no período especificado.
-        periodo: 'manha' (antes das 12h), 'tarde' (12h-18h), 'noite' (após 18h)
-        Retorna: lista de registros do período ou []
+        Recalcula horas_trabalhadas de cada dia de [data_inicio, data_fim] (datas inclusivas)
+        a partir das batidas, lidas em uma consulta e gravadas em lote na mesma transação.
+        Dias sem batidas ou com número ímpar de batidas ficam como estão.
+        Retorna: quantidade de dias gravados, ou None em caso de erro
         """
         try:
-            registros = self.obter_registros_dia(data)
-            registros_periodo = []
-            
-            for reg in registros:
-                data_hora_str = reg[1]
-                if isinstance(data_hora_str, str):
-                    data_hora = datetime.strptime(data_hora_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                else:
-                    data_hora = data_hora_str
-                
-                hora = data_hora.hour
-                
-                if periodo == 'manha' and hora < 12:
-                    registros_periodo.append(reg)
-                elif periodo == 'tarde' and 12 <= hora < 18:
-                    registros_periodo.append(reg)
-                elif periodo == 'noite' and hora >= 18:
-                    registros_periodo.append(reg)
-            
-            return registros_periodo
-        except Exception as e:
-            self.logger.error(f"Erro ao verificar registro do período: {e}")
-            return []
+            funcionario_id = self._funcionario(funcionario_id)
+            inicio, _ = self._intervalo_dia(data_inicio)
+            _, fim = self._intervalo_dia(data_fim)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(cursor, f'''
+                    SELECT {COLUNAS_REGISTRO}
+                    FROM registros
+                    WHERE funcionario_id = ? AND data_hora >= ? AND data_hora < ?
+                    ORDER BY data_hora
+                ''', (funcionario_id, inicio, fim))
+                por_dia = {}
+                for linha in cursor.fetchall():
+                    registro = Registro.de_linha(linha)
+                    por_dia.setdefault(registro.data_hora.date(), []).append(registro)
 
-    def calcular_total_horas_dia(self, data):
-        """
-        Calcula o total de horas trabalhadas no dia.
-        Retorna: dict com total_minutos, total_formatado, entradas e saidas
-        """
-        try:
-            registros = self.obter_registros_dia(data)
-            if not registros:
-                return None
-            
-            entradas = []
-            saidas = []
-            
-            for reg in registros:
-                data_hora_str = reg[1]
-                tipo = reg[2]
-                
-                if isinstance(data_hora_str, str):
-                    data_hora = datetime.strptime(data_hora_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                else:
-                    data_hora = data_hora_str
-                
-                if tipo.lower() == 'entrada':
-                    entradas.append(data_hora)
-                elif tipo.lower() == 'saida':
-                    saidas.append(data_hora)
-            
-            # Calcula total de minutos trabalhados
-            total_minutos = 0
-            pares = min(len(entradas), len(saidas))
-            
-            for i in range(pares):
-                delta = saidas[i] - entradas[i]
-                total_minutos += delta.total_seconds() / 60
-            
-            horas = int(total_minutos // 60)
-            minutos = int(total_minutos % 60)
-            
-            return {
-                'total_minutos': total_minutos,
-                'total_formatado': f"{horas}h{minutos:02d}min",
-                'entradas': entradas,
-                'saidas': saidas,
-                'registros_completos': len(entradas) == len(saidas)
-            }
-        except Exception as e:
-            self.logger.error(f"Erro ao calcular total de horas: {e}")
+                linhas = []
+                for dia, registros in sorted(por_dia.items()):
+                    horas = self._distribuir_horas(registros)
+                    if horas is not None:
+                        linhas.append(self._parametros_horas_dia(dia, horas, funcionario_id))
+                if linhas:
+                    self._executemany_nomeada(cursor, 'salvar_horas_dia', linhas)
+                    self._executemany_nomeada(cursor, 'salvar_banco_horas',
+                                              [self._delta_banco_horas(linha) for linha in linhas])
+                    self._rolar_checkpoints_banco_horas(cursor, funcionario_id, linhas[0][0])
+                conn.commit()
+                self.logger.info(f"Horas recalculadas: {len(linhas)} dias entre {inicio[:10]} e {para_data(data_fim)}")
+                return len(linhas)
+        except Exception as e:
+            self.logger.error(f"Erro ao recalcular horas do período: {e}")
+            self.registrar_falha("recalcular_horas", str(e))
             return None
 
-    def calcular_horas_trabalhadas_dia(self, data):
-        """Calcula as horas trabalhadas em um dia específico"""
-        try:
-            registros = self.obter_registros_dia(data)
-            if len(registros) % 2 != 0:
-                return None  # Número ímpar de registros
-
-            total_horas = {
-                'normais': 0,
-                'extras_60': 0,
-                'extras_65': 0,
-                'extras_75': 0,
-                'extras_100': 0,
-                'extras_150': 0,
-                'noturnas': 0
-            }
-
-            for i in range(0, len(registros), 2):
-                entrada_raw = registros[i][1]
-                saida_raw = registros[i+1][1]
-
-                entrada = (
-                    entrada_raw if isinstance(entrada_raw, datetime)
-                    else datetime.strptime(entrada_raw, '%Y-%m-%d %H:%M:%S')
-                )
-                saida = (
-                    saida_raw if isinstance(saida_raw, datetime)
-                    else datetime.strptime(saida_raw, '%Y-%m-%d %H:%M:%S')
-                )
-                
-                # Calcula diferença em horas
-                delta = saida - entrada
-                horas = delta.total_seconds() / 3600
-
-                # Distribuição das horas
-                if horas <= 8:
-                    total_horas['normais'] += horas
-                else:
-                    total_horas['normais'] += 8
-                    total_horas['extras_60'] += (horas - 8)
+    def _rolar_checkpoints_banco_horas(self, cursor, funcionario_id, desde):
+        """
+        Refaz os checkpoints mensais do banco de horas do funcionário a partir do dia `desde`.
+        Checkpoints anteriores continuam válidos: uma correção retroativa só relê os
+        deltas posteriores ao último checkpoint antes dela. Cada checkpoint guarda o
+        acumulado até o último dia de um mês que já tem lançamentos no mês seguinte.
+        """
+        desde = self._intervalo_data(desde)[0]
+        self._execute(cursor, '''
+            DELETE FROM banco_horas_checkpoints
+            WHERE funcionario_id = ? AND data >= ?
+        ''', (funcionario_id, desde))
+        self._execute_nomeada(cursor, 'checkpoint_banco_horas', (funcionario_id, desde))
+        base = cursor.fetchone()
+        base_data, extras, debitos = base if base else ('0001-01-01', 0, 0)
+
+        self._execute(cursor, '''
+            SELECT data, extras, debitos FROM banco_horas
+            WHERE funcionario_id = ? AND data > ?
+            ORDER BY data
+        ''', (funcionario_id, base_data))
+        checkpoints = []
+        mes_atual = None
+        for data, extras_dia, debitos_dia in cursor.fetchall():
+            mes = _inicio_mes(data)
+            if mes_atual is not None and mes != mes_atual:
+                fim_mes = _proximo_mes(mes_atual) - timedelta(days=1)
+                checkpoints.append((fim_mes.isoformat(), extras, debitos, funcionario_id))
+            mes_atual = mes
+            extras += extras_dia or 0
+            debitos += debitos_dia or 0
+
+        if checkpoints:
+            self._executemany(cursor, '''
+                INSERT INTO banco_horas_checkpoints (data, extras, debitos, funcionario_id)
+                VALUES (?, ?, ?, ?)
+            ''', checkpoints)
+
+    def _preencher_banco_horas_vazio(self, cursor):
+        """Migração 3: bancos anteriores ao banco_horas ganham deltas e checkpoints de horas_trabalhadas"""
+        self._execute(cursor, 'SELECT 1 FROM banco_horas LIMIT 1')
+        if cursor.fetchone():
+            return
+        jornada = JORNADA_MINUTOS / 60
+        self._execute(cursor, '''
+            INSERT INTO banco_horas (funcionario_id, data, extras, debitos)
+            SELECT
+                funcionario_id,
+                data,
+                COALESCE(horas_extras_60, 0) + COALESCE(horas_extras_65, 0) +
+                COALESCE(horas_extras_75, 0) + COALESCE(horas_extras_100, 0) +
+                COALESCE(horas_extras_150, 0),
+                CASE WHEN horas_normais < ? THEN ? - horas_normais ELSE 0 END
+            FROM horas_trabalhadas
+        ''', (jornada, jornada))
+        dias = cursor.rowcount
+        if dias and dias > 0:
+            self._execute(cursor, 'SELECT DISTINCT funcionario_id FROM banco_horas')
+            for (funcionario_id,) in cursor.fetchall():
+                self._rolar_checkpoints_banco_horas(cursor, funcionario_id, '0001-01-01')
+            self.logger.info(f"Banco de horas preenchido com {dias} dias")
+
+    def _migracao_eventos(self, cursor):
+        """
+        Migração 4: no Postgres, triggers em registros e configurações publicam cada
+        alteração no canal CANAL_EVENTOS (ver escutar_eventos). O payload leva só as
+        colunas de identificação, porque o NOTIFY é limitado a 8000 bytes. Registros é
+        particionada, então o nome da tabela vai como argumento (TG_TABLE_NAME seria a partição).
+        """
+        if self.backend != 'postgres':
+            return
+        self._execute(cursor, f'''
+            CREATE OR REPLACE FUNCTION notificar_evento() RETURNS trigger AS $$
+            DECLARE
+                linha JSONB;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    linha := to_jsonb(OLD);
+                ELSE
+                    linha := to_jsonb(NEW);
+                END IF;
+                PERFORM pg_notify('{CANAL_EVENTOS}', (
+                    jsonb_build_object('tabela', TG_ARGV[0], 'operacao', TG_OP)
+                    || (linha - 'valor' - 'motivo' - 'created_at' - 'updated_at')
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        for tabela in TABELAS_COM_EVENTOS:
+            self._execute(cursor, f'DROP TRIGGER IF EXISTS {tabela}_eventos ON {tabela}')
+            self._execute(cursor, f'''
+                CREATE TRIGGER {tabela}_eventos
+                AFTER INSERT OR UPDATE OR DELETE ON {tabela}
+                FOR EACH ROW EXECUTE FUNCTION notificar_evento('{tabela}')
+            ''')
+
+    def _migracao_chaves_registros(self, cursor):
+        """
+        Migração 5: chaves de idempotência das batidas. A unicidade fica em uma tabela
+        à parte porque um índice único em registros particionada teria que incluir
+        data_hora, e duas retentativas da mesma batida têm horários diferentes.
+        As batidas existentes reservam a chave padrão; duplicatas antigas continuam
+        lá até scripts/compactar_registros.py. Cada chave guarda o data_hora da batida
+        que a reservou, e arquivar_particoes libera as chaves do mês junto com a partição.
+        """
+        self._execute(cursor, '''
+            CREATE TABLE IF NOT EXISTS registros_chaves (
+                funcionario_id INTEGER NOT NULL,
+                chave TEXT NOT NULL,
+                data_hora TIMESTAMP NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (funcionario_id, chave)
+            )
+        ''')
+        self._execute(cursor, 'CREATE INDEX IF NOT EXISTS idx_registros_chaves_data_hora ON registros_chaves (data_hora)')
+        self._execute_nomeada(cursor, 'reservar_chaves_registros')
 
-                # Verifica horas noturnas (22h às 5h)
-                if entrada.hour >= 22 or saida.hour < 5:
-                    total_horas['noturnas'] += horas
+    def obter_saldo_banco_horas(self, data_ref=None, funcionario_id=None):
+        """Obtém o saldo do banco de horas até uma data (último checkpoint + deltas seguintes)"""
+        if not data_ref:
+            data_ref = datetime.now()
 
-            return total_horas
+        try:
+            funcionario_id = self._funcionario(funcionario_id)
+            dia, dia_seguinte = self._intervalo_data(data_ref)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute_nomeada(cursor, 'checkpoint_banco_horas', (funcionario_id, dia_seguinte))
+                base = cursor.fetchone()
+                base_data, extras, debitos = base if base else ('0001-01-01', 0, 0)
+                self._execute_nomeada(cursor, 'deltas_banco_horas', (funcionario_id, base_data, dia))
+                delta_extras, delta_debitos = cursor.fetchone()
+                extras = (extras or 0) + (delta_extras or 0)
+                debitos = (debitos or 0) + (delta_debitos or 0)
+                return {
+                    'saldo': extras - debitos,
+                    'extras': extras,
+                    'debitos': debitos
+                }
 
         except Exception as e:
-            self.logger.error(f"Erro ao calcular horas trabalhadas: {e}")
+            self.logger.error(f"Erro ao obter saldo do banco de horas: {e}")
             return None
 
-    def salvar_horas_trabalhadas_dia(self, data, horas):
-        """Salva o cálculo de horas trabalhadas do dia"""
+    def registrar_funcionario(self, funcionario_id, nome, ativo=True):
+        """Cadastra ou atualiza um funcionário (o id é escolhido por quem chama, ex.: matrícula)"""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Verifica se já existe registro para o dia
                 self._execute(cursor, '''
-                    SELECT id FROM horas_trabalhadas 
-                    WHERE DATE(data) = DATE(?)
-                ''', (data,))
-                
-                existe = cursor.fetchone()
-                
-                if existe:
-                    self._execute(cursor, '''
-                        UPDATE horas_trabalhadas 
-                        SET horas_normais = ?,
-                            horas_extras_60 = ?,
-                            horas_extras_65 = ?,
-                            horas_extras_75 = ?,
-                            horas_extras_100 = ?,
-                            horas_extras_150 = ?,
-                            horas_noturnas = ?,
-                            status = ?,
-                            observacao = ?
-                        WHERE DATE(data) = DATE(?)
-                    ''', (
-                        horas['normais'],
-                        horas['extras_60'],
-                        horas['extras_65'],
-                        horas['extras_75'],
-                        horas['extras_100'],
-                        horas['extras_150'],
-                        horas['noturnas'],
-                        'ATUALIZADO',
-                        'Cálculo atualizado',
-                        data
-                    ))
-                else:
-                    self._execute(cursor, '''
-                        INSERT INTO horas_trabalhadas (
-                            data, horas_normais, horas_extras_60,
-                            horas_extras_65, horas_extras_75,
-                            horas_extras_100, horas_extras_150,
-                            horas_noturnas, status, observacao
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        data,
-                        horas['normais'],
-                        horas['extras_60'],
-                        horas['extras_65'],
-                        horas['extras_75'],
-                        horas['extras_100'],
-                        horas['extras_150'],
-                        horas['noturnas'],
-                        'CALCULADO',
-                        'Cálculo inicial'
-                    ))
-                
+                    INSERT INTO funcionarios (id, nome, ativo)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        nome = EXCLUDED.nome,
+                        ativo = EXCLUDED.ativo
+                ''', (funcionario_id, nome, ativo))
                 conn.commit()
-                return True
-                
+            self.logger.info(f"Funcionário registrado: {funcionario_id} - {nome}")
+            return True
         except Exception as e:
-            self.logger.error(f"Erro ao salvar horas trabalhadas: {e}")
-            self.registrar_falha("salvar_horas", str(e))
+            self.logger.error(f"Erro ao registrar funcionário: {e}")
             return False
 
-    def obter_saldo_banco_horas(self, data_ref=None):
-        """Obtém o saldo do banco de horas até uma data"""
-        if not data_ref:
-            data_ref = datetime.now()
-
+    def obter_funcionarios(self, somente_ativos=True):
+        """Lista os funcionários como [(id, nome, ativo)], ordenados por id"""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT 
-                        SUM(horas_extras_60 + horas_extras_65 + 
-                            horas_extras_75 + horas_extras_100 + 
-                            horas_extras_150) as total_extras,
-                        SUM(CASE 
-                            WHEN horas_normais < 8 
-                            THEN 8 - horas_normais 
-                            ELSE 0 
-                        END) as total_debitos
-                    FROM horas_trabalhadas
-                    WHERE data <= ?
-                ''', (data_ref.strftime('%Y-%m-%d'),))
-                
-                resultado = cursor.fetchone()
-                if resultado:
-                    return {
-                        'saldo': resultado[0] - resultado[1],
-                        'extras': resultado[0],
-                        'debitos': resultado[1]
-                    }
-                return {'saldo': 0, 'extras': 0, 'debitos': 0}
-                
+                filtro = 'WHERE ativo' if somente_ativos else ''
+                self._execute(cursor, f'SELECT id, nome, ativo FROM funcionarios {filtro} ORDER BY id')
+                return [(id_, nome, bool(ativo)) for id_, nome, ativo in cursor.fetchall()]
         except Exception as e:
-            self.logger.error(f"Erro ao obter saldo do banco de horas: {e}")
-            return None
+            self.logger.error(f"Erro ao obter funcionários: {e}")
+            return []
 
-    def registrar_configuracao(self, chave, valor):
-        """Registra ou atualiza uma configuração"""
+    def registrar_configuracao(self, chave, valor, funcionario_id=None):
+        """
+        Registra ou atualiza uma configuração (write-through no cache).
+        Com funcionario_id, grava um valor só daquele funcionário (salário, horários...),
+        que tem precedência sobre o valor global em obter_configuracao.
+        """
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                if self.backend == 'postgres':
+                if funcionario_id is not None:
                     self._execute(cursor, '''
-                        INSERT INTO configuracoes (chave, valor)
-                        VALUES (?, ?)
-                        ON CONFLICT (chave) DO UPDATE SET
+                        INSERT INTO configuracoes_funcionario (funcionario_id, chave, valor)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT (funcionario_id, chave) DO UPDATE SET
                             valor = EXCLUDED.valor,
                             updated_at = CURRENT_TIMESTAMP
-                    ''', (chave, valor))
+                    ''', (funcionario_id, chave, valor))
                 else:
                     self._execute(cursor, '''
-                        INSERT OR REPLACE INTO configuracoes (chave, valor)
+                        INSERT INTO configuracoes (chave, valor)
                         VALUES (?, ?)
+                        ON CONFLICT (chave) DO UPDATE SET
+                            valor = EXCLUDED.valor,
+                            updated_at = CURRENT_TIMESTAMP
                     ''', (chave, valor))
                 conn.commit()
-                return True
+            if funcionario_id is not None:
+                self._cache_config.definir((funcionario_id, chave), valor)
+                self._espelhar('configuracoes_funcionario')
+            else:
+                self._cache_config.definir(chave, valor)
+                self._espelhar('configuracoes')
+            return True
         except Exception as e:
             self.logger.error(f"Erro ao registrar configuração: {e}")
             return False
 
-    def obter_configuracao(self, chave):
-        """Obtém uma configuração específica"""
+    def obter_configuracao(self, chave, funcionario_id=None):
+        """
+        Obtém uma configuração específica (servida pelo cache enquanto válida).
+        Com funcionario_id, devolve o valor do funcionário ou, se ele não tiver, o global.
+        """
+        if funcionario_id is not None:
+            valor = self._obter_configuracao_funcionario(chave, funcionario_id)
+            if valor is not None:
+                return valor
+
+        encontrado, valor = self._cache_config.obter(chave)
+        if encontrado:
+            return valor
+
+        local = self._leitura_local()
+        if local is not None:
+            valor = local.obter_configuracao(chave)
+            self._cache_config.definir(chave, valor)
+            return valor
+
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                self._execute(cursor, '''
-                    SELECT valor FROM configuracoes
-                    WHERE chave = ?
-                ''', (chave,))
+                self._execute_nomeada(cursor, 'obter_configuracao', (chave,))
                 resultado = cursor.fetchone()
-                return resultado[0] if resultado else None
+                valor = resultado[0] if resultado else None
+            self._cache_config.definir(chave, valor)
+            return valor
         except Exception as e:
             self.logger.error(f"Erro ao obter configuração: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def _obter_configuracao_funcionario(self, chave, funcionario_id):
+        """Valor da chave só do funcionário (None se ele usa o global)"""
+        encontrado, valor = self._cache_config.obter((funcionario_id, chave))
+        if encontrado:
+            return valor
+
+        local = self._leitura_local()
+        if local is not None:
+            valor = local._obter_configuracao_funcionario(chave, funcionario_id)
+            self._cache_config.definir((funcionario_id, chave), valor)
+            return valor
+
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute_nomeada(cursor, 'obter_configuracao_funcionario', (funcionario_id, chave))
+                resultado = cursor.fetchone()
+                valor = resultado[0] if resultado else None
+            self._cache_config.definir((funcionario_id, chave), valor)
+            return valor
+        except Exception as e:
+            self.logger.error(f"Erro ao obter configuração do funcionário: {e}")
+            return None
+
+    def obter_configuracoes(self):
+        """
+        Carrega todas as configurações em uma consulta por tabela e preenche o cache
+        (as de cada funcionário entram com a chave (funcionario_id, chave)).
+        Retorna só as globais.
+        """
+        try:
+            todas = self._ler_configuracoes()
+            self._cache_config.carregar(todas)
+            return {chave: valor for chave, valor in todas.items() if isinstance(chave, str)}
+        except Exception as e:
+            self.logger.error(f"Erro ao obter configurações: {e}")
+            return {}
+
+    def _ler_configuracoes(self):
+        local = self._leitura_local()
+        if local is not None:
+            return local._ler_configuracoes()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, 'SELECT chave, valor FROM configuracoes')
+            todas = dict(cursor.fetchall())
+            self._execute(cursor, 'SELECT funcionario_id, chave, valor FROM configuracoes_funcionario')
+            todas.update(((funcionario_id, chave), valor) for funcionario_id, chave, valor in cursor.fetchall())
+        return todas
+
+    def _iniciar_escuta_configuracoes(self):
+        """Thread que invalida o cache quando outro processo altera configurações (escutar_eventos)"""
+        self._escuta_thread = threading.Thread(
+            target=self._escutar_configuracoes,
+            name='escuta-configuracoes',
+            daemon=True
+        )
+        self._escuta_thread.start()
+
+    def _escutar_configuracoes(self):
+        # A invalidação acontece dentro de escutar_eventos; basta consumir os eventos
+        for _ in self.escutar_eventos(tabelas=('configuracoes', 'configuracoes_funcionario')):
+            pass
+
+    def _invalidar_por_evento(self, evento):
+        """Descarta do cache (e da réplica) o que o evento diz ter mudado"""
+        if evento.tabela is None:
+            # Início ou reconexão: alterações perdidas enquanto estava desconectado
+            self._cache_config.invalidar()
+        elif evento.tabela == 'configuracoes_funcionario':
+            self._cache_config.invalidar((evento.funcionario_id, evento.chave))
+        elif evento.tabela == 'configuracoes':
+            self._cache_config.invalidar(evento.chave)
+        else:
+            return
+        if self._replica is not None:
+            self._replica.invalidar()
+
+    def escutar_eventos(self, tabelas=None, timeout=None):
+        """
+        Itera as alterações em registros e configurações feitas por qualquer processo.
+
+        No Postgres os eventos vêm do LISTEN no canal do trigger notificar_evento (migração 4).
+        No SQLite, PRAGMA data_version é verificado a cada DB_EVENTOS_INTERVALO segundos
+        (padrão 1) e, quando outro commit aconteceu, são emitidas as batidas novas e as
+        configurações que mudaram. O primeiro evento, e o que segue cada reconexão, é
+        Evento(None, 'CONECTADO'): o que mudou antes dele deve ser relido do banco.
+        O cache de configurações já está invalidado quando o evento chega, então
+        obter_configuracao devolve o valor novo.
+
+        `tabelas` filtra os eventos por tabela; a iteração termina após `timeout` segundos
+        (None: até db.fechar()).
+        """
+        prazo = None if timeout is None else monotonic() + timeout
+        if self.backend == 'postgres':
+            eventos = self._eventos_postgres(prazo)
+        else:
+            eventos = self._eventos_sqlite(prazo)
+        try:
+            for evento in eventos:
+                if evento.tabela is None or tabelas is None or evento.tabela in tabelas:
+                    self._invalidar_por_evento(evento)
+                    yield evento
+        finally:
+            eventos.close()
+
+    def _espera_eventos(self, prazo, maximo):
+        """Segundos a esperar pelo próximo evento, limitados ao prazo (<= 0: acabou)"""
+        if self._encerrando.is_set():
+            return 0
+        if prazo is None:
+            return maximo
+        return min(maximo, prazo - monotonic())
+
+    def _eventos_postgres(self, prazo):
+        while self._espera_eventos(prazo, 5) > 0:
+            try:
+                with psycopg.connect(self._montar_conninfo(), autocommit=True) as conn:
+                    conn.execute(f'LISTEN {CANAL_EVENTOS}')
+                    yield Evento(None, 'CONECTADO')
+                    while True:
+                        espera = self._espera_eventos(prazo, 5)
+                        if espera <= 0:
+                            return
+                        for notificacao in conn.notifies(timeout=espera):
+                            try:
+                                evento = Evento.de_payload(notificacao.payload)
+                            except (ValueError, KeyError):
+                                self.logger.warning(f"Evento inválido ignorado: {notificacao.payload}")
+                                continue
+                            yield evento
+            except Exception as e:
+                self.logger.warning(f"Escuta de eventos interrompida: {e}")
+                self._encerrando.wait(max(self._espera_eventos(prazo, 5), 0))
+
+    def _eventos_sqlite(self, prazo):
+        intervalo = float(os.getenv('DB_EVENTOS_INTERVALO', '1'))
+        while self._espera_eventos(prazo, intervalo) > 0:
+            conn = None
+            try:
+                # Conexão própria: data_version só muda com commits de outras conexões
+                conn = self._connect_sqlite()
+                versao = conn.execute('PRAGMA data_version').fetchone()[0]
+                ultimo_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM registros').fetchone()[0]
+                configuracoes = self._estado_configuracoes(conn)
+                yield Evento(None, 'CONECTADO')
+                while True:
+                    espera = self._espera_eventos(prazo, intervalo)
+                    if espera <= 0:
+                        return
+                    self._encerrando.wait(espera)
+                    atual = conn.execute('PRAGMA data_version').fetchone()[0]
+                    if atual == versao:
+                        continue
+                    versao = atual
+                    novos = conn.execute(f'''
+                        SELECT {COLUNAS_REGISTRO} FROM registros
+                        WHERE id > ?
+                        ORDER BY id
+                    ''', (ultimo_id,)).fetchall()
+                    anteriores, configuracoes = configuracoes, self._estado_configuracoes(conn)
+                    for linha in novos:
+                        registro = Registro.de_linha(linha)
+                        ultimo_id = registro.id
+                        yield Evento('registros', 'INSERT', registro.funcionario_id, None,
+                                     registro.id, registro.data_hora, registro.tipo, registro.status)
+                    for (tabela, funcionario_id, chave) in anteriores.keys() | configuracoes.keys():
+                        if (tabela, funcionario_id, chave) not in configuracoes:
+                            operacao = 'DELETE'
+                        elif (tabela, funcionario_id, chave) not in anteriores:
+                            operacao = 'INSERT'
+                        elif anteriores[tabela, funcionario_id, chave] != configuracoes[tabela, funcionario_id, chave]:
+                            operacao = 'UPDATE'
+                        else:
+                            continue
+                        yield Evento(tabela, operacao, funcionario_id, chave)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Escuta de eventos interrompida: {e}")
+                self._encerrando.wait(max(self._espera_eventos(prazo, 5), 0))
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _estado_configuracoes(self, conn):
+        """{(tabela, funcionario_id, chave): valor} para comparar entre verificações do SQLite"""
+        estado = {
+            ('configuracoes', None, chave): valor
+            for chave, valor in conn.execute('SELECT chave, valor FROM configuracoes')
+        }
+        estado.update(
+            (('configuracoes_funcionario', funcionario_id, chave), valor)
+            for funcionario_id, chave, valor in conn.execute(
+                'SELECT funcionario_id, chave, valor FROM configuracoes_funcionario')
+        )
+        return estado
+
+
+class DatabaseEmSegundoPlano:
+    """
+    Abre o armazenamento de abrir_armazenamento (no SQL: DNS, TLS, pool e schema) em
+    uma thread, para que a primeira consulta não pague a conexão no caminho crítico
+    enquanto o processo inicializa o resto (Config, Telegram). `obter()` espera a
+    abertura terminar.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._pronto = threading.Event()
+        self._db = None
+        self._erro = None
+        threading.Thread(target=self._abrir, name='abrir-database', daemon=True).start()
+
+    def _abrir(self):
+        try:
+            self._db = abrir_armazenamento(**self._kwargs)
+        except Exception as e:
+            self._erro = e
+        finally:
+            self._pronto.set()
+
+    def obter(self, timeout=None):
+        """Armazenamento aberto; relança o erro da abertura ou TimeoutError"""
+        if not self._pronto.wait(timeout):
+            raise TimeoutError('Abertura do banco de dados ainda em andamento')
+        if self._erro is not None:
+            raise self._erro
+        return self._db
@@ -0,0 +1,248 @@
+# src/utils/database_async.py
+import asyncio
+import functools
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from src.utils.database import Database
+from src.utils.linhas import Registro, FalhaRegistro
+
+try:
+    from psycopg_pool import AsyncConnectionPool
+except Exception:  # pragma: no cover - ambiente sem psycopg_pool
+    AsyncConnectionPool = None
+
+
+class DatabaseAsync:
+    """
+    Contraparte asyncio de Database, com a mesma superfície de métodos.
+
+    No Postgres, as leituras usadas pelo listener e pelos relatórios rodam
+    nativamente em um AsyncConnectionPool do psycopg. Os demais métodos, e
+    tudo no SQLite, chamam o Database síncrono em um pool de threads; cada
+    thread tem sua própria conexão SQLite.
+
+    Uso:
+        async with DatabaseAsync() as db:
+            registros, total = await asyncio.gather(
+                db.obter_registros_dia(hoje), db.calcular_total_horas_dia(hoje))
+    """
+
+    def __init__(self, db=None, **kwargs):
+        self.db = db or Database(**kwargs)
+        self.backend = self.db.backend
+        self.logger = logging.getLogger('DatabaseAsync')
+        self._executor = ThreadPoolExecutor(
+            max_workers=getattr(self.db, 'pool_max_size', 1),
+            thread_name_prefix='database-async'
+        )
+        self._pool = None
+
+    async def __aenter__(self):
+        await self.abrir()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.fechar()
+
+    async def abrir(self):
+        """Abre o pool assíncrono do Postgres (precisa de um event loop em execução)"""
+        if self.backend != 'postgres' or self._pool is not None:
+            return
+        if self.db._replica is not None:
+            # Leituras servidas pela réplica local (DB_REPLICA_LOCAL), via threads
+            return
+        if AsyncConnectionPool is None:
+            self.logger.warning('psycopg_pool não está instalado; consultas assíncronas usarão threads.')
+            return
+
+        conninfo = await self._em_thread(self.db._montar_conninfo)
+        self._pool = AsyncConnectionPool(
+            conninfo,
+            min_size=self.db.pool_min_size,
+            max_size=self.db.pool_max_size,
+            max_idle=self.db.pool_max_idle,
+            timeout=self.db.pool_timeout,
+            check=AsyncConnectionPool.check_connection if self.db.pool_check else None,
+            configure=self._configurar_conexao,
+            name='sistema-ponto-async',
+            open=False
+        )
+        await self._pool.open()
+
+    async def fechar(self, fechar_database=True):
+        """Fecha o pool assíncrono, as threads e, por padrão, o Database síncrono"""
+        if self._pool is not None:
+            try:
+                await self._pool.close()
+            except Exception as e:
+                self.logger.warning(f"Erro ao fechar pool assíncrono: {e}")
+            self._pool = None
+        self._executor.shutdown(wait=False)
+        if fechar_database:
+            self.db.fechar()
+
+    async def _configurar_conexao(self, conn):
+        if self.db.somente_leitura:
+            await conn.set_read_only(True)
+
+    def _em_thread(self, funcao, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, functools.partial(funcao, *args, **kwargs))
+
+    def __getattr__(self, nome):
+        """Qualquer outro método público de Database vira uma corrotina executada em thread"""
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        metodo = getattr(self.db, nome)
+        if not callable(metodo):
+            return metodo
+
+        async def chamar(*args, **kwargs):
+            return await self._em_thread(metodo, *args, **kwargs)
+
+        chamar.__name__ = nome
+        chamar.__doc__ = metodo.__doc__
+        return chamar
+
+    async def _iterar_em_thread(self, metodo, *args, batch=500, **kwargs):
+        """Consome um iterador de Database em lotes, sempre na mesma thread (e conexão)"""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='database-async-iter') as executor:
+            iterador = metodo(*args, batch=batch, **kwargs)
+            try:
+                while True:
+                    lote = await loop.run_in_executor(executor, list, itertools.islice(iterador, batch))
+                    if not lote:
+                        break
+                    for linha in lote:
+                        yield linha
+            finally:
+                await loop.run_in_executor(executor, iterador.close)
+
+    def iter_registros_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        """Versão assíncrona (async for) de Database.iter_registros_periodo"""
+        return self._iterar_em_thread(self.db.iter_registros_periodo, data_inicio, data_fim,
+                                      batch=batch, funcionario_id=funcionario_id)
+
+    def iter_horas_trabalhadas_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        return self._iterar_em_thread(self.db.iter_horas_trabalhadas_periodo, data_inicio, data_fim,
+                                      batch=batch, funcionario_id=funcionario_id)
+
+    def iter_falhas_periodo(self, data_inicio, data_fim, batch=500):
+        return self._iterar_em_thread(self.db.iter_falhas_periodo, data_inicio, data_fim, batch=batch)
+
+    async def escutar_eventos(self, tabelas=None, timeout=None):
+        """Versão assíncrona (async for) de Database.escutar_eventos, em uma thread própria"""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='database-async-eventos') as executor:
+            eventos = self.db.escutar_eventos(tabelas=tabelas, timeout=timeout)
+            try:
+                while True:
+                    evento = await loop.run_in_executor(executor, next, eventos, None)
+                    if evento is None:
+                        break
+                    yield evento
+            finally:
+                await loop.run_in_executor(executor, eventos.close)
+
+    @property
+    def _nativo(self):
+        return self._pool is not None
+
+    async def _consultar(self, query, params=None, preparar=None):
+        query = self.db._format_query(query)
+        inicio = perf_counter()
+        async with self._pool.connection() as conn:
+            self.db._estatisticas.registrar_conexao((perf_counter() - inicio) * 1000)
+            inicio = perf_counter()
+            cursor = await conn.execute(query, params, prepare=preparar)
+            linhas = await cursor.fetchall()
+        self.db._contabilizar_consulta(query, (perf_counter() - inicio) * 1000, len(linhas), params)
+        return linhas
+
+    async def _consultar_nomeada(self, nome, params=()):
+        """Mesma consulta compilada de Database._execute_nomeada, preparada no servidor"""
+        return await self._consultar(self.db._consultas[nome], params, preparar=self.db.preparar or None)
+
+    async def obter_registros_dia(self, data, funcionario_id=None):
+        """Obtém todos os registros de um dia específico"""
+        funcionario_id = self.db._funcionario(funcionario_id)
+        if not self._nativo:
+            return await self._em_thread(self.db.obter_registros_dia, data, funcionario_id)
+        try:
+            linhas = await self._consultar_nomeada('registros_dia', (funcionario_id, *self.db._intervalo_dia(data)))
+            return [Registro.de_linha(linha) for linha in linhas]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter registros do dia: {e}")
+            return []
+
+    async def obter_registros_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        funcionario_id = self.db._funcionario(funcionario_id)
+        if not self._nativo:
+            return await self._em_thread(self.db.obter_registros_periodo, data_inicio, data_fim, funcionario_id)
+        try:
+            linhas = await self._consultar_nomeada('registros_periodo', (funcionario_id, data_inicio, data_fim))
+            return [Registro.de_linha(linha) for linha in linhas]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter registros do período: {e}")
+            return []
+
+    async def obter_falhas_periodo(self, data_inicio, data_fim):
+        if not self._nativo:
+            return await self._em_thread(self.db.obter_falhas_periodo, data_inicio, data_fim)
+        try:
+            linhas = await self._consultar_nomeada('falhas_periodo', (data_inicio, data_fim))
+            return [FalhaRegistro.de_linha(linha) for linha in linhas]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter falhas do período: {e}")
+            return []
+
+    async def obter_resumo_dia(self, data, funcionario_id=None):
+        """Obtém o resumo pré-calculado de um dia (ou None se não houver batidas)"""
+        funcionario_id = self.db._funcionario(funcionario_id)
+        if not self._nativo:
+            return await self._em_thread(self.db.obter_resumo_dia, data, funcionario_id)
+        try:
+            dia, _ = self.db._intervalo_data(data)
+            linhas = await self._consultar_nomeada('resumo_dia', (funcionario_id, dia))
+            return self.db._linha_para_resumo(linhas[0]) if linhas else None
+        except Exception as e:
+            self.logger.error(f"Erro ao obter resumo do dia: {e}")
+            return None
+
+    async def obter_resumos_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        """Obtém os resumos diários de [data_inicio, data_fim] (datas inclusivas) em uma consulta"""
+        funcionario_id = self.db._funcionario(funcionario_id)
+        if not self._nativo:
+            return await self._em_thread(self.db.obter_resumos_periodo, data_inicio, data_fim, funcionario_id)
+        try:
+            inicio, _ = self.db._intervalo_data(data_inicio)
+            _, fim = self.db._intervalo_data(data_fim)
+            linhas = await self._consultar_nomeada('resumos_periodo', (funcionario_id, inicio, fim))
+            return [self.db._linha_para_resumo(linha) for linha in linhas]
+        except Exception as e:
+            self.logger.error(f"Erro ao obter resumos do período: {e}")
+            return []
+
+    async def calcular_total_horas_dia(self, data, funcionario_id=None):
+        """Mesmo retorno de Database.calcular_total_horas_dia"""
+        if not self._nativo:
+            return await self._em_thread(self.db.calcular_total_horas_dia, data, funcionario_id)
+        try:
+            resumo = await self.obter_resumo_dia(data, funcionario_id)
+            if not resumo:
+                return None
+            return self.db._total_horas_do_resumo(resumo)
+        except Exception as e:
+            self.logger.error(f"Erro ao calcular total de horas: {e}")
+            return None
+
+    async def obter_configuracao(self, chave, funcionario_id=None):
+        if funcionario_id is None:
+            encontrado, valor = self.db._cache_config.obter(chave)
+            if encontrado:
+                return valor
+        return await self._em_thread(self.db.obter_configuracao, chave, funcionario_id)
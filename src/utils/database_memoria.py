@@ -0,0 +1,352 @@
+# src/utils/database_memoria.py
+import itertools
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from time import monotonic
+
+from src.utils.armazenamento import Armazenamento
+from src.utils.linhas import (
+    Registro, HorasTrabalhadas, FalhaRegistro, CalculoMensal, JornadaDia, Evento,
+    para_data, para_datetime
+)
+
+
+class _Batidas:
+    """Batidas de um funcionário em listas paralelas ordenadas por data_hora (busca com bisect)"""
+
+    def __init__(self):
+        self.instantes = []
+        self.registros = []
+        self.chaves = set()  # chaves de idempotência já usadas, como registros_chaves
+
+    def inserir(self, registro):
+        posicao = bisect_right(self.instantes, registro.data_hora)
+        self.instantes.insert(posicao, registro.data_hora)
+        self.registros.insert(posicao, registro)
+
+    def estender(self, registros):
+        """Acrescenta vários de uma vez; só reordena se algum vier antes do último gravado"""
+        if not registros:
+            return
+        fora_de_ordem = self.instantes and registros[0].data_hora < self.instantes[-1]
+        self.registros.extend(registros)
+        if fora_de_ordem:
+            self.registros.sort(key=lambda registro: registro.data_hora)
+            self.instantes = [registro.data_hora for registro in self.registros]
+        else:
+            self.instantes.extend(registro.data_hora for registro in registros)
+
+    def intervalo(self, inicio, fim):
+        """Batidas com inicio <= data_hora < fim"""
+        return self.registros[bisect_left(self.instantes, inicio):bisect_left(self.instantes, fim)]
+
+
+class DatabaseMemoria(Armazenamento):
+    """
+    Backend de armazenamento inteiramente em memória, com a mesma superfície de Database.
+
+    As batidas de cada funcionário ficam em listas ordenadas por data_hora e as consultas
+    por dia ou período são buscas binárias (bisect), então milhões de batidas sintéticas
+    podem alimentar os benchmarks de cálculo e relatório sem ruído de disco ou rede.
+    Resumos diários e jornadas são calculados na leitura, pelas mesmas regras de
+    Armazenamento. Nada é persistido e não há transações: cada gravação vale na hora.
+    """
+
+    def __init__(self, **kwargs):
+        self.backend = 'memoria'
+        self.logger = logging.getLogger('DatabaseMemoria')
+        self.funcionario_id = int(os.getenv('FUNCIONARIO_ID', '1'))
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._batidas = {}
+        self._horas = {}
+        self._banco_horas = {}
+        self._calculos = {}
+        self._falhas = []
+        self._instantes_falhas = []  # paralela a _falhas, como em _Batidas
+        self._configuracoes = {}
+        self._configuracoes_funcionario = {}
+        self._funcionarios = {1: ('Funcionário 1', True)}
+        # Só configurações geram eventos: batidas sintéticas aos milhões não devem acumular aqui
+        self._eventos = []
+        self._novo_evento = threading.Condition(self._lock)
+        self._encerrando = threading.Event()
+
+    def _batidas_de(self, funcionario_id):
+        return self._batidas.setdefault(self._funcionario(funcionario_id), _Batidas())
+
+    def _limites(self, data_inicio, data_fim):
+        """[inicio, fim] como no BETWEEN das consultas SQL: datas sem hora valem à meia-noite"""
+        return para_datetime(data_inicio), para_datetime(data_fim)
+
+    # Batidas
+
+    def registrar_ponto(self, data_hora, tipo, status, motivo=None, funcionario_id=None, chave=None):
+        funcionario_id = self._funcionario(funcionario_id)
+        # Como no SQL: a chave do cliente e a padrão (minuto + tipo) entram juntas ou nenhuma
+        padrao = self._chave_registro(data_hora, tipo)
+        chave = chave or padrao
+        chaves = {chave, padrao}
+        with self._lock:
+            batidas = self._batidas_de(funcionario_id)
+            if not chaves.isdisjoint(batidas.chaves):
+                self.logger.info(f"Registro de ponto repetido ignorado: {chave}")
+                return True
+            batidas.chaves.update(chaves)
+            registro = Registro(next(self._ids), para_datetime(data_hora).replace(microsecond=0),
+                                tipo, status, motivo, datetime.now(), funcionario_id)
+            batidas.inserir(registro)
+        return True
+
+    def registrar_pontos_em_lote(self, registros, funcionario_id=None):
+        funcionario_id = self._funcionario(funcionario_id)
+        with self._lock:
+            batidas = self._batidas_de(funcionario_id)
+            agora = datetime.now()
+            lote = sorted(
+                ((para_datetime(registro[0]), registro[1], registro[2], registro[3] if len(registro) > 3 else None)
+                 for registro in registros),
+                key=lambda registro: registro[0]
+            )
+            novos = []
+            # Em ordem de data_hora, como no SQL: de cada chave repetida fica a primeira batida
+            for data_hora, tipo, status, motivo in lote:
+                chave = self._chave_registro(data_hora, tipo)
+                if chave in batidas.chaves:
+                    continue
+                batidas.chaves.add(chave)
+                novos.append(Registro(next(self._ids), data_hora, tipo, status, motivo, agora, funcionario_id))
+            batidas.estender(novos)
+        return len(novos)
+
+    def obter_registros_dia(self, data, funcionario_id=None):
+        inicio, fim = (para_datetime(valor) for valor in self._intervalo_dia(data))
+        with self._lock:
+            return self._batidas_de(funcionario_id).intervalo(inicio, fim)
+
+    def obter_registros_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        inicio, fim = self._limites(data_inicio, data_fim)
+        with self._lock:
+            batidas = self._batidas_de(funcionario_id)
+            return batidas.registros[bisect_left(batidas.instantes, inicio):bisect_right(batidas.instantes, fim)]
+
+    def iter_registros_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        yield from self.obter_registros_periodo(data_inicio, data_fim, funcionario_id)
+
+    def obter_ultimo_registro(self, funcionario_id=None):
+        with self._lock:
+            registros = self._batidas_de(funcionario_id).registros
+            return registros[-1] if registros else None
+
+    def _batidas_por_dia(self, data_inicio, data_fim, funcionario_id):
+        """{date: [Registro]} dos dias de [data_inicio, data_fim] (datas inclusivas)"""
+        inicio = para_datetime(self._intervalo_dia(data_inicio)[0])
+        fim = para_datetime(self._intervalo_dia(data_fim)[1])
+        with self._lock:
+            registros = self._batidas_de(funcionario_id).intervalo(inicio, fim)
+        dias = {}
+        for registro in registros:
+            dias.setdefault(registro.data_hora.date(), []).append(registro)
+        return dias
+
+    def obter_jornadas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        """Mesmo pareamento da consulta jornadas_periodo: entrada seguida de saída é um par"""
+        jornadas = []
+        for dia, registros in sorted(self._batidas_por_dia(data_inicio, data_fim, funcionario_id).items()):
+            tipos = [registro.tipo.lower() for registro in registros]
+            pares = []
+            minutos_pausa = 0
+            for i, registro in enumerate(registros):
+                if tipos[i] != 'entrada':
+                    continue
+                if i + 1 < len(registros) and tipos[i + 1] == 'saida':
+                    pares.append((registro.data_hora, registros[i + 1].data_hora))
+                if i > 0 and tipos[i - 1] == 'saida':
+                    minutos_pausa += (registro.data_hora - registros[i - 1].data_hora).total_seconds() / 60
+            jornadas.append(JornadaDia(
+                dia, len(registros), len(pares),
+                pares[0][0] if pares else None,
+                max(saida for _, saida in pares) if pares else None,
+                sum((saida - entrada).total_seconds() / 60 for entrada, saida in pares),
+                minutos_pausa,
+                ','.join(f"{entrada:%H:%M:%S}-{saida:%H:%M:%S}" for entrada, saida in pares)
+            ))
+        return jornadas
+
+    def obter_resumo_dia(self, data, funcionario_id=None):
+        registros = self.obter_registros_dia(data, funcionario_id)
+        if not registros:
+            return None
+        resumo = self._calcular_resumo_dia([(registro.data_hora, registro.tipo) for registro in registros])
+        return {'data': para_data(data), **resumo}
+
+    def obter_resumos_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        return [
+            {'data': dia, **self._calcular_resumo_dia([(registro.data_hora, registro.tipo) for registro in registros])}
+            for dia, registros in sorted(self._batidas_por_dia(data_inicio, data_fim, funcionario_id).items())
+        ]
+
+    # Horas, banco de horas e cálculos mensais
+
+    def _gravar_horas(self, parametros):
+        data, normais, extras_60, extras_65, extras_75, extras_100, extras_150, noturnas, funcionario_id = parametros
+        data = para_data(data)
+        horas = self._horas.setdefault(funcionario_id, {})
+        anterior = horas.get(data)
+        horas[data] = HorasTrabalhadas(
+            anterior.id if anterior else next(self._ids), data, None, None,
+            normais, extras_60, extras_65, extras_75, extras_100, extras_150, noturnas,
+            'ATUALIZADO' if anterior else 'CALCULADO',
+            'Cálculo atualizado' if anterior else 'Cálculo inicial',
+            anterior.created_at if anterior else datetime.now(),
+            funcionario_id
+        )
+        _, extras, debito, _ = self._delta_banco_horas(parametros)
+        deltas = self._banco_horas.setdefault(funcionario_id, ([], {}))
+        if data not in deltas[1]:
+            insort(deltas[0], data)
+        deltas[1][data] = (extras, debito)
+
+    def salvar_horas_trabalhadas_dia(self, data, horas, funcionario_id=None):
+        with self._lock:
+            self._gravar_horas(self._parametros_horas_dia(data, horas, self._funcionario(funcionario_id)))
+        return True
+
+    def recalcular_horas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        funcionario_id = self._funcionario(funcionario_id)
+        gravados = 0
+        with self._lock:
+            for dia, registros in sorted(self._batidas_por_dia(data_inicio, data_fim, funcionario_id).items()):
+                horas = self._distribuir_horas(registros)
+                if horas is not None:
+                    self._gravar_horas(self._parametros_horas_dia(dia, horas, funcionario_id))
+                    gravados += 1
+        return gravados
+
+    def obter_horas_trabalhadas_periodo(self, data_inicio, data_fim, funcionario_id=None):
+        inicio, fim = para_data(data_inicio), para_data(data_fim)
+        with self._lock:
+            horas = self._horas.get(self._funcionario(funcionario_id), {})
+            return [horas[dia] for dia in sorted(horas) if inicio <= dia <= fim]
+
+    def iter_horas_trabalhadas_periodo(self, data_inicio, data_fim, batch=500, funcionario_id=None):
+        yield from self.obter_horas_trabalhadas_periodo(data_inicio, data_fim, funcionario_id)
+
+    def obter_saldo_banco_horas(self, data_ref=None, funcionario_id=None):
+        data_ref = para_data(data_ref or datetime.now())
+        with self._lock:
+            datas, deltas = self._banco_horas.get(self._funcionario(funcionario_id), ([], {}))
+            ate = datas[:bisect_right(datas, data_ref)]
+            extras = sum(deltas[dia][0] for dia in ate)
+            debitos = sum(deltas[dia][1] for dia in ate)
+        return {'saldo': extras - debitos, 'extras': extras, 'debitos': debitos}
+
+    def salvar_calculo_mensal(self, dados, funcionario_id=None):
+        funcionario_id = self._funcionario(funcionario_id)
+        chave = (funcionario_id, dados['ano'], dados['mes'])
+        with self._lock:
+            anterior = self._calculos.get(chave)
+            self._calculos[chave] = CalculoMensal(
+                anterior.id if anterior else next(self._ids), dados['mes'], dados['ano'],
+                *(dados[campo] for campo in CalculoMensal._fields[3:16]),
+                anterior.created_at if anterior else datetime.now(), funcionario_id
+            )
+        return True
+
+    def obter_calculo_mensal(self, mes, ano, funcionario_id=None):
+        return self._calculos.get((self._funcionario(funcionario_id), ano, mes))
+
+    def obter_calculos_periodo(self, ano_inicio, mes_inicio, ano_fim, mes_fim, funcionario_id=None):
+        funcionario_id = self._funcionario(funcionario_id)
+        with self._lock:
+            return [
+                calculo for chave, calculo in sorted(self._calculos.items())
+                if chave[0] == funcionario_id and (ano_inicio, mes_inicio) <= chave[1:] <= (ano_fim, mes_fim)
+            ]
+
+    # Falhas, configurações e funcionários
+
+    def registrar_falha(self, tipo, erro, detalhes=None):
+        agora = datetime.now()
+        with self._lock:
+            # datetime.now() pode voltar (ajuste de relógio): insere na posição, não no fim
+            posicao = bisect_right(self._instantes_falhas, agora)
+            self._instantes_falhas.insert(posicao, agora)
+            self._falhas.insert(posicao, FalhaRegistro(next(self._ids), agora, tipo, erro, detalhes, agora))
+        self.logger.error(f"Falha registrada: {tipo} - {erro}")
+
+    def obter_falhas_periodo(self, data_inicio, data_fim):
+        inicio, fim = self._limites(data_inicio, data_fim)
+        with self._lock:
+            instantes = self._instantes_falhas
+            return self._falhas[bisect_left(instantes, inicio):bisect_right(instantes, fim)]
+
+    def iter_falhas_periodo(self, data_inicio, data_fim, batch=500):
+        yield from self.obter_falhas_periodo(data_inicio, data_fim)
+
+    def registrar_configuracao(self, chave, valor, funcionario_id=None):
+        with self._lock:
+            if funcionario_id is not None:
+                tabela, configuracoes, indice = 'configuracoes_funcionario', self._configuracoes_funcionario, (funcionario_id, chave)
+            else:
+                tabela, configuracoes, indice = 'configuracoes', self._configuracoes, chave
+            operacao = 'UPDATE' if indice in configuracoes else 'INSERT'
+            configuracoes[indice] = valor
+            self._eventos.append(Evento(tabela, operacao, funcionario_id, chave))
+            self._novo_evento.notify_all()
+        return True
+
+    def obter_configuracao(self, chave, funcionario_id=None):
+        if funcionario_id is not None:
+            valor = self._configuracoes_funcionario.get((funcionario_id, chave))
+            if valor is not None:
+                return valor
+        return self._configuracoes.get(chave)
+
+    def obter_configuracoes(self):
+        return dict(self._configuracoes)
+
+    def registrar_funcionario(self, funcionario_id, nome, ativo=True):
+        with self._lock:
+            self._funcionarios[funcionario_id] = (nome, bool(ativo))
+        return True
+
+    def obter_funcionarios(self, somente_ativos=True):
+        return [
+            (funcionario_id, nome, ativo)
+            for funcionario_id, (nome, ativo) in sorted(self._funcionarios.items())
+            if ativo or not somente_ativos
+        ]
+
+    # Eventos e ciclo de vida
+
+    def escutar_eventos(self, tabelas=None, timeout=None):
+        """
+        Como Database.escutar_eventos, mas só para configurações gravadas neste objeto:
+        Evento(None, 'CONECTADO') e depois cada registrar_configuracao, até `timeout`
+        segundos ou fechar().
+        """
+        prazo = None if timeout is None else monotonic() + timeout
+        with self._lock:
+            proximo = len(self._eventos)
+        yield Evento(None, 'CONECTADO')
+        while not self._encerrando.is_set():
+            with self._lock:
+                while proximo == len(self._eventos) and not self._encerrando.is_set():
+                    espera = None if prazo is None else prazo - monotonic()
+                    if espera is not None and espera <= 0:
+                        return
+                    self._novo_evento.wait(espera)
+                novos, proximo = self._eventos[proximo:], len(self._eventos)
+            for evento in novos:
+                if tabelas is None or evento.tabela in tabelas:
+                    yield evento
+
+    def fechar(self):
+        """Encerra as escutas de eventos abertas"""
+        with self._lock:
+            self._encerrando.set()
+            self._novo_evento.notify_all()
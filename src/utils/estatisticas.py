@@ -0,0 +1,142 @@
+# src/utils/estatisticas.py
+"""
+Estatísticas de consultas SQL: latência por consulta normalizada (histograma),
+linhas afetadas/retornadas e tempo de obtenção de conexões.
+"""
+
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+# Limites superiores dos baldes do histograma, em milissegundos
+BALDES_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_ESPACOS = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=512)
+def normalizar_consulta(query, limite=160):
+    """Remove literais e espaços para agrupar execuções da mesma consulta"""
+    texto = query.replace('%s', '?')
+    texto = _RE_STRING.sub('?', texto)
+    texto = _RE_NUMERO.sub('?', texto)
+    texto = _RE_ESPACOS.sub(' ', texto).strip()
+    return texto[:limite]
+
+
+class _Serie:
+    __slots__ = ('chamadas', 'total_ms', 'max_ms', 'linhas', 'lentas', 'baldes')
+
+    def __init__(self):
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.linhas = 0
+        self.lentas = 0
+        self.baldes = [0] * len(BALDES_MS)
+
+    def adicionar(self, duracao_ms, linhas=None, lenta=False):
+        self.chamadas += 1
+        self.total_ms += duracao_ms
+        self.max_ms = max(self.max_ms, duracao_ms)
+        if linhas is not None and linhas >= 0:
+            self.linhas += linhas
+        if lenta:
+            self.lentas += 1
+        for i, limite in enumerate(BALDES_MS):
+            if duracao_ms <= limite:
+                self.baldes[i] += 1
+                break
+
+    def percentil(self, fracao):
+        """Estimativa pelo limite superior do balde (o último usa o máximo observado)"""
+        alvo = self.chamadas * fracao
+        acumulado = 0
+        for limite, quantidade in zip(BALDES_MS, self.baldes):
+            acumulado += quantidade
+            if acumulado >= alvo and quantidade:
+                return round(min(limite, self.max_ms), 2)
+        return round(self.max_ms, 2)
+
+    def resumo(self):
+        return {
+            'chamadas': self.chamadas,
+            'total_ms': round(self.total_ms, 2),
+            'media_ms': round(self.total_ms / self.chamadas, 2) if self.chamadas else 0,
+            'p50_ms': self.percentil(0.5),
+            'p95_ms': self.percentil(0.95),
+            'max_ms': round(self.max_ms, 2),
+            'linhas': self.linhas,
+            'lentas': self.lentas,
+            'histograma': {
+                ('+inf' if limite == float('inf') else f'<={limite}ms'): quantidade
+                for limite, quantidade in zip(BALDES_MS, self.baldes)
+                if quantidade
+            }
+        }
+
+
+class EstatisticasConsultas:
+    """Acumulador thread-safe usado por Database._execute e _get_connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._consultas = {}
+            self._conexoes = _Serie()
+            self._desde = datetime.now()
+
+    def registrar_consulta(self, consulta, duracao_ms, linhas=None, lenta=False):
+        with self._lock:
+            serie = self._consultas.get(consulta)
+            if serie is None:
+                serie = self._consultas[consulta] = _Serie()
+            serie.adicionar(duracao_ms, linhas, lenta)
+
+    def registrar_conexao(self, duracao_ms):
+        with self._lock:
+            self._conexoes.adicionar(duracao_ms)
+
+    def snapshot(self, limite=None):
+        """Consultas ordenadas pelo tempo total gasto (as que mais pesam primeiro)"""
+        with self._lock:
+            series = list(self._consultas.values())
+            consultas = sorted(
+                ((consulta, serie.resumo()) for consulta, serie in self._consultas.items()),
+                key=lambda item: item[1]['total_ms'],
+                reverse=True
+            )
+            resumo = {
+                'desde': self._desde.isoformat(timespec='seconds'),
+                'total_consultas': sum(serie.chamadas for serie in series),
+                'total_ms': round(sum(serie.total_ms for serie in series), 2),
+                'lentas': sum(serie.lentas for serie in series),
+                'conexoes': self._conexoes.resumo(),
+            }
+
+        if limite:
+            consultas = consultas[:limite]
+        resumo['consultas'] = [dict(consulta=consulta, **dados) for consulta, dados in consultas]
+        return resumo
+
+
+def formatar_estatisticas(snapshot, limite=3):
+    """Texto curto para /status e para o log de encerramento"""
+    linhas = [
+        f"Consultas: {snapshot['total_consultas']} em {snapshot['total_ms'] / 1000:.2f}s"
+        f" ({snapshot['lentas']} lentas)",
+        f"Conexões: {snapshot['conexoes']['chamadas']}"
+        f" (média {snapshot['conexoes']['media_ms']:.1f}ms)"
+    ]
+    for item in snapshot['consultas'][:limite]:
+        linhas.append(
+            f"{item['total_ms']:.0f}ms · {item['chamadas']}x · p95 {item['p95_ms']:.0f}ms · "
+            f"{item['consulta'][:60]}"
+        )
+    return linhas
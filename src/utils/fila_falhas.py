@@ -0,0 +1,255 @@
+# src/utils/fila_falhas.py
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class FilaFalhas:
+    """
+    Buffer write-behind para Database.registrar_falha.
+
+    Cada falha é acrescentada a um spool local (uma linha JSON por falha) e a uma
+    fila em memória limitada. Uma thread grava a fila no banco em lotes e, com o
+    banco lento ou fora do ar, tenta de novo com backoff exponencial. O spool só
+    cresce: cada lote gravado avança o deslocamento confirmado (em bytes), guardado
+    em `<spool>.confirmado`, e o arquivo é truncado quando esvazia ou compactado
+    quando a parte já confirmada passa de `compactar_bytes` e da metade do arquivo.
+    Ao iniciar, a fila adota os spools deixados no diretório por processos
+    encerrados, a partir do deslocamento confirmado de cada um, então nenhuma falha
+    se perde entre reinícios (no pior caso, um lote é gravado duas vezes).
+
+    Falhas que não cabem na fila ficam só no spool e são relidas quando ela esvazia.
+    """
+
+    def __init__(self, gravar_lote, diretorio, capacidade=1000, lote=200, intervalo=1.0, backoff_max=60.0,
+                 compactar_bytes=1024 * 1024):
+        self._gravar_lote = gravar_lote
+        self.diretorio = diretorio
+        self.capacidade = capacidade
+        self.lote = lote
+        self.intervalo = intervalo
+        self.backoff_max = backoff_max
+        self.compactar_bytes = compactar_bytes
+        self.logger = logging.getLogger('FilaFalhas')
+
+        self._fila = deque()  # (falha, deslocamento do fim da linha no spool)
+        self._excedentes = 0  # linhas do spool (após as da fila) que não couberam na memória
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._encerrar = threading.Event()
+        self._thread = None
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._caminho = os.path.join(diretorio, f'falhas-{os.getpid()}.jsonl')
+        self._spool = self._abrir_spool()
+        # Bytes do spool: [0, confirmado) já gravados no banco, [confirmado, lido) na fila,
+        # [lido, tamanho) excedentes ainda não carregados
+        self._tamanho = self._spool.seek(0, os.SEEK_END)
+        self._confirmado = self._ler_confirmado(self._caminho)
+        if self._confirmado > self._tamanho:
+            self._confirmado = 0
+        self._lido = self._confirmado
+        self._excedentes = len(self._linhas_pendentes(self._spool, self._confirmado))
+        self._adotar_spools_orfaos()
+
+    def _abrir_spool(self):
+        spool = open(self._caminho, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return spool
+
+    @staticmethod
+    def _ler_confirmado(caminho):
+        try:
+            with open(caminho + '.confirmado', 'r', encoding='utf-8') as arquivo:
+                return int(arquivo.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _gravar_confirmado(self, deslocamento):
+        with open(self._caminho + '.confirmado', 'w', encoding='utf-8') as arquivo:
+            arquivo.write(str(deslocamento))
+
+    @staticmethod
+    def _linhas_pendentes(arquivo, confirmado):
+        """Linhas não vazias após o deslocamento confirmado (um spool menor que ele recomeça do zero)"""
+        arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(confirmado if confirmado <= arquivo.tell() else 0)
+        return [linha for linha in arquivo if linha.strip()]
+
+    def _adotar_spools_orfaos(self):
+        """Move para o próprio spool as falhas pendentes de processos que já terminaram"""
+        for nome in sorted(os.listdir(self.diretorio)):
+            caminho = os.path.join(self.diretorio, nome)
+            if caminho == self._caminho or not (nome.startswith('falhas-') and nome.endswith('.jsonl')):
+                continue
+            try:
+                with open(caminho, 'rb') as orfao:
+                    if fcntl is not None:
+                        # Spool de processo ainda em execução: o dono mantém o lock
+                        fcntl.flock(orfao, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    linhas = self._linhas_pendentes(orfao, self._ler_confirmado(caminho))
+                confirmado = caminho + '.confirmado'
+                if fcntl is None:
+                    # Sem flock (Windows), a remoção falha enquanto o dono mantiver o arquivo aberto
+                    os.replace(caminho, caminho + '.adotado')
+                    caminho += '.adotado'
+                with self._lock:
+                    self._spool.writelines(linhas)
+                    self._spool.flush()
+                    self._tamanho += sum(len(linha) for linha in linhas)
+                    self._excedentes += len(linhas)
+                os.remove(caminho)
+                if os.path.exists(confirmado):
+                    os.remove(confirmado)
+                if linhas:
+                    self.logger.info(f"{len(linhas)} falhas pendentes recuperadas de {nome}")
+            except OSError:
+                continue
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='fila-falhas', daemon=True)
+            self._thread.start()
+        if self._excedentes:
+            self._acordar.set()
+
+    def registrar(self, data_hora, tipo, erro, detalhes=None):
+        """Acrescenta a falha ao spool e à fila; não acessa o banco"""
+        linha = (json.dumps([data_hora.isoformat(), tipo, erro, detalhes], ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            self._spool.write(linha)
+            self._spool.flush()
+            self._tamanho += len(linha)
+            if self._excedentes or len(self._fila) >= self.capacidade:
+                self._excedentes += 1
+            else:
+                self._fila.append(((data_hora, tipo, erro, detalhes), self._tamanho))
+                self._lido = self._tamanho
+            cheio = len(self._fila) >= self.lote
+        if cheio:
+            self._acordar.set()
+
+    @property
+    def pendentes(self):
+        with self._lock:
+            return len(self._fila) + self._excedentes
+
+    def _proximo_lote(self):
+        with self._lock:
+            if not self._fila and self._excedentes:
+                self._recarregar_excedentes()
+            return [self._fila[i][0] for i in range(min(self.lote, len(self._fila)))]
+
+    def _recarregar_excedentes(self):
+        """Com a fila vazia, as falhas excedentes começam no deslocamento já lido"""
+        self._spool.seek(self._lido)
+        for linha in self._spool:
+            if len(self._fila) >= self.capacidade:
+                break
+            self._lido += len(linha)
+            if not linha.strip():
+                continue
+            data_hora, tipo, erro, detalhes = json.loads(linha)
+            self._fila.append(((datetime.fromisoformat(data_hora), tipo, erro, detalhes), self._lido))
+            self._excedentes -= 1
+
+    def _confirmar(self, quantidade):
+        """Avança o deslocamento confirmado do spool sobre as `quantidade` falhas já gravadas"""
+        with self._lock:
+            for _ in range(quantidade):
+                _, self._confirmado = self._fila.popleft()
+            if not self._fila and not self._excedentes:
+                # Tudo gravado: o deslocamento some antes do truncamento, então uma queda
+                # entre os dois no máximo regrava falhas, nunca as perde
+                try:
+                    os.remove(self._caminho + '.confirmado')
+                except OSError:
+                    pass
+                self._spool.truncate(0)
+                self._confirmado = self._lido = self._tamanho = 0
+            elif self._confirmado >= self.compactar_bytes and self._confirmado * 2 >= self._tamanho:
+                self._compactar()
+            else:
+                self._gravar_confirmado(self._confirmado)
+
+    def _compactar(self):
+        """Reescreve o spool sem a parte confirmada; só roda depois que ela dobrou de tamanho"""
+        self._spool.seek(self._confirmado)
+        temporario = self._caminho + '.tmp'
+        with open(temporario, 'wb') as novo:
+            shutil.copyfileobj(self._spool, novo)
+        self._gravar_confirmado(0)
+        self._spool.close()
+        os.replace(temporario, self._caminho)
+        self._spool = self._abrir_spool()
+        deslocamento = self._confirmado
+        self._fila = deque((falha, fim - deslocamento) for falha, fim in self._fila)
+        self._lido -= deslocamento
+        self._tamanho -= deslocamento
+        self._confirmado = 0
+
+    def _executar(self):
+        espera = self.intervalo
+        while not self._encerrar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            if self._gravar_pendentes():
+                espera = self.intervalo
+                continue
+            # Backoff: novas falhas não antecipam a próxima tentativa, só o encerramento
+            espera = min(espera * 2, self.backoff_max)
+            self.logger.warning(f"{self.pendentes} falhas pendentes; nova tentativa em {espera:.0f}s")
+            self._encerrar.wait(espera)
+        self._gravar_pendentes()
+
+    def _gravar_pendentes(self):
+        """Grava lotes até esvaziar; retorna False se o banco recusou algum"""
+        lote = self._proximo_lote()
+        while lote:
+            try:
+                self._gravar_lote(lote)
+            except Exception as e:
+                self.logger.warning(f"Banco indisponível para gravar {len(lote)} falhas: {e}")
+                return False
+            self._confirmar(len(lote))
+            lote = self._proximo_lote()
+        return True
+
+    def descarregar(self, timeout=5.0):
+        """Pede a gravação imediata e espera a fila esvaziar; retorna True se esvaziou"""
+        prazo = time.monotonic() + timeout
+        while self.pendentes and time.monotonic() < prazo:
+            self._acordar.set()
+            time.sleep(0.05)
+        return not self.pendentes
+
+    def fechar(self, timeout=5.0):
+        """Tenta uma última gravação; o que sobrar continua no spool para o próximo início"""
+        if self._thread is not None:
+            self._encerrar.set()
+            self._acordar.set()
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Ainda gravando (banco lento): o spool fica aberto até o processo terminar
+                return
+            self._thread = None
+        with self._lock:
+            vazio = not self._fila and not self._excedentes
+            self._spool.close()
+            if vazio:
+                for caminho in (self._caminho, self._caminho + '.confirmado'):
+                    try:
+                        os.remove(caminho)
+                    except OSError:
+                        pass
@@ -0,0 +1,87 @@
+# src/utils/importacao.py
+"""
+Leitura em streaming de registros de ponto exportados pelo sistema web (CSV ou JSON).
+Cada leitor gera tuplas (data_hora, tipo, status, motivo) prontas para
+Database.registrar_pontos_em_lote.
+"""
+
+import csv
+import json
+from datetime import datetime
+
+FORMATOS_DATA_HORA = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+)
+
+STATUS_PADRAO = 'IMPORTADO'
+
+
+def parse_data_hora(valor):
+    """Converte os formatos de data/hora aceitos para datetime"""
+    if isinstance(valor, datetime):
+        return valor
+    texto = str(valor).strip().split('.')[0]
+    for formato in FORMATOS_DATA_HORA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    raise ValueError(f"Data/hora inválida: {valor}")
+
+
+def normalizar_linha(linha):
+    """
+    Converte uma linha exportada (dict) em (data_hora, tipo, status, motivo).
+    Aceita 'data_hora' ou o par 'data' + 'hora'.
+    """
+    if linha.get('data_hora'):
+        data_hora = parse_data_hora(linha['data_hora'])
+    else:
+        data_hora = parse_data_hora(f"{linha['data']} {linha['hora']}")
+
+    tipo = str(linha['tipo']).strip().lower()
+    status = (linha.get('status') or STATUS_PADRAO).strip()
+    motivo = linha.get('motivo') or None
+    return data_hora, tipo, status, motivo
+
+
+def ler_registros_csv(caminho, delimitador=None):
+    """Lê um CSV com cabeçalho linha a linha; detecta ',' ou ';' se não informado"""
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        if delimitador is None:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            delimitador = ';' if amostra.count(';') > amostra.count(',') else ','
+        for linha in csv.DictReader(arquivo, delimiter=delimitador):
+            yield normalizar_linha(linha)
+
+
+def ler_registros_json(caminho):
+    """Lê um array JSON de objetos ou um arquivo JSON Lines (um objeto por linha)"""
+    with open(caminho, encoding='utf-8') as arquivo:
+        inicio = arquivo.read(1)
+        while inicio and inicio.isspace():
+            inicio = arquivo.read(1)
+        arquivo.seek(0)
+
+        if inicio == '[':
+            for linha in json.load(arquivo):
+                yield normalizar_linha(linha)
+        else:
+            for texto in arquivo:
+                if texto.strip():
+                    yield normalizar_linha(json.loads(texto))
+
+
+def ler_registros(caminho, formato=None):
+    """Escolhe o leitor pelo formato informado ou pela extensão do arquivo"""
+    formato = (formato or caminho.rsplit('.', 1)[-1]).lower()
+    if formato == 'csv':
+        return ler_registros_csv(caminho)
+    if formato in ('json', 'jsonl'):
+        return ler_registros_json(caminho)
+    raise ValueError(f"Formato inválido: {formato}")
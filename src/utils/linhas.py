@@ -0,0 +1,179 @@
+# src/utils/linhas.py
+"""
+Linhas tipadas devolvidas pela camada de banco de dados.
+
+São NamedTuples (sem __dict__ por instância) com campos datetime/date já
+convertidos, decodificados uma única vez na leitura. O SQLite devolve
+texto e o Postgres objetos nativos; os consumidores recebem sempre o mesmo tipo.
+Continuam sendo tuplas, então o acesso por índice (reg[1]) segue funcionando.
+"""
+
+import json
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+
+def para_datetime(valor):
+    """Converte 'YYYY-MM-DD HH:MM:SS[.ffffff]' (SQLite) em datetime; datetime passa direto"""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+
+def para_data(valor):
+    """Converte 'YYYY-MM-DD' (SQLite) em date; date/datetime passam direto"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+class Registro(NamedTuple):
+    id: int
+    data_hora: datetime
+    tipo: str
+    status: str
+    motivo: Optional[str] = None
+    created_at: Optional[datetime] = None
+    funcionario_id: int = 1
+
+    @classmethod
+    def de_linha(cls, linha):
+        return cls(
+            linha[0], para_datetime(linha[1]), linha[2], linha[3], linha[4],
+            para_datetime(linha[5]) if len(linha) > 5 else None,
+            linha[6] if len(linha) > 6 else 1
+        )
+
+
+class HorasTrabalhadas(NamedTuple):
+    id: int
+    data: date
+    entrada: Optional[datetime]
+    saida: Optional[datetime]
+    horas_normais: float
+    horas_extras_60: float
+    horas_extras_65: float
+    horas_extras_75: float
+    horas_extras_100: float
+    horas_extras_150: float
+    horas_noturnas: float
+    status: str
+    observacao: Optional[str]
+    created_at: Optional[datetime]
+    funcionario_id: int = 1
+
+    @classmethod
+    def de_linha(cls, linha):
+        return cls(
+            linha[0], para_data(linha[1]), para_datetime(linha[2]), para_datetime(linha[3]),
+            *(valor or 0 for valor in linha[4:11]),
+            linha[11], linha[12], para_datetime(linha[13]),
+            linha[14] if len(linha) > 14 else 1
+        )
+
+    @property
+    def horas_extras(self):
+        return (self.horas_extras_60 + self.horas_extras_65 + self.horas_extras_75 +
+                self.horas_extras_100 + self.horas_extras_150)
+
+
+class FalhaRegistro(NamedTuple):
+    id: int
+    data_hora: datetime
+    tipo: str
+    erro: str
+    detalhes: Optional[str]
+    created_at: Optional[datetime]
+
+    @classmethod
+    def de_linha(cls, linha):
+        return cls(
+            linha[0], para_datetime(linha[1]), linha[2], linha[3], linha[4],
+            para_datetime(linha[5])
+        )
+
+
+class CalculoMensal(NamedTuple):
+    id: int
+    mes: int
+    ano: int
+    salario_base: float
+    periculosidade: float
+    adicional_noturno: float
+    horas_extras: float
+    dsr: float
+    total_proventos: float
+    inss: float
+    irrf: float
+    outros_descontos: float
+    total_descontos: float
+    liquido: float
+    base_fgts: float
+    fgts: float
+    created_at: Optional[datetime]
+    funcionario_id: int = 1
+
+    @classmethod
+    def de_linha(cls, linha):
+        return cls(*linha[:16], para_datetime(linha[16]), linha[17] if len(linha) > 17 else 1)
+
+
+class JornadaDia(NamedTuple):
+    """Pares entrada→saída de um dia, agregados no banco (ver Database.obter_jornadas_periodo)"""
+    data: date
+    batidas: int
+    pares: int
+    primeira_entrada: Optional[datetime]
+    ultima_saida: Optional[datetime]
+    minutos_trabalhados: float
+    minutos_pausa: float
+    intervalos: str
+
+    @classmethod
+    def de_linha(cls, linha):
+        # A ordem do group_concat não é garantida no SQLite; 'HH:MM:SS-HH:MM:SS' ordena como texto
+        intervalos = ','.join(sorted(linha[7].split(','))) if linha[7] else ''
+        return cls(
+            para_data(linha[0]), linha[1], linha[2] or 0,
+            para_datetime(linha[3]), para_datetime(linha[4]),
+            linha[5] or 0, linha[6] or 0, intervalos
+        )
+
+    @property
+    def completo(self):
+        """Todas as batidas do dia formam pares"""
+        return self.batidas == 2 * self.pares
+
+
+class Evento(NamedTuple):
+    """
+    Alteração em registros ou configurações (ver Database.escutar_eventos).
+    Evento(None, 'CONECTADO') marca o início ou uma reconexão da escuta.
+    """
+    tabela: Optional[str]
+    operacao: str  # INSERT, UPDATE, DELETE ou CONECTADO
+    funcionario_id: Optional[int] = None
+    chave: Optional[str] = None
+    id: Optional[int] = None
+    data_hora: Optional[datetime] = None
+    tipo: Optional[str] = None
+    status: Optional[str] = None
+
+    @classmethod
+    def de_payload(cls, payload):
+        """Decodifica o JSON publicado pelo trigger notificar_evento"""
+        dados = json.loads(payload)
+        return cls(
+            dados['tabela'], dados['operacao'], dados.get('funcionario_id'), dados.get('chave'),
+            dados.get('id'), para_datetime(dados.get('data_hora')), dados.get('tipo'), dados.get('status')
+        )
+
+
+COLUNAS_REGISTRO = ', '.join(Registro._fields)
+COLUNAS_HORAS = ', '.join(HorasTrabalhadas._fields)
+COLUNAS_FALHA = ', '.join(FalhaRegistro._fields)
+COLUNAS_CALCULO = ', '.join(CalculoMensal._fields)
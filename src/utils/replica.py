@@ -0,0 +1,119 @@
+# src/utils/replica.py
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from src.utils.consultas import COLUNAS_RESUMO
+from src.utils.linhas import COLUNAS_REGISTRO, COLUNAS_FALHA, para_datetime
+
+# (tabela, colunas, coluna da marca d'água, folga relida a cada sincronização)
+# A folga cobre transações que gravaram um id/timestamp menor mas fizeram commit depois.
+TABELAS_REPLICADAS = (
+    ('configuracoes', 'id, chave, valor, updated_at', 'updated_at', timedelta(minutes=5)),
+    ('configuracoes_funcionario', 'funcionario_id, chave, valor, updated_at', 'updated_at', timedelta(minutes=5)),
+    ('registros', COLUNAS_REGISTRO, 'id', 20),
+    ('resumo_diario', f'{COLUNAS_RESUMO}, funcionario_id, atualizado_em', 'atualizado_em', timedelta(minutes=5)),
+    ('falhas_registro', COLUNAS_FALHA, 'id', 20),
+)
+
+
+class ReplicaLocal:
+    """
+    Réplica SQLite somente leitura de um Database Postgres.
+
+    As tabelas de TABELAS_REPLICADAS são copiadas de forma incremental (linhas com
+    marca d'água acima da maior já copiada, menos a folga) e as leituras são servidas
+    pelo SQLite enquanto a última sincronização completa tiver menos de `max_atraso`
+    segundos. O horário da sincronização fica salvo no próprio arquivo, então um
+    processo que acabou de iniciar não precisa ir ao Postgres para ler.
+    """
+
+    def __init__(self, remoto, local, max_atraso=60, lote=1000):
+        self.remoto = remoto
+        self.local = local
+        self.max_atraso = max_atraso
+        self.lote = lote
+        self.logger = logging.getLogger('ReplicaLocal')
+        self._lock = threading.Lock()
+        self._tabelas = {tabela: (colunas, marca, folga) for tabela, colunas, marca, folga in TABELAS_REPLICADAS}
+
+        with self.local._get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS replica_estado (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    sincronizado_em REAL NOT NULL
+                )
+            ''')
+            linha = conn.execute('SELECT sincronizado_em FROM replica_estado WHERE id = 1').fetchone()
+            conn.commit()
+        self._sincronizado_em = linha[0] if linha else 0
+
+    @property
+    def atraso(self):
+        """Segundos desde a última sincronização completa"""
+        return time.time() - self._sincronizado_em
+
+    def pronta(self):
+        """Database local para leitura, sincronizando antes se passou do atraso máximo; None se não der"""
+        if self.atraso <= self.max_atraso:
+            return self.local
+        if self.sincronizar():
+            return self.local
+        return None
+
+    def invalidar(self):
+        """Força uma sincronização na próxima leitura"""
+        self._sincronizado_em = 0
+
+    def sincronizar(self, tabelas=None):
+        """
+        Copia do Postgres as linhas novas ou alteradas de `tabelas` (padrão: todas).
+        Retorna True se conseguiu; em caso de erro a réplica fica marcada como desatualizada.
+        """
+        completa = tabelas is None
+        with self._lock:
+            if completa and self.atraso <= self.max_atraso:
+                return True  # outra thread acabou de sincronizar
+            inicio = time.time()
+            try:
+                copiadas = 0
+                for tabela in (tabelas or self._tabelas):
+                    copiadas += self._sincronizar_tabela(tabela)
+                if completa:
+                    self._sincronizado_em = inicio
+                    with self.local._get_connection() as conn:
+                        conn.execute('INSERT OR REPLACE INTO replica_estado (id, sincronizado_em) VALUES (1, ?)',
+                                     (inicio,))
+                        conn.commit()
+                self.logger.debug(f"Réplica local sincronizada: {copiadas} linhas")
+                return True
+            except Exception as e:
+                self.logger.warning(f"Erro ao sincronizar réplica local: {e}")
+                self._sincronizado_em = 0
+                return False
+
+    def _sincronizar_tabela(self, tabela):
+        colunas, marca, folga = self._tabelas[tabela]
+        with self.local._get_connection() as conn:
+            maior = conn.execute(f'SELECT MAX({marca}) FROM {tabela}').fetchone()[0]
+        if maior is None:
+            filtro, params = '', None
+        elif isinstance(folga, timedelta):
+            filtro, params = f'WHERE {marca} > ?', (para_datetime(maior) - folga,)
+        else:
+            filtro, params = f'WHERE {marca} > ?', (maior - folga,)
+
+        marcadores = ', '.join('?' for _ in colunas.split(','))
+        copiadas = 0
+        with self.remoto._get_connection() as remoto, self.local._get_connection() as local:
+            cursor = remoto.cursor()
+            self.remoto._execute(cursor, f'SELECT {colunas} FROM {tabela} {filtro} ORDER BY {marca}', params)
+            while True:
+                linhas = cursor.fetchmany(self.lote)
+                if not linhas:
+                    break
+                local.executemany(f'INSERT OR REPLACE INTO {tabela} ({colunas}) VALUES ({marcadores})', linhas)
+                copiadas += len(linhas)
+            local.commit()
+        return copiadas
@@ -121,7 +121,15 @@ class WebController:
             time.sleep(1)
             
             agora = datetime.now()
-            self.db.registrar_ponto(agora, "AUTOMATICO", "SUCESSO")
+            # O ponto já foi batido no sistema: uma falha do banco é registrada, mas não muda o resultado
+            try:
+                with self.db.transacao():
+                    if not self.db.registrar_ponto(agora, "AUTOMATICO", "SUCESSO"):
+                        raise Exception("Ponto registrado no sistema, mas não gravado no banco")
+                    self.db.recalcular_horas_periodo(agora, agora)
+            except Exception as e:
+                log_exception(self.logger, e, "Erro ao gravar ponto no banco:")
+                self.db.registrar_falha("registro_ponto_banco", str(e))
             
             self.logger.info(f"Ponto registrado com sucesso às {agora.strftime('%H:%M:%S')}")
             return True
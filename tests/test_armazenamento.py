@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Os backends de Armazenamento aplicam as mesmas regras: as mesmas batidas gravadas no
+SQLite (Database) e em memória (DatabaseMemoria) dão o mesmo resumo do dia, a mesma
+distribuição de horas e o mesmo banco de horas.
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.armazenamento import Armazenamento, abrir_armazenamento
+from src.utils.database_memoria import DatabaseMemoria
+
+INICIO = date(2026, 9, 1)
+FIM = date(2026, 9, 30)
+
+
+def gerar_mes():
+    """Dias úteis de setembro com almoço variável, mais um dia com hora extra e um noturno"""
+    batidas = []
+    dia = datetime(2026, 9, 1)
+    while dia.month == 9:
+        if dia.weekday() < 5:
+            retorno = 13 * 60 + (dia.day * 7) % 31
+            for minutos, tipo in ((7 * 60 + 30, 'entrada'), (12 * 60, 'saida'),
+                                  (retorno, 'entrada'), (17 * 60 + 18, 'saida')):
+                batidas.append((dia + timedelta(minutes=minutos), tipo, 'IMPORTADO', None))
+        dia += timedelta(days=1)
+    batidas.append((datetime(2026, 9, 15, 18, 0), 'entrada', 'IMPORTADO', None))
+    batidas.append((datetime(2026, 9, 15, 23, 30), 'saida', 'IMPORTADO', None))
+    batidas.append((datetime(2026, 9, 30, 19, 0), 'entrada', 'IMPORTADO', None))
+    return batidas
+
+
+class TestParidadeBackends(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.sql = abrir_armazenamento('sql', db_file=os.path.join(self._tmp.name, 'paridade.db'))
+        self.memoria = abrir_armazenamento('memoria')
+        for db in (self.sql, self.memoria):
+            db.registrar_pontos_em_lote(gerar_mes())
+
+    def tearDown(self):
+        self.sql.fechar()
+        self.memoria.fechar()
+        self._tmp.cleanup()
+
+    def assertMesmoResultado(self, consulta):
+        self.assertEqual(consulta(self.sql), consulta(self.memoria))
+
+    def test_resumo_do_dia(self):
+        self.assertMesmoResultado(lambda db: db.obter_resumo_dia(date(2026, 9, 3)))
+        self.assertMesmoResultado(lambda db: db.obter_resumo_dia(date(2026, 9, 15)))
+        self.assertMesmoResultado(lambda db: db.obter_resumos_periodo(INICIO, FIM))
+        self.assertMesmoResultado(lambda db: db.calcular_total_horas_dia(date(2026, 9, 15)))
+        self.assertMesmoResultado(lambda db: db.obter_jornadas_periodo(INICIO, FIM))
+
+    def test_distribuicao_de_horas(self):
+        for db in (self.sql, self.memoria):
+            db.recalcular_horas_periodo(INICIO, FIM)
+        self.assertMesmoResultado(
+            lambda db: [(horas.data, *horas[4:12]) for horas in db.obter_horas_trabalhadas_periodo(INICIO, FIM)]
+        )
+
+    def test_recalculo_marca_horas_atualizadas(self):
+        for db in (self.sql, self.memoria):
+            db.recalcular_horas_periodo(INICIO, FIM)
+            db.registrar_ponto(datetime(2026, 9, 3, 18, 0), 'entrada', 'SUCESSO')
+            db.registrar_ponto(datetime(2026, 9, 3, 20, 0), 'saida', 'SUCESSO')
+            db.recalcular_horas_periodo(date(2026, 9, 3), date(2026, 9, 3))
+        self.assertMesmoResultado(
+            lambda db: [(horas.data, horas.status, horas.observacao)
+                        for horas in db.obter_horas_trabalhadas_periodo(date(2026, 9, 2), date(2026, 9, 3))]
+        )
+        horas = self.memoria.obter_horas_trabalhadas_periodo(date(2026, 9, 3), date(2026, 9, 3))
+        self.assertEqual(horas[0].status, 'ATUALIZADO')
+
+    def test_chave_do_cliente_e_chave_padrao(self):
+        agora = datetime(2026, 10, 1, 7, 30, 5)
+        for db in (self.sql, self.memoria):
+            self.assertTrue(db.registrar_ponto(agora, 'entrada', 'SUCESSO', chave='telegram:1'))
+            # Mesmo minuto e tipo com outra chave do cliente, ou sem chave: já reservado
+            self.assertTrue(db.registrar_ponto(agora, 'entrada', 'SUCESSO', chave='telegram:2'))
+            self.assertTrue(db.registrar_ponto(agora, 'entrada', 'SUCESSO'))
+            # A chave telegram:2 não ficou reservada pela tentativa recusada
+            self.assertTrue(db.registrar_ponto(agora.replace(minute=31), 'entrada', 'SUCESSO', chave='telegram:2'))
+            self.assertTrue(db.registrar_ponto(agora.replace(minute=32), 'entrada', 'SUCESSO', chave='telegram:1'))
+        self.assertMesmoResultado(
+            lambda db: [(registro.data_hora, registro.tipo) for registro in db.obter_registros_dia(agora)]
+        )
+        self.assertEqual(len(self.memoria.obter_registros_dia(agora)), 2)
+
+    def test_banco_de_horas(self):
+        for db in (self.sql, self.memoria):
+            db.recalcular_horas_periodo(INICIO, FIM)
+        for data in (date(2026, 9, 10), date(2026, 9, 16), FIM):
+            self.assertMesmoResultado(
+                lambda db: {chave: round(valor, 6) for chave, valor in db.obter_saldo_banco_horas(data).items()}
+            )
+
+
+class TestHorasNoturnas(unittest.TestCase):
+    """Resumo diário e horas trabalhadas contam as horas noturnas pela mesma regra"""
+
+    TURNOS = {
+        date(2026, 9, 15): [(datetime(2026, 9, 15, 18, 0), 'entrada'), (datetime(2026, 9, 15, 23, 30), 'saida')],
+        date(2026, 9, 16): [(datetime(2026, 9, 16, 3, 0), 'entrada'), (datetime(2026, 9, 16, 7, 0), 'saida')],
+    }
+    NOTURNAS = {date(2026, 9, 15): 1.5, date(2026, 9, 16): 2.0}
+
+    def test_turno_que_cruza_22h_e_5h(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for db in (abrir_armazenamento('sql', db_file=os.path.join(tmp, 'noturnas.db')),
+                       abrir_armazenamento('memoria')):
+                for batidas in self.TURNOS.values():
+                    db.registrar_pontos_em_lote([(data_hora, tipo, 'IMPORTADO') for data_hora, tipo in batidas])
+                db.recalcular_horas_periodo(date(2026, 9, 15), date(2026, 9, 16))
+                horas = {linha.data: linha.horas_noturnas
+                         for linha in db.obter_horas_trabalhadas_periodo(date(2026, 9, 15), date(2026, 9, 16))}
+                for dia, esperado in self.NOTURNAS.items():
+                    with self.subTest(backend=db.backend, dia=dia):
+                        self.assertAlmostEqual(db.obter_resumo_dia(dia)['minutos_noturnos'] / 60, esperado)
+                        self.assertAlmostEqual(horas[dia], esperado)
+                db.fechar()
+
+
+class TestInterface(unittest.TestCase):
+
+    def test_backend_incompleto_falha_ao_ser_criado(self):
+        class BackendIncompleto(Armazenamento):
+            pass
+
+        with self.assertRaises(TypeError):
+            BackendIncompleto()
+
+    def test_backends_implementam_a_interface(self):
+        self.assertIsInstance(DatabaseMemoria(), Armazenamento)
+        self.assertIsInstance(abrir_armazenamento('memoria'), Armazenamento)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Iteradores em streaming do Database (SQLite): um iterador suspenso não divide a
+conexão com as gravações feitas enquanto ele está aberto.
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.database import Database
+
+INICIO = datetime(2026, 9, 1, 8, 0)
+
+
+class TestIteradoresIntercalados(unittest.TestCase):
+    perfil = 'desempenho'
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        ambiente = {'SQLITE_PERFIL': self.perfil, 'FALHAS_BUFFER': 'false'}
+        with mock.patch.dict(os.environ, ambiente):
+            self.db = Database(db_file=os.path.join(self._tmp.name, 'iteradores.db'))
+        self.batidas = [
+            (INICIO + timedelta(hours=i), 'entrada' if i % 2 == 0 else 'saida', 'IMPORTADO')
+            for i in range(20)
+        ]
+        self.db.registrar_pontos_em_lote(self.batidas)
+
+    def tearDown(self):
+        self.db.fechar()
+        self._tmp.cleanup()
+
+    def test_gravacoes_com_iteradores_suspensos(self):
+        registros = self.db.iter_registros_periodo(INICIO, INICIO + timedelta(days=2), batch=3)
+        self.db.registrar_falha('anterior', 'falha antes dos iteradores')
+        falhas = self.db.iter_falhas_periodo(INICIO, datetime(2100, 1, 1), batch=3)
+        lidos = [next(registros) for _ in range(4)]
+        self.assertEqual(next(falhas).tipo, 'anterior')
+
+        # Commit de uma batida dentro do período e rollback de uma gravação que falha,
+        # com os dois iteradores abertos
+        self.assertTrue(self.db.registrar_ponto(datetime(2026, 9, 2, 5, 0), 'entrada', 'SUCESSO'))
+        with mock.patch.object(self.db, '_atualizar_resumo_dia', side_effect=RuntimeError('falha simulada')):
+            self.assertFalse(self.db.registrar_ponto(datetime(2026, 9, 2, 6, 0), 'saida', 'SUCESSO'))
+
+        # Os iteradores leem o banco como estava quando começaram
+        lidos.extend(registros)
+        self.assertEqual([(registro.data_hora, registro.tipo) for registro in lidos],
+                         [(data_hora, tipo) for data_hora, tipo, _ in self.batidas])
+        self.assertEqual(list(falhas), [])
+        self.assertEqual([registro.data_hora for registro in self.db.obter_registros_dia(date(2026, 9, 2))][-1],
+                         datetime(2026, 9, 2, 5, 0))
+        self.assertEqual([falha.tipo for falha in self.db.iter_falhas_periodo(INICIO, datetime(2100, 1, 1))],
+                         ['anterior', 'registro_ponto'])
+
+    def test_iterador_dentro_da_transacao_ve_o_que_nao_foi_confirmado(self):
+        with self.db.transacao():
+            self.db.registrar_ponto(datetime(2026, 9, 5, 7, 0), 'entrada', 'SUCESSO')
+            datas = [registro.data_hora for registro in
+                     self.db.iter_registros_periodo(datetime(2026, 9, 5), datetime(2026, 9, 5, 23, 59))]
+        self.assertEqual(datas, [datetime(2026, 9, 5, 7, 0)])
+
+
+class TestIteradoresIntercaladosSemWal(TestIteradoresIntercalados):
+    """Sem WAL um leitor aberto bloquearia o commit; o iterador não pode segurar a leitura"""
+    perfil = 'padrao'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spool de FilaFalhas: lotes gravados só avançam o deslocamento confirmado, o arquivo
+é truncado ao esvaziar e o que não foi confirmado sobrevive a um reinício.
+
+Uso:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+from src.utils.fila_falhas import FilaFalhas
+
+INICIO = datetime(2026, 10, 1, 8, 0)
+
+
+class TestFilaFalhas(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.gravadas = []
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def criar_fila(self, **kwargs):
+        return FilaFalhas(self.gravadas.extend, self._tmp.name, **kwargs)
+
+    def registrar(self, fila, quantidade, inicio=0):
+        for i in range(inicio, inicio + quantidade):
+            fila.registrar(INICIO + timedelta(seconds=i), 'teste', f'erro {i}')
+
+    def test_drenar_acumulo_nao_reescreve_o_spool(self):
+        fila = self.criar_fila(capacidade=50, lote=20)
+        self.registrar(fila, 500)
+        caminho = fila._caminho
+        inode = os.stat(caminho).st_ino
+        confirmados = []
+        confirmar = fila._confirmar
+
+        def confirmar_e_medir(quantidade):
+            confirmar(quantidade)
+            confirmados.append((os.stat(caminho).st_ino, os.path.getsize(caminho)))
+        fila._confirmar = confirmar_e_medir
+
+        self.assertTrue(fila._gravar_pendentes())
+        self.assertEqual([falha[2] for falha in self.gravadas], [f'erro {i}' for i in range(500)])
+        # Mesmo arquivo e mesmo tamanho até o último lote, que o trunca
+        self.assertTrue(all(inode_lote == inode for inode_lote, _ in confirmados))
+        self.assertEqual(len({tamanho for _, tamanho in confirmados[:-1]}), 1)
+        self.assertEqual(confirmados[-1][1], 0)
+        self.assertEqual(fila.pendentes, 0)
+        fila.fechar()
+
+    def test_reinicio_retoma_do_deslocamento_confirmado(self):
+        fila = self.criar_fila(lote=10)
+        self.registrar(fila, 25)
+        fila._gravar_lote = lambda lote: self.gravadas.extend(lote) if len(self.gravadas) < 20 else 1 / 0
+        self.assertFalse(fila._gravar_pendentes())
+        self.assertEqual(fila.pendentes, 5)
+        # Processo encerrado sem fechar(): o spool fica para o próximo adotar
+        fila._spool.close()
+        os.replace(fila._caminho, os.path.join(self._tmp.name, 'falhas-1.jsonl'))
+        os.replace(fila._caminho + '.confirmado', os.path.join(self._tmp.name, 'falhas-1.jsonl.confirmado'))
+
+        nova = self.criar_fila(lote=10)
+        self.assertEqual(nova.pendentes, 5)
+        self.assertTrue(nova._gravar_pendentes())
+        self.assertEqual([falha[2] for falha in self.gravadas], [f'erro {i}' for i in range(25)])
+        self.assertEqual(sorted(os.listdir(self._tmp.name)), [os.path.basename(nova._caminho)])
+        nova.fechar()
+
+    def test_compacta_ao_passar_do_limite(self):
+        fila = self.criar_fila(capacidade=10, lote=10, compactar_bytes=1)
+        self.registrar(fila, 30)
+        lote = fila._proximo_lote()
+        fila._confirmar(len(lote))
+        self.registrar(fila, 1, inicio=30)
+        # Primeiro lote confirmado era menos da metade do arquivo: nada foi reescrito
+        self.assertGreater(fila._confirmado, 0)
+        fila._confirmar(len(fila._proximo_lote()))
+        self.assertEqual(fila._confirmado, 0)
+        self.assertEqual(fila.pendentes, 11)
+        self.assertTrue(fila._gravar_pendentes())
+        self.assertEqual([falha[2] for falha in self.gravadas[-11:]], [f'erro {i}' for i in range(20, 31)])
+        fila.fechar()
+
+
+if __name__ == '__main__':
+    unittest.main()
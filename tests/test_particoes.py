@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arquivamento de partições (só Postgres): um mês arquivado libera as chaves de
+idempotência das batidas e pode ser reimportado.
+
+Roda apenas com TEST_DATABASE_URL apontando para um Postgres descartável: o teste
+arquiva (e apaga) todas as partições anteriores a abril de 2001.
+
+Uso:
+    TEST_DATABASE_URL=postgresql://... python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+# Garante que o root esteja no path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+sys.path.append(root_dir)
+
+DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+LIMITE = date(2001, 4, 1)
+
+
+def gerar_marco():
+    batidas = []
+    dia = datetime(2001, 3, 1)
+    while dia.month == 3:
+        if dia.weekday() < 5:
+            batidas.append((dia.replace(hour=7, minute=30), 'entrada', 'IMPORTADO', None))
+            batidas.append((dia.replace(hour=17, minute=18), 'saida', 'IMPORTADO', None))
+        dia += timedelta(days=1)
+    return batidas
+
+
+@unittest.skipUnless(DATABASE_URL, 'TEST_DATABASE_URL não definido')
+class TestArquivamentoParticoes(unittest.TestCase):
+
+    def setUp(self):
+        from src.utils.database import Database
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = Database(database_url=DATABASE_URL)
+        self.db.arquivar_particoes(LIMITE, self._tmp.name, remover=True)
+
+    def tearDown(self):
+        self.db.arquivar_particoes(LIMITE, self._tmp.name, remover=True)
+        with self.db._get_connection() as conn:
+            for tabela in ('registros', 'falhas_registro'):
+                conn.execute(f'DROP TABLE IF EXISTS {tabela}_p2001_03_arquivada')
+        self.db.fechar()
+        self._tmp.cleanup()
+
+    def test_reimportar_mes_arquivado(self):
+        batidas = gerar_marco()
+        self.assertEqual(self.db.registrar_pontos_em_lote(batidas), len(batidas))
+        self.assertEqual(self.db.registrar_pontos_em_lote(batidas), 0)
+
+        arquivadas = self.db.arquivar_particoes(LIMITE, self._tmp.name)
+        self.assertIn('registros_p2001_03', [nome for nome, _, _ in arquivadas])
+        self.assertEqual(self.db.obter_registros_periodo(date(2001, 3, 1), datetime(2001, 3, 31, 23, 59)), [])
+
+        self.assertEqual(self.db.registrar_pontos_em_lote(batidas), len(batidas))
+        self.assertEqual(len(self.db.obter_registros_periodo(date(2001, 3, 1), datetime(2001, 3, 31, 23, 59))),
+                         len(batidas))
+
+    def test_batida_retroativa_com_chave_depois_do_arquivamento(self):
+        batida = datetime(2001, 3, 5, 7, 30)
+        self.assertTrue(self.db.registrar_ponto(batida, 'entrada', 'SUCESSO', chave='telegram:2001'))
+        self.db.arquivar_particoes(LIMITE, self._tmp.name)
+
+        self.assertTrue(self.db.registrar_ponto(batida, 'entrada', 'SUCESSO', chave='telegram:2001'))
+        self.assertEqual(len(self.db.obter_registros_dia(batida)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()